@@ -1,57 +1,294 @@
-from flask import Flask, jsonify, request
-import subprocess
+from flask import Flask, Response, jsonify, request, stream_with_context
+import os
 import threading
 import time
 import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from config import Config
+from device_providers import get_inventory
+from event_bus import EventBus, SharedEventBus, sse_stream
+from scan_uploader import ScanUploader
+from state_store import SqliteStateStore, get_state_store
+from utils.metrics import instrument_flask_app
+
 app = Flask(__name__)
+instrument_flask_app(app, 'apps')
 
-# Global variables to track scanning state
-scanning_state = {
-    'nfc': False,
-    'rfid': False,
-    'qr': False,
-    'bluetooth': False,
-    'palmvein': False
-}
+SCANNER_TYPES = ['nfc', 'rfid', 'qr', 'bluetooth', 'palmvein']
 
-devices_found = {
-    'nfc': [],
-    'rfid': [],
-    'qr': [],
-    'bluetooth': [],
-    'palmvein': []
-}
+# Seconds a scanner claim stays valid without renewal; the owning worker
+# renews it from its loop, so claims of crashed or restarted workers lapse
+CLAIM_TTL = 30
+
+# Most recent detections kept per scanner type; every detection rewrites
+# the shared list, so it must not grow without bound
+SCANNED_LIMIT = 256
+
+# Scanner claims and scanned devices are shared by every server worker
+store = get_state_store()
+
+
+class ScannerStats:
+    """Per-scanner CPU and loop latency counters"""
+
+    def __init__(self):
+        self.runs = 0
+        self.iterations = 0
+        self.detections = 0
+        self.cpu_seconds = 0.0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.started_at = None
+        self.stopped_at = None
+
+    def record_iteration(self, latency, cpu, detected):
+        self.iterations += 1
+        self.cpu_seconds += cpu
+        self.total_latency += latency
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        if detected:
+            self.detections += 1
+
+    def to_dict(self):
+        avg_latency = self.total_latency / self.iterations if self.iterations else 0.0
+        return {
+            'runs': self.runs,
+            'iterations': self.iterations,
+            'detections': self.detections,
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'avg_latency_ms': round(avg_latency * 1000, 3),
+            'last_latency_ms': round(self.last_latency * 1000, 3),
+            'max_latency_ms': round(self.max_latency * 1000, 3),
+            'started_at': self.started_at,
+            'stopped_at': self.stopped_at
+        }
+
+
+class ScannerSupervisor:
+    """Owns exactly one worker per device type on a shared thread pool.
+
+    Start and stop are idempotent and serialized by a single lock.  Each
+    worker waits on its own ``threading.Event`` between probes, so stopping
+    wakes it immediately instead of waiting out a ``time.sleep``.
+
+    Which scanners are running, and what they found, lives in the shared
+    StateStore so every server worker reports the same thing.  A scanner
+    runs in the worker that started it; a stop handled by another worker
+    removes the claim and the owner notices on its next probe. Claims are
+    leases of CLAIM_TTL seconds renewed by the running worker, so a claim
+    left behind by a crash or restart expires instead of blocking the
+    scanner forever.
+
+    Detections are also handed to the ScanUploader, when one is given, and
+    reach the server as device.scan.log rows.
+    """
+
+    def __init__(self, scanners, store, bus=None, uploader=None):
+        # scanners: {device_type: (interval_seconds, probe_function)}
+        self.scanners = scanners
+        self.store = store
+        self.bus = bus
+        self.uploader = uploader
+        self._lock = threading.Lock()
+        self._events = {}
+        self._runs = {}
+        self._futures = {}
+        self._stats = {device_type: ScannerStats() for device_type in scanners}
+        self._pool = ThreadPoolExecutor(max_workers=len(scanners),
+                                        thread_name_prefix='scanner')
+
+    def _is_local(self, device_type):
+        event = self._events.get(device_type)
+        return event is not None and not event.is_set()
+
+    def _claims(self):
+        """Unexpired claims only"""
+        now = time.time()
+        return {device_type: claim for device_type, claim in self.store.get('scanning', {}).items()
+                if claim.get('expires', 0) > now}
+
+    def is_running(self, device_type):
+        return device_type in self._claims()
+
+    def state(self):
+        """Snapshot of {device_type: running}"""
+        claims = self._claims()
+        return {device_type: device_type in claims for device_type in self.scanners}
+
+    def start(self, device_type):
+        """Start a scanner; returns False if it was already running"""
+        with self._lock:
+            run_id = uuid.uuid4().hex
+            pid = os.getpid()
+            local = self._is_local(device_type)
+
+            def claim(claims):
+                now = time.time()
+                current = claims.get(device_type)
+                # Expired claims, and claims by this process without a live
+                # worker, are stale
+                if current and current.get('expires', 0) > now and (current['owner'] != pid or local):
+                    return claims, False
+                claims[device_type] = {'owner': pid, 'run': run_id, 'expires': now + CLAIM_TTL}
+                return claims, True
+
+            if not self.store.update('scanning', claim, default={}):
+                return False
+
+            stop_event = threading.Event()
+            self._events[device_type] = stop_event
+            self._runs[device_type] = run_id
+            try:
+                self._futures[device_type] = self._pool.submit(self._run, device_type, run_id, stop_event)
+            except Exception:
+                stop_event.set()
+                self._release(device_type, run_id)
+                raise
+            return True
+
+    def stop(self, device_type, timeout=None):
+        """Stop a scanner; returns whether it was running"""
+        with self._lock:
+            was_running = self._release(device_type)
+            event = self._events.get(device_type)
+            if event is not None:
+                event.set()
+            future = self._futures.get(device_type)
+
+        if future is not None and timeout is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        return was_running
+
+    def stop_all(self, timeout=None):
+        for device_type in self.scanners:
+            self.stop(device_type, timeout=timeout)
+
+    def shutdown(self):
+        """Stop the workers owned by this process and release the pool"""
+        with self._lock:
+            for device_type, event in self._events.items():
+                if not event.is_set():
+                    self._release(device_type, self._runs.get(device_type))
+                    event.set()
+        self._pool.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {device_type: stats.to_dict() for device_type, stats in self._stats.items()}
+
+    def _release(self, device_type, run_id=None):
+        """Drop the claim (only if it still belongs to run_id, when given)"""
+        def release(claims):
+            current = claims.get(device_type)
+            if not current or (run_id and current['run'] != run_id):
+                return claims, False
+            del claims[device_type]
+            return claims, True
+
+        return self.store.update('scanning', release, default={})
+
+    def _still_claimed(self, device_type, run_id):
+        """Whether run_id still owns the scanner; renews the lease when half used"""
+        current = self.store.get('scanning', {}).get(device_type)
+        if not current or current['run'] != run_id:
+            return False
+        if current.get('expires', 0) - time.time() > CLAIM_TTL / 2:
+            return True
+
+        def renew(claims):
+            current = claims.get(device_type)
+            if not current or current['run'] != run_id:
+                return claims, False
+            current['expires'] = time.time() + CLAIM_TTL
+            return claims, True
+
+        return self.store.update('scanning', renew, default={})
+
+    def _record(self, device_type, item):
+        def append(items):
+            # Numbered after the newest kept item, so ids stay unique once old ones are dropped
+            number = int(items[-1]['id'].rsplit('_', 1)[1]) + 1 if items else 1
+            item['id'] = f"{item.pop('id_prefix')}_{number}"
+            items.append(item)
+            return items[-SCANNED_LIMIT:], item
+
+        return self.store.update(f'scanned:{device_type}', append, default=[])
+
+    def _run(self, device_type, run_id, stop_event):
+        interval, probe = self.scanners[device_type]
+        stats = self._stats[device_type]
+
+        with self._lock:
+            stats.runs += 1
+            stats.started_at = datetime.now().isoformat()
+            stats.stopped_at = None
+
+        try:
+            # Event.wait returns True as soon as stop() is called
+            while not stop_event.wait(interval):
+                # Stopped from another worker process
+                if not self._still_claimed(device_type, run_id):
+                    break
+
+                started = time.perf_counter()
+                cpu_started = time.thread_time()
+
+                item = probe()
+                detected = False
+                # A stale worker must not append after a restart
+                if item is not None and not stop_event.is_set():
+                    item = self._record(device_type, item)
+                    detected = True
+
+                if detected and self.bus is not None:
+                    self.bus.publish(device_type, item)
+                if detected and self.uploader is not None:
+                    self.uploader.add_detection(device_type, item)
+
+                with self._lock:
+                    stats.record_iteration(time.perf_counter() - started,
+                                           time.thread_time() - cpu_started,
+                                           detected)
+        except Exception as e:
+            print(f"Error in {device_type} scanner: {e}")
+            self._release(device_type, run_id)
+        finally:
+            stop_event.set()
+            with self._lock:
+                stats.stopped_at = datetime.now().isoformat()
+
+
+def get_scanned_devices():
+    """{device_type: [items]} from the shared store"""
+    return {device_type: store.get(f'scanned:{device_type}', []) for device_type in SCANNER_TYPES}
+
+
+def clear_scanned_devices(device_type):
+    """Empty one type's list; returns how many items were removed"""
+    return store.update(f'scanned:{device_type}', lambda items: ([], len(items)), default=[])
 
 def get_system_devices():
-    """Get current system devices using PowerShell"""
+    """Get current system devices from the shared platform inventory"""
     try:
-        cmd = 'Get-PnpDevice | Where-Object {$_.Status -eq "OK"} | Select-Object Class, DeviceID, FriendlyName | ConvertTo-Json'
-        result = subprocess.run(['powershell', '-Command', cmd], 
-                              capture_output=True, text=True, shell=True)
-        
-        if result.returncode == 0 and result.stdout.strip():
-            import json
-            devices_data = json.loads(result.stdout)
-            
-            # Handle both single device and array of devices
-            if isinstance(devices_data, dict):
-                devices_data = [devices_data]
-            
-            devices = []
-            for device in devices_data:
-                device_info = {
-                    'class': device.get('Class', 'Unknown'),
-                    'device_id': device.get('DeviceID', 'Unknown'),
-                    'name': device.get('FriendlyName', 'Unknown Device'),
-                    'type': classify_device_type(device.get('DeviceID', ''))
-                }
-                devices.append(device_info)
-            
-            return devices
-        else:
-            return []
+        devices = []
+        for device in get_inventory().get():
+            if device.get('status') != 'OK':
+                continue
+            devices.append({
+                'class': device.get('class', 'Unknown'),
+                'device_id': device.get('device_id', 'Unknown'),
+                'name': device.get('name', 'Unknown Device'),
+                'type': classify_device_type(device.get('device_id', ''))
+            })
+        return devices
             
     except Exception as e:
         print(f"Error getting system devices: {e}")
@@ -93,9 +330,10 @@ def index():
             "DELETE /scan/<type>": "Stop scanning",
             "POST /scan/all": "Start all scans",
             "DELETE /clear/<type>": "Clear found devices",
-            "GET /status": "Get scanning status"
+            "GET /status": "Get scanning status",
+            "GET /events?types=<type,...>": "Server-Sent Events stream of detections"
         },
-        "supported_scanners": list(scanning_state.keys())
+        "supported_scanners": list(supervisor.scanners.keys())
     })
 
 @app.route('/devices', methods=['GET'])
@@ -103,10 +341,12 @@ def get_devices():
     """Get all devices including system devices and scanned devices"""
     system_devices = get_system_devices()
     
+    scanned = get_scanned_devices()
+    
     # Count devices by type
     device_counts = {
         'system': len(system_devices),
-        'scanned': sum(len(devices) for devices in devices_found.values())
+        'scanned': sum(len(devices) for devices in scanned.values())
     }
     
     return jsonify({
@@ -114,10 +354,10 @@ def get_devices():
         "scanned_count": device_counts['scanned'],
         "devices": {
             "system_devices": system_devices,
-            **devices_found
+            **scanned
         },
         "last_scan": datetime.now().isoformat(),
-        "scanning": scanning_state,
+        "scanning": supervisor.state(),
         "total_count": device_counts['system'] + device_counts['scanned'],
         "device_counts": device_counts
     })
@@ -133,27 +373,13 @@ def start_scan(device_type):
             "valid_types": valid_types
         }), 400
     
-    if scanning_state[device_type]:
-        return jsonify({
-            "message": f"{device_type.upper()} scan already running",
-            "status": "already_running",
-            "scanning": True
-        }), 200
-    
-    # Start the appropriate scanner
     try:
-        scanning_state[device_type] = True
-        
-        if device_type == 'nfc':
-            threading.Thread(target=simulate_nfc_scan, daemon=True).start()
-        elif device_type == 'rfid':
-            threading.Thread(target=simulate_rfid_scan, daemon=True).start()
-        elif device_type == 'qr':
-            threading.Thread(target=simulate_qr_scan, daemon=True).start()
-        elif device_type == 'bluetooth':
-            threading.Thread(target=simulate_bluetooth_scan, daemon=True).start()
-        elif device_type == 'palmvein':
-            threading.Thread(target=simulate_palmvein_scan, daemon=True).start()
+        if not supervisor.start(device_type):
+            return jsonify({
+                "message": f"{device_type.upper()} scan already running",
+                "status": "already_running",
+                "scanning": True
+            }), 200
         
         return jsonify({
             "message": f"{device_type.upper()} scan started successfully",
@@ -163,7 +389,6 @@ def start_scan(device_type):
         })
         
     except Exception as e:
-        scanning_state[device_type] = False
         return jsonify({
             "error": f"{device_type.upper()} scan failed: {str(e)}",
             "status": "failed",
@@ -174,14 +399,13 @@ def start_scan(device_type):
 def stop_scan(device_type):
     """Stop scanning for specific device type"""
     
-    if device_type not in scanning_state:
+    if device_type not in supervisor.scanners:
         return jsonify({
             "error": "Invalid device type",
-            "valid_types": list(scanning_state.keys())
+            "valid_types": list(supervisor.scanners.keys())
         }), 400
     
-    was_scanning = scanning_state[device_type]
-    scanning_state[device_type] = False
+    was_scanning = supervisor.stop(device_type)
     
     return jsonify({
         "message": f"{device_type.upper()} scan stopped",
@@ -195,28 +419,14 @@ def start_all_scans():
     """Start all available scanners"""
     results = {}
     
-    for device_type in scanning_state.keys():
-        if not scanning_state[device_type]:
-            try:
-                scanning_state[device_type] = True
-                
-                if device_type == 'nfc':
-                    threading.Thread(target=simulate_nfc_scan, daemon=True).start()
-                elif device_type == 'rfid':
-                    threading.Thread(target=simulate_rfid_scan, daemon=True).start()
-                elif device_type == 'qr':
-                    threading.Thread(target=simulate_qr_scan, daemon=True).start()
-                elif device_type == 'bluetooth':
-                    threading.Thread(target=simulate_bluetooth_scan, daemon=True).start()
-                elif device_type == 'palmvein':
-                    threading.Thread(target=simulate_palmvein_scan, daemon=True).start()
-                
+    for device_type in supervisor.scanners:
+        try:
+            if supervisor.start(device_type):
                 results[device_type] = "started"
-            except Exception as e:
-                scanning_state[device_type] = False
-                results[device_type] = f"failed: {str(e)}"
-        else:
-            results[device_type] = "already running"
+            else:
+                results[device_type] = "already running"
+        except Exception as e:
+            results[device_type] = f"failed: {str(e)}"
     
     return jsonify({
         "message": "All scans initiated",
@@ -226,29 +436,64 @@ def start_all_scans():
 @app.route('/status', methods=['GET'])
 def get_status():
     """Get current scanning status"""
+    scanning = supervisor.state()
+    device_counts = {k: len(v) for k, v in get_scanned_devices().items()}
+    
     return jsonify({
-        "scanning_status": scanning_state,
-        "active_scans": [k for k, v in scanning_state.items() if v],
-        "device_counts": {k: len(v) for k, v in devices_found.items()},
+        "scanning_status": scanning,
+        "active_scans": [k for k, v in scanning.items() if v],
+        "device_counts": device_counts,
+        "scanner_stats": supervisor.stats(),
+        "event_stream": event_bus.stats(),
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/events', methods=['GET'])
+def stream_events():
+    """Push detections to the client as Server-Sent Events.
+    
+    The stream holds its server thread until the client disconnects, so
+    every open stream takes one of the worker's --threads.
+    """
+    types = request.args.get('types')
+    device_types = [t.strip() for t in types.split(',') if t.strip()] if types else None
+    
+    if device_types:
+        invalid = [t for t in device_types if t not in supervisor.scanners]
+        if invalid:
+            return jsonify({
+                "error": f"Invalid device type(s): {', '.join(invalid)}",
+                "valid_types": list(supervisor.scanners.keys())
+            }), 400
+    
+    try:
+        max_queue = min(int(request.args.get('max_queue', 256)), 4096)
+    except ValueError:
+        max_queue = 256
+    
+    subscription = event_bus.subscribe(device_types, max_queue=max_queue)
+    return Response(
+        stream_with_context(sse_stream(subscription)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/clear/<device_type>', methods=['DELETE'])
 def clear_devices(device_type):
     """Clear found devices for specific type"""
     
     if device_type == 'all':
-        cleared_count = sum(len(devices) for devices in devices_found.values())
-        for key in devices_found:
-            devices_found[key] = []
+        cleared_count = sum(clear_scanned_devices(key) for key in SCANNER_TYPES)
         return jsonify({
             "message": "All scanned devices cleared",
             "cleared_count": cleared_count
         })
     
-    if device_type in devices_found:
-        cleared_count = len(devices_found[device_type])
-        devices_found[device_type] = []
+    if device_type in SCANNER_TYPES:
+        cleared_count = clear_scanned_devices(device_type)
         return jsonify({
             "message": f"{device_type.upper()} devices cleared",
             "cleared_count": cleared_count
@@ -256,98 +501,114 @@ def clear_devices(device_type):
     
     return jsonify({
         "error": "Invalid device type",
-        "valid_types": list(devices_found.keys())
+        "valid_types": SCANNER_TYPES
     }), 400
 
-# Simulation functions for testing
+# Simulation probes for testing.  Each probe is called once per scanner
+# interval by the supervisor and returns a detected item or None.
 def simulate_nfc_scan():
     """Simulate NFC tag detection"""
-    print("🔍 NFC scanner started...")
-    while scanning_state['nfc']:
-        time.sleep(2)
-        
-        if random.random() < 0.3:  # 30% chance
-            nfc_tag = {
-                "id": f"nfc_{len(devices_found['nfc']) + 1}",
-                "uid": f"04:{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}",
-                "type": "NFC_TAG",
-                "data": f"NFC Data {random.randint(1000, 9999)}",
-                "timestamp": datetime.now().isoformat()
-            }
-            devices_found['nfc'].append(nfc_tag)
-            print(f"📱 NFC tag detected: {nfc_tag['uid']}")
+    if random.random() < 0.3:  # 30% chance
+        nfc_tag = {
+            "id_prefix": "nfc",
+            "uid": f"04:{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}",
+            "type": "NFC_TAG",
+            "data": f"NFC Data {random.randint(1000, 9999)}",
+            "timestamp": datetime.now().isoformat()
+        }
+        print(f"📱 NFC tag detected: {nfc_tag['uid']}")
+        return nfc_tag
+    return None
 
 def simulate_rfid_scan():
     """Simulate RFID tag detection"""
-    print("🔍 RFID scanner started...")
-    while scanning_state['rfid']:
-        time.sleep(3)
-        
-        if random.random() < 0.25:
-            rfid_tag = {
-                "id": f"rfid_{len(devices_found['rfid']) + 1}",
-                "uid": f"{random.randint(100000000, 999999999)}",
-                "type": "RFID_TAG",
-                "data": f"RFID Card {random.randint(1000, 9999)}",
-                "timestamp": datetime.now().isoformat()
-            }
-            devices_found['rfid'].append(rfid_tag)
-            print(f"💳 RFID tag detected: {rfid_tag['uid']}")
+    if random.random() < 0.25:
+        rfid_tag = {
+            "id_prefix": "rfid",
+            "uid": f"{random.randint(100000000, 999999999)}",
+            "type": "RFID_TAG",
+            "data": f"RFID Card {random.randint(1000, 9999)}",
+            "timestamp": datetime.now().isoformat()
+        }
+        print(f"💳 RFID tag detected: {rfid_tag['uid']}")
+        return rfid_tag
+    return None
 
 def simulate_qr_scan():
     """Simulate QR code detection"""
-    print("🔍 QR scanner started...")
-    while scanning_state['qr']:
-        time.sleep(1.5)
-        
-        if random.random() < 0.4:
-            qr_code = {
-                "id": f"qr_{len(devices_found['qr']) + 1}",
-                "data": f"https://example.com/qr/{random.randint(1000, 9999)}",
-                "type": "QR_CODE",
-                "format": "QR_CODE",
-                "timestamp": datetime.now().isoformat()
-            }
-            devices_found['qr'].append(qr_code)
-            print(f"📷 QR code detected: {qr_code['data']}")
+    if random.random() < 0.4:
+        qr_code = {
+            "id_prefix": "qr",
+            "data": f"https://example.com/qr/{random.randint(1000, 9999)}",
+            "type": "QR_CODE",
+            "format": "QR_CODE",
+            "timestamp": datetime.now().isoformat()
+        }
+        print(f"📷 QR code detected: {qr_code['data']}")
+        return qr_code
+    return None
 
 def simulate_bluetooth_scan():
     """Simulate Bluetooth device detection"""
-    print("🔍 Bluetooth scanner started...")
-    while scanning_state['bluetooth']:
-        time.sleep(4)
-        
-        if random.random() < 0.2:
-            bt_device = {
-                "id": f"bt_{len(devices_found['bluetooth']) + 1}",
-                "name": f"BT_Device_{random.randint(100, 999)}",
-                "address": f"{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}",
-                "type": "BLUETOOTH",
-                "timestamp": datetime.now().isoformat()
-            }
-            devices_found['bluetooth'].append(bt_device)
-            print(f"📡 Bluetooth device detected: {bt_device['name']}")
+    if random.random() < 0.2:
+        bt_device = {
+            "id_prefix": "bt",
+            "name": f"BT_Device_{random.randint(100, 999)}",
+            "address": f"{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}:{random.randint(10,99):02X}",
+            "type": "BLUETOOTH",
+            "timestamp": datetime.now().isoformat()
+        }
+        print(f"📡 Bluetooth device detected: {bt_device['name']}")
+        return bt_device
+    return None
 
 def simulate_palmvein_scan():
     """Simulate Palm Vein scanner (for your SaintDeem device)"""
-    print("🔍 Palm Vein scanner started...")
-    while scanning_state['palmvein']:
-        time.sleep(5)
-        
-        if random.random() < 0.15:
-            palm_scan = {
-                "id": f"palm_{len(devices_found['palmvein']) + 1}",
-                "template_id": f"PALM_{random.randint(10000, 99999)}",
-                "type": "PALM_VEIN",
-                "confidence": random.randint(85, 99),
-                "device": "SaintDeem PalmVein Scanner",
-                "timestamp": datetime.now().isoformat()
-            }
-            devices_found['palmvein'].append(palm_scan)
-            print(f"🖐️ Palm vein detected: {palm_scan['template_id']} (confidence: {palm_scan['confidence']}%)")
+    if random.random() < 0.15:
+        palm_scan = {
+            "id_prefix": "palm",
+            "template_id": f"PALM_{random.randint(10000, 99999)}",
+            "type": "PALM_VEIN",
+            "confidence": random.randint(85, 99),
+            "device": "SaintDeem PalmVein Scanner",
+            "timestamp": datetime.now().isoformat()
+        }
+        print(f"🖐️ Palm vein detected: {palm_scan['template_id']} (confidence: {palm_scan['confidence']}%)")
+        return palm_scan
+    return None
+
+# device_type -> (probe interval in seconds, probe)
+SCANNERS = {
+    'nfc': (2, simulate_nfc_scan),
+    'rfid': (3, simulate_rfid_scan),
+    'qr': (1.5, simulate_qr_scan),
+    'bluetooth': (4, simulate_bluetooth_scan),
+    'palmvein': (5, simulate_palmvein_scan)
+}
+
+# With several worker processes, detections travel through the shared store
+event_bus = SharedEventBus(store) if isinstance(store, SqliteStateStore) else EventBus()
+
+# Detections are uploaded once the agent has server credentials; workers
+# share one agent token through the store
+config = Config()
+uploader = ScanUploader(config, store=store) if config.API_KEY else None
+if uploader is not None:
+    uploader.start()
+
+supervisor = ScannerSupervisor(SCANNERS, store, bus=event_bus, uploader=uploader)
+
+def shutdown():
+    """Graceful-shutdown hook used by serve.py"""
+    supervisor.shutdown()
+    if uploader is not None:
+        uploader.stop()
 
 if __name__ == '__main__':
     print("🚀 Starting Multi-Device Scanner API...")
     print("📡 Supported devices: NFC, RFID, QR Code, Bluetooth, Palm Vein")
     print("🌐 Server running on http://127.0.0.1:5000")
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    try:
+        app.run(debug=True, host='0.0.0.0', port=5001)
+    finally:
+        shutdown()
@@ -21,6 +21,15 @@ except ImportError:
     PYBLUEZ_AVAILABLE = False
 
 from config import Config
+from device_snapshots import DeviceSnapshot
+from utils.logger import log_event
+from utils.metrics import REGISTRY
+
+ADVERTISEMENTS = REGISTRY.counter('bluetooth_advertisements_total', 'BLE advertisements handled')
+BT_SCAN_SECONDS = REGISTRY.histogram('bluetooth_scan_duration_seconds', 'Duration of one Bluetooth scan')
+BT_CONNECTIONS = REGISTRY.counter('bluetooth_connections_total', 'Bluetooth connection attempts', ['result'])
+BT_CONNECT_SECONDS = REGISTRY.histogram('bluetooth_connect_duration_seconds', 'Time to establish a BLE connection')
+BT_DEVICES = REGISTRY.gauge('bluetooth_devices', 'Bluetooth devices known to the manager', ['state'])
 
 class BluetoothDeviceType(Enum):
     BARCODE_SCANNER = "barcode_scanner"
@@ -49,6 +58,27 @@ class BluetoothDevice:
         if self.manufacturer_data is None:
             self.manufacturer_data = {}
         self.last_seen = time.time()
+    
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Compact record for the warm-start state file"""
+        return {
+            'address': self.address,
+            'name': self.name,
+            'type': self.device_type.value,
+            'services': self.services,
+            'last_seen': round(self.last_seen, 1),
+        }
+    
+    @classmethod
+    def from_snapshot(cls, record: Dict[str, Any]) -> 'BluetoothDevice':
+        device = cls(
+            address=record['address'],
+            name=record.get('name') or "Unknown Device",
+            device_type=BluetoothDeviceType(record.get('type', 'unknown')),
+            services=list(record.get('services', [])),
+        )
+        device.last_seen = record.get('last_seen', 0)
+        return device
 
 class BluetoothManager:
     def __init__(self, config: Config, device_callback: Optional[Callable] = None):
@@ -65,6 +95,12 @@ class BluetoothManager:
         self.scan_task = None
         self.connection_tasks: Dict[str, asyncio.Task] = {}
         
+        # Warm-start state; restored devices stay unverified until they
+        # advertise again or a connection to them succeeds
+        self.snapshot = DeviceSnapshot.from_config(config, 'bluetooth')
+        self.state_task = None
+        self.unverified_devices = set()
+        
         # Check available Bluetooth libraries
         self.ble_available = BLEAK_AVAILABLE
         self.classic_available = PYBLUEZ_AVAILABLE
@@ -110,13 +146,14 @@ class BluetoothManager:
     async def _handle_device_discovery(self, device: BLEDevice, advertisement_data=None):
         """Handle discovered BLE device"""
         try:
+            ADVERTISEMENTS.inc()
             address = device.address
             name = device.name or "Unknown Device"
             rssi = getattr(device, 'rssi', None)
             
             # Check if device is allowed
             if not self._is_device_allowed(address):
-                self.logger.debug(f"Device {address} not in allowed list, skipping")
+                self.logger.debug("Device %s not in allowed list, skipping", address)
                 return
             
             # Extract manufacturer data if available
@@ -129,7 +166,7 @@ class BluetoothManager:
             
             # Skip unknown devices if not configured to detect them
             if device_type == BluetoothDeviceType.UNKNOWN:
-                self.logger.debug(f"Unknown device type for {name} ({address}), skipping")
+                self.logger.debug("Unknown device type for %s (%s), skipping", name, address)
                 return
             
             # Create or update device record
@@ -139,6 +176,12 @@ class BluetoothManager:
                 bt_device.rssi = rssi
                 if manufacturer_data:
                     bt_device.manufacturer_data.update(manufacturer_data)
+                
+                # First advertisement of a device restored from the snapshot
+                if address in self.unverified_devices:
+                    self.unverified_devices.discard(address)
+                    if self.device_callback:
+                        await self._safe_callback(bt_device, 'discovered')
             else:
                 bt_device = BluetoothDevice(
                     address=address,
@@ -149,7 +192,10 @@ class BluetoothManager:
                 )
                 self.discovered_devices[address] = bt_device
                 
-                self.logger.info(f"Discovered Bluetooth device: {name} ({address}) - Type: {device_type.value}")
+                if self.logger.isEnabledFor(logging.INFO):
+                    log_event(self.logger, logging.INFO, 'discovered',
+                              device=address, name=name, transport='bluetooth',
+                              device_type=device_type.value, rssi=rssi)
                 
                 # Notify callback about new device
                 if self.device_callback:
@@ -162,7 +208,7 @@ class BluetoothManager:
                     )
         
         except Exception as e:
-            self.logger.error(f"Error handling device discovery: {e}")
+            self.logger.error("Error handling device discovery: %s", e)
     
     async def _connect_to_device(self, device: BluetoothDevice) -> bool:
         """Attempt to connect to a Bluetooth device"""
@@ -171,9 +217,10 @@ class BluetoothManager:
                 self.logger.warning("BLE not available for connection")
                 return False
             
-            self.logger.info(f"Attempting to connect to {device.name} ({device.address})")
+            self.logger.info("Attempting to connect to %s (%s)", device.name, device.address)
             
             client = BleakClient(device.address)
+            started = time.monotonic()
             
             # Set connection timeout
             timeout = self.config.DEVICE_TIMEOUT
@@ -185,15 +232,23 @@ class BluetoothManager:
                     device.is_connected = True
                     device.client = client
                     device.connection_attempts = 0
+                    device.last_seen = time.time()
+                    self.unverified_devices.discard(device.address)
                     self.connected_devices[device.address] = device
+                    BT_CONNECTIONS.labels('success').inc()
+                    BT_CONNECT_SECONDS.observe(time.monotonic() - started)
                     
                     # Discover services
                     try:
                         services = await client.get_services()
                         device.services = [str(service.uuid) for service in services]
-                        self.logger.info(f"Connected to {device.name}, discovered {len(device.services)} services")
+                        if self.logger.isEnabledFor(logging.INFO):
+                            log_event(self.logger, logging.INFO, 'connected',
+                                      device=device.address, name=device.name, transport='bluetooth',
+                                      services=len(device.services),
+                                      latency=round(time.monotonic() - started, 3))
                     except Exception as e:
-                        self.logger.warning(f"Could not discover services for {device.name}: {e}")
+                        self.logger.warning("Could not discover services for %s: %s", device.name, e)
                     
                     # Notify callback about connection
                     if self.device_callback:
@@ -202,21 +257,25 @@ class BluetoothManager:
                     return True
                 
             except asyncio.TimeoutError:
-                self.logger.warning(f"Connection timeout for {device.name}")
+                BT_CONNECTIONS.labels('timeout').inc()
+                self.logger.warning("Connection timeout for %s", device.name)
             except Exception as e:
-                self.logger.error(f"Connection error for {device.name}: {e}")
+                BT_CONNECTIONS.labels('error').inc()
+                self.logger.error("Connection error for %s: %s", device.name, e)
+            else:
+                BT_CONNECTIONS.labels('failure').inc()
             
             device.connection_attempts += 1
             
             # Check if we should stop trying to connect
             if device.connection_attempts >= self.config.MAX_RECONNECT_ATTEMPTS:
-                self.logger.warning(f"Max connection attempts reached for {device.name}")
+                self.logger.warning("Max connection attempts reached for %s", device.name)
                 return False
             
             return False
             
         except Exception as e:
-            self.logger.error(f"Error connecting to device {device.address}: {e}")
+            self.logger.error("Error connecting to device %s: %s", device.address, e)
             return False
         finally:
             # Clean up connection task
@@ -228,7 +287,7 @@ class BluetoothManager:
         try:
             if device.client and device.is_connected:
                 await device.client.disconnect()
-                self.logger.info(f"Disconnected from {device.name}")
+                self.logger.info("Disconnected from %s", device.name)
             
             device.is_connected = False
             device.client = None
@@ -241,7 +300,7 @@ class BluetoothManager:
                 await self._safe_callback(device, 'disconnected')
                 
         except Exception as e:
-            self.logger.error(f"Error disconnecting from {device.name}: {e}")
+            self.logger.error("Error disconnecting from %s: %s", device.name, e)
     
     async def _safe_callback(self, device: BluetoothDevice, event: str):
         """Safely call the device callback"""
@@ -251,7 +310,7 @@ class BluetoothManager:
             else:
                 self.device_callback(device, event)
         except Exception as e:
-            self.logger.error(f"Error in device callback: {e}")
+            self.logger.error("Error in device callback: %s", e)
     
     async def start_scanning(self):
         """Start Bluetooth device scanning"""
@@ -271,6 +330,10 @@ class BluetoothManager:
         self.logger.info("Starting Bluetooth device scanning")
         
         try:
+            if self.snapshot is not None:
+                await self.restore_state()
+                self.state_task = asyncio.create_task(self.snapshot.run(self.snapshot_state))
+            
             # Start continuous scanning
             scanner = BleakScanner()
             scanner.register_detection_callback(self._handle_device_discovery)
@@ -286,7 +349,7 @@ class BluetoothManager:
             self.logger.info("Bluetooth scanner stopped")
             
         except Exception as e:
-            self.logger.error(f"Error during Bluetooth scanning: {e}")
+            self.logger.error("Error during Bluetooth scanning: %s", e)
             self.is_scanning = False
     
     async def stop_scanning(self):
@@ -294,6 +357,13 @@ class BluetoothManager:
         self.logger.info("Stopping Bluetooth scanning")
         self.is_scanning = False
         
+        # Final snapshot while connection state is still intact
+        if self.state_task is not None:
+            self.state_task.cancel()
+            self.state_task = None
+        if self.snapshot is not None:
+            await self.snapshot.save_async(self.snapshot_state())
+        
         # Cancel all connection tasks
         for task in self.connection_tasks.values():
             if not task.done():
@@ -312,6 +382,7 @@ class BluetoothManager:
         
         try:
             self.logger.info("Performing single Bluetooth scan")
+            started = time.perf_counter()
             
             devices = await BleakScanner.discover(timeout=self.config.BLUETOOTH_SCAN_DURATION)
             discovered = []
@@ -321,13 +392,43 @@ class BluetoothManager:
                 if device.address in self.discovered_devices:
                     discovered.append(self.discovered_devices[device.address])
             
-            self.logger.info(f"Single scan completed, found {len(discovered)} devices")
+            BT_SCAN_SECONDS.observe(time.perf_counter() - started)
+            BT_DEVICES.labels('discovered').set(len(self.discovered_devices))
+            BT_DEVICES.labels('connected').set(len(self.connected_devices))
+            self.logger.info("Single scan completed, found %s devices", len(discovered))
             return discovered
             
         except Exception as e:
-            self.logger.error(f"Error during single Bluetooth scan: {e}")
+            self.logger.error("Error during single Bluetooth scan: %s", e)
             return []
     
+    def snapshot_state(self) -> List[Dict[str, Any]]:
+        """Records of all known devices, for the snapshot file"""
+        return [device.to_snapshot() for device in self.discovered_devices.values()]
+    
+    async def restore_state(self) -> int:
+        """Load the last snapshot; with auto-connect, reconnect its devices right away"""
+        records = await asyncio.get_running_loop().run_in_executor(None, self.snapshot.load)
+        restored = 0
+        for record in records:
+            try:
+                device = BluetoothDevice.from_snapshot(record)
+            except (KeyError, ValueError) as e:
+                self.logger.debug("Skipping invalid state record %r: %s", record, e)
+                continue
+            address = device.address
+            if address in self.discovered_devices or not self._is_device_allowed(address):
+                continue
+            self.discovered_devices[address] = device
+            self.unverified_devices.add(address)
+            if self.config.AUTO_CONNECT_DEVICES and address not in self.connection_tasks:
+                self.connection_tasks[address] = asyncio.create_task(self._connect_to_device(device))
+            restored += 1
+        
+        if restored:
+            self.logger.info("Restored %s Bluetooth devices from %s", restored, self.snapshot.path)
+        return restored
+    
     def get_discovered_devices(self) -> List[BluetoothDevice]:
         """Get list of all discovered devices"""
         return list(self.discovered_devices.values())
@@ -344,11 +445,11 @@ class BluetoothManager:
         """Manually connect to a device by address"""
         device = self.get_device_by_address(address)
         if not device:
-            self.logger.error(f"Device {address} not found")
+            self.logger.error("Device %s not found", address)
             return False
         
         if device.is_connected:
-            self.logger.info(f"Device {address} already connected")
+            self.logger.info("Device %s already connected", address)
             return True
         
         return await self._connect_to_device(device)
@@ -357,11 +458,11 @@ class BluetoothManager:
         """Manually disconnect from a device by address"""
         device = self.get_device_by_address(address)
         if not device:
-            self.logger.error(f"Device {address} not found")
+            self.logger.error("Device %s not found", address)
             return False
         
         if not device.is_connected:
-            self.logger.info(f"Device {address} not connected")
+            self.logger.info("Device %s not connected", address)
             return True
         
         await self._disconnect_device(device)
@@ -378,7 +479,7 @@ class BluetoothManager:
         
         for address in to_remove:
             device = self.discovered_devices.pop(address)
-            self.logger.info(f"Removed old device: {device.name} ({address})")
+            self.logger.info("Removed old device: %s (%s)", device.name, address)
     
     def get_device_info(self, address: str) -> Dict[str, Any]:
         """Get detailed information about a device"""
@@ -1,5 +1,6 @@
 import os
 import json
+import socket
 from pathlib import Path
 import logging
 
@@ -21,12 +22,40 @@ class Config:
         self.ENABLE_WIFI_DETECTION = True
         self.ENABLE_SYSTEM_TRAY = True
         self.LOG_LEVEL = "INFO"
+        self.LOG_QUEUE_SIZE = 10000  # records buffered for the log writer thread
         self.AUTO_CONNECT_DEVICES = True
         self.DEVICE_TIMEOUT = 30  # seconds
         self.MAX_RECONNECT_ATTEMPTS = 3
         self.HEARTBEAT_INTERVAL = 60  # seconds
         self.ENABLE_ENCRYPTION = True
         self.API_KEY = ""
+        self.AGENT_NAME = socket.gethostname()  # name the agent logs in with; API_KEY is its key
+        
+        # Scan upload batching
+        self.SCAN_BATCH_SIZE = 50  # scans per request
+        self.SCAN_FLUSH_INTERVAL = 1.0  # seconds
+        self.SCAN_BUFFER_LIMIT = 10000  # scans kept while the server is unreachable
+        self.SCAN_DEVICE_IDS = {}  # scanner type -> hardware.device device_id; '<AGENT_NAME>:<type>' when unset
+        
+        # Network scanning configuration
+        self.NETWORK_SCAN_RANGE = "192.168.1.0/24"
+        self.NETWORK_SCAN_RANGES = []  # CIDRs to sweep; NETWORK_SCAN_RANGE when empty
+        self.NETWORK_SCAN_EXCLUDE = []  # CIDRs or addresses never probed
+        self.NETWORK_AUTO_DETECT_SUBNETS = False  # also sweep the local interfaces' subnets
+        self.NETWORK_RANGE_CONCURRENCY = 32  # concurrent host probes per range
+        self.ENABLE_PASSIVE_DISCOVERY = True  # listen for mDNS/SSDP announcements
+        self.PASSIVE_DISCOVERY_TTL = 300  # seconds an announced host is exempt from active probing
+        
+        # Per-stage tracing of network sweeps (opt-in)
+        self.TRACE_ENABLED = False
+        self.TRACE_SAMPLE_RATE = 0.05  # fraction of hosts traced per sweep
+        self.TRACE_EXPORT_PATH = str(self.log_dir / 'scan_traces.jsonl')
+        
+        # Warm-start snapshots of discovered devices
+        self.ENABLE_STATE_SNAPSHOTS = True
+        self.STATE_SNAPSHOT_DIR = str(self.config_dir / 'state')
+        self.STATE_SNAPSHOT_INTERVAL = 60  # seconds between snapshots while scanning
+        self.STATE_SNAPSHOT_MAX_AGE = 7 * 24 * 3600  # seconds; older devices are not restored
         
         # Load from config file if exists
         if self.config_file.exists():
@@ -44,6 +73,11 @@ class Config:
         self.SCAN_INTERVAL = int(os.getenv('HARDWARE_SCAN_INTERVAL', str(self.SCAN_INTERVAL)))
         self.LOG_LEVEL = os.getenv('HARDWARE_LOG_LEVEL', self.LOG_LEVEL)
         self.API_KEY = os.getenv('HARDWARE_API_KEY', self.API_KEY)
+        self.AGENT_NAME = os.getenv('HARDWARE_AGENT_NAME', self.AGENT_NAME)
+        ranges = os.getenv('HARDWARE_NETWORK_SCAN_RANGES')
+        if ranges:
+            self.NETWORK_SCAN_RANGES = [cidr.strip() for cidr in ranges.split(',') if cidr.strip()]
+        self.TRACE_ENABLED = os.getenv('HARDWARE_TRACE_ENABLED', str(self.TRACE_ENABLED)).lower() in ('1', 'true', 'yes')
         
         # Supported device types with detailed configuration
         self.SUPPORTED_DEVICES = {
@@ -89,8 +123,7 @@ class Config:
             }
         }
         
-        # Network scanning configuration
-        self.NETWORK_SCAN_RANGE = "192.168.1.0/24"
+        # Bluetooth and USB polling
         self.BLUETOOTH_SCAN_DURATION = 10  # seconds
         self.USB_POLL_INTERVAL = 2  # seconds
         
@@ -113,15 +146,34 @@ class Config:
             'ENABLE_WIFI_DETECTION': self.ENABLE_WIFI_DETECTION,
             'ENABLE_SYSTEM_TRAY': self.ENABLE_SYSTEM_TRAY,
             'LOG_LEVEL': self.LOG_LEVEL,
+            'LOG_QUEUE_SIZE': self.LOG_QUEUE_SIZE,
             'AUTO_CONNECT_DEVICES': self.AUTO_CONNECT_DEVICES,
             'DEVICE_TIMEOUT': self.DEVICE_TIMEOUT,
             'MAX_RECONNECT_ATTEMPTS': self.MAX_RECONNECT_ATTEMPTS,
             'HEARTBEAT_INTERVAL': self.HEARTBEAT_INTERVAL,
             'ENABLE_ENCRYPTION': self.ENABLE_ENCRYPTION,
             'API_KEY': self.API_KEY,
+            'AGENT_NAME': self.AGENT_NAME,
             'NETWORK_SCAN_RANGE': self.NETWORK_SCAN_RANGE,
+            'NETWORK_SCAN_RANGES': self.NETWORK_SCAN_RANGES,
+            'NETWORK_SCAN_EXCLUDE': self.NETWORK_SCAN_EXCLUDE,
+            'NETWORK_AUTO_DETECT_SUBNETS': self.NETWORK_AUTO_DETECT_SUBNETS,
+            'NETWORK_RANGE_CONCURRENCY': self.NETWORK_RANGE_CONCURRENCY,
+            'ENABLE_PASSIVE_DISCOVERY': self.ENABLE_PASSIVE_DISCOVERY,
+            'PASSIVE_DISCOVERY_TTL': self.PASSIVE_DISCOVERY_TTL,
             'BLUETOOTH_SCAN_DURATION': self.BLUETOOTH_SCAN_DURATION,
             'USB_POLL_INTERVAL': self.USB_POLL_INTERVAL,
+            'SCAN_BATCH_SIZE': self.SCAN_BATCH_SIZE,
+            'SCAN_FLUSH_INTERVAL': self.SCAN_FLUSH_INTERVAL,
+            'SCAN_BUFFER_LIMIT': self.SCAN_BUFFER_LIMIT,
+            'SCAN_DEVICE_IDS': self.SCAN_DEVICE_IDS,
+            'TRACE_ENABLED': self.TRACE_ENABLED,
+            'TRACE_SAMPLE_RATE': self.TRACE_SAMPLE_RATE,
+            'TRACE_EXPORT_PATH': self.TRACE_EXPORT_PATH,
+            'ENABLE_STATE_SNAPSHOTS': self.ENABLE_STATE_SNAPSHOTS,
+            'STATE_SNAPSHOT_DIR': self.STATE_SNAPSHOT_DIR,
+            'STATE_SNAPSHOT_INTERVAL': self.STATE_SNAPSHOT_INTERVAL,
+            'STATE_SNAPSHOT_MAX_AGE': self.STATE_SNAPSHOT_MAX_AGE,
             'ALLOWED_DEVICE_MACS': self.ALLOWED_DEVICE_MACS,
             'REQUIRE_DEVICE_AUTHENTICATION': self.REQUIRE_DEVICE_AUTHENTICATION
         }
@@ -1,3 +1,4 @@
+import odoo
 from odoo import http
 from odoo.http import request
 import logging
@@ -5,9 +6,41 @@ import json
 from datetime import datetime, timedelta
 import secrets
 import hashlib
+import hmac
+
+from ..security import SecurityManager
+from . import heartbeat
 
 _logger = logging.getLogger(__name__)
 
+# 'session': opaque token checked against hardware.agent (default)
+# 'jwt': signed token verified by signature and the in-memory revocation list
+AUTH_MODE_PARAM = 'hardware_agent.auth_mode'
+JWT_SECRET_PARAM = 'hardware_agent.jwt_secret'
+JWT_TTL_PARAM = 'hardware_agent.jwt_ttl_minutes'
+DEFAULT_JWT_TTL_MINUTES = 15
+
+# Network sweep targets handed to agents (comma-separated CIDRs)
+SCAN_RANGES_PARAM = 'hardware_agent.network_scan_ranges'
+SCAN_EXCLUDE_PARAM = 'hardware_agent.network_scan_exclude'
+AUTO_DETECT_SUBNETS_PARAM = 'hardware_agent.network_auto_detect_subnets'
+DEFAULT_SCAN_RANGE = '192.168.1.0/24'
+
+_security_managers = {}
+
+# An agent is considered alive within this many seconds of its last heartbeat
+AGENT_LIVENESS_TIMEOUT = 180
+
+
+def _open_cursor(dbname):
+    return odoo.registry(dbname).cursor()
+
+
+def get_heartbeat_buffer(dbname):
+    """This worker's heartbeat buffer for a database (see heartbeat.HeartbeatBuffer)"""
+    return heartbeat.get_heartbeat_buffer(dbname, _open_cursor)
+
+
 class HardwareAuthController(http.Controller):
     
     @http.route('/hardware/auth/login', type='json', auth='none', methods=['POST'], csrf=False)
@@ -36,7 +69,10 @@ class HardwareAuthController(http.Controller):
                 }
             
             # Generate session token
-            token = self._generate_session_token(agent)
+            if self._auth_mode() == 'jwt':
+                token = self._generate_signed_token(agent)
+            else:
+                token = self._generate_session_token(agent)
             
             # Update agent status
             agent.sudo().write({
@@ -49,6 +85,7 @@ class HardwareAuthController(http.Controller):
             return {
                 'success': True,
                 'token': token,
+                'token_type': self._auth_mode(),
                 'agent_id': agent.id,
                 'agent_name': agent.name,
                 'permissions': self._get_agent_permissions(agent),
@@ -73,16 +110,25 @@ class HardwareAuthController(http.Controller):
             if not token or not agent_id:
                 return {'valid': False, 'error': 'Missing token or agent_id'}
             
-            agent = request.env['hardware.agent'].sudo().browse(int(agent_id))
-            if not agent.exists():
-                return {'valid': False, 'error': 'Agent not found'}
+            if self._is_signed_token(token):
+                payload = self._verify_signed_token(token, agent_id)
+                if payload:
+                    self._record_heartbeat(int(agent_id))
+                    return {
+                        'valid': True,
+                        'agent_name': payload['name'],
+                        'permissions': payload['perms']
+                    }
+                return {'valid': False, 'error': 'Invalid or expired token'}
             
-            if self._verify_session_token(token, agent):
+            token_info = request.env['hardware.agent'].sudo()._get_session_token_info(int(agent_id))
+            if self._check_token_info(token, token_info):
                 # Update last heartbeat
-                agent.write({'last_heartbeat': datetime.now()})
+                self._record_heartbeat(int(agent_id))
+                agent = request.env['hardware.agent'].sudo().browse(int(agent_id))
                 return {
                     'valid': True,
-                    'agent_name': agent.name,
+                    'agent_name': token_info[2],
                     'permissions': self._get_agent_permissions(agent)
                 }
             else:
@@ -100,28 +146,26 @@ class HardwareAuthController(http.Controller):
             agent_id = kwargs.get('agent_id')
             status_data = kwargs.get('status', {})
             
-            if not self._verify_request(token, agent_id):
+            verified = self._verify_request(token, agent_id)
+            if not verified:
                 return {'success': False, 'error': 'Authentication failed'}
             
-            agent = request.env['hardware.agent'].sudo().browse(int(agent_id))
-            
-            # Update agent status
-            update_vals = {
-                'last_heartbeat': datetime.now(),
-                'status': 'online',
-            }
+            # Buffered; written in the next batched flush
+            self._record_heartbeat(int(agent_id), status_data)
             
-            if status_data:
-                update_vals['status_data'] = json.dumps(status_data)
-            
-            agent.write(update_vals)
-            
-            return {
+            response = {
                 'success': True,
                 'server_time': datetime.now().isoformat(),
                 'config_updated': False  # Could check for config changes
             }
             
+            # Hand out a fresh signed token before the current one expires
+            refreshed = self._refresh_signed_token(verified)
+            if refreshed:
+                response['token'] = refreshed
+            
+            return response
+            
         except Exception as e:
             _logger.error("Heartbeat error: %s", str(e))
             return {'success': False, 'error': 'Heartbeat failed'}
@@ -137,10 +181,15 @@ class HardwareAuthController(http.Controller):
                 return {'success': False, 'error': 'Authentication failed'}
             
             agent = request.env['hardware.agent'].sudo().browse(int(agent_id))
+            # Flushes in any worker skip heartbeats older than logout_date
+            get_heartbeat_buffer(request.db).forget(agent.id)
             agent.write({
                 'status': 'offline',
                 'session_token': False,
+                'logout_date': datetime.now(),
             })
+            if self._is_signed_token(token):
+                agent._revoke_signed_tokens()
             
             return {'success': True, 'message': 'Logged out successfully'}
             
@@ -148,6 +197,34 @@ class HardwareAuthController(http.Controller):
             _logger.error("Logout error: %s", str(e))
             return {'success': False, 'error': 'Logout failed'}
     
+    @http.route('/hardware/auth/liveness', type='json', auth='user', methods=['POST'])
+    def agent_liveness(self, agent_ids=None, **kwargs):
+        """Report agent liveness from the database.
+        
+        Heartbeats reach the database within HEARTBEAT_FLUSH_INTERVAL, well
+        inside AGENT_LIVENESS_TIMEOUT, so every worker gives the same answer.
+        """
+        domain = [('id', 'in', agent_ids)] if agent_ids else []
+        agents = request.env['hardware.agent'].search_read(domain, ['last_heartbeat', 'status'])
+        now = datetime.now()
+        
+        result = []
+        for agent in agents:
+            last_heartbeat = agent['last_heartbeat']
+            alive = (agent['status'] == 'online' and bool(last_heartbeat)
+                     and (now - last_heartbeat).total_seconds() <= AGENT_LIVENESS_TIMEOUT)
+            result.append({
+                'agent_id': agent['id'],
+                'status': agent['status'],
+                'last_heartbeat': last_heartbeat.isoformat() if last_heartbeat else None,
+                'alive': alive,
+            })
+        return result
+    
+    def _record_heartbeat(self, agent_id, status_data=None):
+        """Buffer a heartbeat; the worker's flush timer writes it"""
+        get_heartbeat_buffer(request.db).record(agent_id, status_data)
+    
     def _find_or_create_agent(self, agent_name, agent_key, version):
         """Find existing agent or create new one"""
         try:
@@ -215,36 +292,107 @@ class HardwareAuthController(http.Controller):
     
     def _verify_session_token(self, token, agent):
         """Verify session token"""
+        return self._check_token_info(token, agent._get_session_token_info(agent.id))
+    
+    def _check_token_info(self, token, token_info):
+        """Check a token against cached (token_hash, token_expires, name)"""
         try:
-            if not agent.session_token or not agent.token_expires:
+            if not token or not token_info:
                 return False
             
+            token_hash, token_expires, _name = token_info
+            
             # Check if token expired
-            if datetime.now() > agent.token_expires:
+            if datetime.now() > token_expires:
                 return False
             
             # Verify token hash
-            token_hash = hashlib.sha256(token.encode()).hexdigest()
-            return token_hash == agent.session_token
+            provided_hash = hashlib.sha256(token.encode()).hexdigest()
+            return hmac.compare_digest(provided_hash, token_hash)
             
         except Exception:
             return False
     
     def _verify_request(self, token, agent_id):
-        """Verify request authentication"""
+        """Verify request authentication from the token cache (no SQL when warm).
+        
+        Returns the token payload for a valid signed token, True for a valid
+        session token and False otherwise.
+        """
         try:
             if not token or not agent_id:
                 return False
             
-            agent = request.env['hardware.agent'].sudo().browse(int(agent_id))
-            if not agent.exists():
-                return False
+            if self._is_signed_token(token):
+                return self._verify_signed_token(token, agent_id) or False
             
-            return self._verify_session_token(token, agent)
+            token_info = request.env['hardware.agent'].sudo()._get_session_token_info(int(agent_id))
+            return self._check_token_info(token, token_info)
             
         except Exception:
             return False
     
+    def _auth_mode(self):
+        """Configured auth mode; get_param is ormcached so this costs no query"""
+        mode = request.env['ir.config_parameter'].sudo().get_param(AUTH_MODE_PARAM, 'session')
+        return 'jwt' if mode == 'jwt' else 'session'
+    
+    def _security_manager(self):
+        """SecurityManager for the configured signing secret, reused per worker"""
+        secret = request.env['ir.config_parameter'].sudo().get_param(JWT_SECRET_PARAM)
+        if not secret:
+            # Normally created at install; this is race-free if it is missing
+            secret = request.env['hardware.agent'].sudo()._ensure_jwt_secret()
+        
+        manager = _security_managers.get(secret)
+        if manager is None:
+            manager = _security_managers[secret] = SecurityManager(secret)
+        return manager
+    
+    def _jwt_ttl_minutes(self):
+        value = request.env['ir.config_parameter'].sudo().get_param(JWT_TTL_PARAM)
+        try:
+            return int(value) if value else DEFAULT_JWT_TTL_MINUTES
+        except ValueError:
+            return DEFAULT_JWT_TTL_MINUTES
+    
+    def _is_signed_token(self, token):
+        return isinstance(token, str) and token.count('.') == 2
+    
+    def _generate_signed_token(self, agent):
+        """Issue a signed token carrying agent id, permissions and expiry"""
+        generations = agent._get_token_generations()
+        return self._security_manager().generate_agent_token(
+            agent.id,
+            agent.name,
+            self._get_agent_permissions(agent),
+            generation=generations.get(agent.id, 0),
+            expires_minutes=self._jwt_ttl_minutes(),
+        )
+    
+    def _verify_signed_token(self, token, agent_id):
+        """Payload of a valid, unrevoked signed token for agent_id, else None"""
+        payload = self._security_manager().verify_token(token)
+        if not payload or payload.get('typ') != 'agent':
+            return None
+        if payload.get('sub') != str(agent_id):
+            return None
+        
+        generations = request.env['hardware.agent'].sudo()._get_token_generations()
+        if payload.get('gen', 0) != generations.get(int(agent_id), 0):
+            return None
+        return payload
+    
+    def _refresh_signed_token(self, payload):
+        """New signed token when less than a third of the lifetime is left.
+        
+        payload is what _verify_request returned: the verified token payload
+        for signed tokens, anything else for session tokens.
+        """
+        if not isinstance(payload, dict):
+            return None
+        return self._security_manager().refresh_agent_token(payload, self._jwt_ttl_minutes())
+    
     def _get_agent_permissions(self, agent):
         """Get agent permissions"""
         # Default permissions for hardware agents
@@ -258,6 +406,8 @@ class HardwareAuthController(http.Controller):
     
     def _get_agent_config(self, agent):
         """Get agent configuration"""
+        params = request.env['ir.config_parameter'].sudo()
+        scan_ranges = self._param_list(params.get_param(SCAN_RANGES_PARAM)) or [DEFAULT_SCAN_RANGE]
         return {
             'scan_interval': 30,
             'heartbeat_interval': 60,
@@ -268,6 +418,13 @@ class HardwareAuthController(http.Controller):
                 'qr_scanner',
                 'printer'
             ],
-            'network_scan_range': '192.168.1.0/24',
+            'network_scan_range': scan_ranges[0],  # agents that only know one range
+            'network_scan_ranges': scan_ranges,
+            'network_scan_exclude': self._param_list(params.get_param(SCAN_EXCLUDE_PARAM)),
+            'network_auto_detect_subnets': params.get_param(AUTO_DETECT_SUBNETS_PARAM, 'False').lower() in ('1', 'true'),
             'max_devices': 10
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def _param_list(value):
+        return [item.strip() for item in (value or '').split(',') if item.strip()]
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Batched agent heartbeats
+========================
+
+Kept free of Odoo imports: the controller hands in how to open a cursor,
+so the buffering and flush logic can be tested on its own.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+_logger = logging.getLogger(__name__)
+
+# Seconds between batched heartbeat UPDATEs
+HEARTBEAT_FLUSH_INTERVAL = 30
+
+
+class HeartbeatBuffer:
+    """Coalesces agent heartbeats in memory and writes them in one batch.
+
+    Each worker process keeps one buffer per database. Instead of one
+    UPDATE per heartbeat, a timer thread in the worker flushes pending
+    heartbeats with a single multi-row UPDATE every ``flush_interval``
+    seconds, and ``status_data`` is only written when its content hash
+    differs from what was last flushed.
+
+    The database stays the source of truth: readers only see flushed
+    heartbeats (at most ``flush_interval`` old), and the flush skips
+    heartbeats older than the agent's ``logout_date``, so a logout handled
+    by another worker is never undone by this worker's pending batch.
+
+    ``open_cursor(dbname)`` returns the cursor context manager the timer
+    flushes through (``odoo.registry(dbname).cursor()`` in the server).
+    """
+
+    def __init__(self, dbname, open_cursor, flush_interval=HEARTBEAT_FLUSH_INTERVAL):
+        self.dbname = dbname
+        self.open_cursor = open_cursor
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushed_hashes = {}
+        self._flusher_pid = None
+
+    def record(self, agent_id, status_data=None):
+        payload = digest = None
+        if status_data:
+            payload = json.dumps(status_data, sort_keys=True)
+            digest = hashlib.sha1(payload.encode()).hexdigest()
+
+        with self._lock:
+            entry = self._pending.setdefault(agent_id, {})
+            entry['last_heartbeat'] = datetime.now()
+            if digest is None:
+                return
+            if digest != self._flushed_hashes.get(agent_id):
+                entry['status_data'] = payload
+                entry['hash'] = digest
+            else:
+                # Back to what the database already holds
+                entry.pop('status_data', None)
+                entry.pop('hash', None)
+
+    def ensure_flusher(self):
+        """Start this process's flush timer (again after a fork)"""
+        pid = os.getpid()
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+        threading.Thread(target=self._flush_loop, name=f'heartbeat-flush-{self.dbname}', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                with self.open_cursor(self.dbname) as cr:
+                    flushed = self.flush(cr)
+                if flushed:
+                    _logger.debug("Flushed %d buffered heartbeats", flushed)
+            except Exception as e:
+                # Requeued by flush(); retried on the next tick
+                _logger.warning("Heartbeat flush failed for %s: %s", self.dbname, e)
+
+    def flush(self, cr):
+        """Write all pending heartbeats with one UPDATE; returns rows sent"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return 0
+
+        agent_ids = list(pending)
+        try:
+            cr.execute("""
+                UPDATE hardware_agent AS a
+                   SET last_heartbeat = v.last_heartbeat,
+                       status = 'online',
+                       status_data = COALESCE(v.status_data, a.status_data)
+                  FROM unnest(%s::int[], %s::timestamp[], %s::text[])
+                       AS v(id, last_heartbeat, status_data)
+                 WHERE a.id = v.id
+                   AND (a.logout_date IS NULL OR v.last_heartbeat > a.logout_date)
+            """, (
+                agent_ids,
+                [pending[agent_id]['last_heartbeat'] for agent_id in agent_ids],
+                [pending[agent_id].get('status_data') for agent_id in agent_ids],
+            ))
+        except Exception:
+            self._requeue(pending)
+            raise
+
+        with self._lock:
+            for agent_id, entry in pending.items():
+                if entry.get('hash'):
+                    self._flushed_hashes[agent_id] = entry['hash']
+        return len(agent_ids)
+
+    def _requeue(self, pending):
+        with self._lock:
+            for agent_id, entry in pending.items():
+                newer = self._pending.get(agent_id)
+                if newer:
+                    entry.update(newer)
+                self._pending[agent_id] = entry
+
+    def forget(self, agent_id):
+        with self._lock:
+            self._pending.pop(agent_id, None)
+            self._flushed_hashes.pop(agent_id, None)
+
+
+_heartbeat_buffers = {}
+_heartbeat_buffers_lock = threading.Lock()
+
+
+def get_heartbeat_buffer(dbname, open_cursor):
+    """This worker's heartbeat buffer for a database, flushing on its own timer"""
+    with _heartbeat_buffers_lock:
+        buffer = _heartbeat_buffers.get(dbname)
+        if buffer is None:
+            buffer = _heartbeat_buffers[dbname] = HeartbeatBuffer(dbname, open_cursor)
+    buffer.ensure_flusher()
+    return buffer
@@ -8,6 +8,7 @@
     'data': [
         'views/device_views.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
     ],
     'installable': True,
     'application': True,
@@ -1 +1,3 @@
-from . import device
\ No newline at end of file
+from . import hardware_device
+from . import hardware_agent
+from . import device_scan_log
@@ -1,4 +1,27 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from datetime import timedelta
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE = 'device_scan_log_archive'
+RETENTION_PARAM = 'hardware_device_manager.scan_log_retention_days'
+ARCHIVE_RETENTION_PARAM = 'hardware_device_manager.scan_log_archive_retention_days'
+DEFAULT_RETENTION_DAYS = 90
+
+# Scan processing queue
+QUEUE_BATCH_SIZE = 100
+QUEUE_TIME_BUDGET = 50  # seconds per cron run, below the cron timeout
+QUEUE_MAX_ATTEMPTS = 5
+QUEUE_BACKOFF_BASE = 30  # seconds; doubled on every failed attempt
+QUEUE_CRON_XMLIDS = [
+    'hardware_device_manager.ir_cron_process_scan_queue_1',
+    'hardware_device_manager.ir_cron_process_scan_queue_2',
+]
+# Minimum seconds between cron triggers from one worker process
+QUEUE_TRIGGER_THROTTLE = 1.0
+_last_queue_trigger = 0.0
 
 class DeviceScanLog(models.Model):
     _name = 'device.scan.log'
@@ -15,3 +38,306 @@ class DeviceScanLog(models.Model):
     
     processed = fields.Boolean('Processed', default=False)
     error_message = fields.Text('Error Message')
+    
+    # Queue bookkeeping
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('dead', 'Dead Letter'),
+    ], string='Queue State', default='pending')
+    attempts = fields.Integer('Attempts', default=0)
+    next_attempt_at = fields.Datetime('Next Attempt')
+    processed_date = fields.Datetime('Processed On', index=True)
+
+    def init(self):
+        """Indexes for the scan-log access paths and the archive table"""
+        cr = self.env.cr
+        # Per-device history, newest first (form views, device dashboards)
+        tools.create_index(cr, 'device_scan_log_device_create_date_idx',
+                           self._table, ['device_id', 'create_date DESC'])
+        # Default list order and the retention cutoff
+        tools.create_index(cr, 'device_scan_log_create_date_idx',
+                           self._table, ['create_date DESC'])
+        # "Unprocessed scans" stays small however big the table grows
+        cr.execute("""
+            CREATE INDEX IF NOT EXISTS device_scan_log_unprocessed_idx
+                ON device_scan_log (create_date)
+             WHERE processed = false
+        """)
+        cr.execute("""
+            CREATE TABLE IF NOT EXISTS device_scan_log_archive (
+                id integer PRIMARY KEY,
+                device_id integer,
+                scan_data text,
+                scan_type varchar,
+                processed boolean,
+                error_message text,
+                create_uid integer,
+                create_date timestamp,
+                archived_at timestamp NOT NULL DEFAULT (now() at time zone 'UTC')
+            ) WITH (toast_tuple_target = 128)
+        """)
+        # Queue outcome, so dead-letter and expired rows stay distinguishable
+        cr.execute("""
+            ALTER TABLE device_scan_log_archive
+                ADD COLUMN IF NOT EXISTS state varchar,
+                ADD COLUMN IF NOT EXISTS attempts integer
+        """)
+        tools.create_index(cr, 'device_scan_log_archive_device_create_date_idx',
+                           ARCHIVE_TABLE, ['device_id', 'create_date'])
+        self._enable_archive_compression()
+
+    def _enable_archive_compression(self):
+        """Use lz4 TOAST compression for archived payloads when available (PG 14+)"""
+        cr = self.env.cr
+        cr.execute("SHOW server_version_num")
+        if int(cr.fetchone()[0]) < 140000:
+            return
+        try:
+            with cr.savepoint():
+                cr.execute("ALTER TABLE device_scan_log_archive ALTER COLUMN scan_data SET COMPRESSION lz4")
+                cr.execute("ALTER TABLE device_scan_log_archive ALTER COLUMN error_message SET COMPRESSION lz4")
+        except Exception as e:
+            # Server built without lz4: the default pglz compression still applies
+            _logger.info("lz4 compression unavailable for %s: %s", ARCHIVE_TABLE, e)
+
+    def _get_retention_days(self, param, default):
+        value = self.env['ir.config_parameter'].sudo().get_param(param)
+        try:
+            return int(value) if value else default
+        except ValueError:
+            return default
+
+    @api.model
+    def _cron_archive_scan_logs(self, chunk_size=5000, max_chunks=None):
+        """Move scan logs older than the retention window to the archive.
+
+        Processed, dead-letter and expired (never processed) rows all go;
+        the archive keeps their queue state. Rows a queue worker has locked
+        are skipped until the next run. Rows are moved in chunks of ``chunk_size`` with one DELETE ... RETURNING
+        feeding an INSERT, committing after each chunk so locks stay short.
+        A row whose id is already archived (e.g. restored from the archive
+        and expired again) replaces the archived copy.
+        """
+        retention_days = self._get_retention_days(RETENTION_PARAM, DEFAULT_RETENTION_DAYS)
+        if retention_days <= 0:
+            return 0
+
+        cutoff = fields.Datetime.now() - timedelta(days=retention_days)
+        moved_total = 0
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            self.env.cr.execute("""
+                WITH moved AS (
+                    DELETE FROM device_scan_log
+                     WHERE id IN (
+                        SELECT id FROM device_scan_log
+                         WHERE create_date < %s
+                         ORDER BY create_date
+                         LIMIT %s
+                         FOR UPDATE SKIP LOCKED
+                     )
+                    RETURNING id, device_id, scan_data, scan_type, processed,
+                              error_message, create_uid, create_date, state, attempts
+                )
+                INSERT INTO device_scan_log_archive
+                    (id, device_id, scan_data, scan_type, processed,
+                     error_message, create_uid, create_date, state, attempts)
+                SELECT id, device_id, scan_data, scan_type, processed,
+                       error_message, create_uid, create_date, state, attempts
+                  FROM moved
+                ON CONFLICT (id) DO UPDATE SET
+                    device_id = EXCLUDED.device_id,
+                    scan_data = EXCLUDED.scan_data,
+                    scan_type = EXCLUDED.scan_type,
+                    processed = EXCLUDED.processed,
+                    error_message = EXCLUDED.error_message,
+                    create_uid = EXCLUDED.create_uid,
+                    create_date = EXCLUDED.create_date,
+                    state = EXCLUDED.state,
+                    attempts = EXCLUDED.attempts,
+                    archived_at = now() at time zone 'UTC'
+            """, (cutoff, chunk_size))
+            moved = self.env.cr.rowcount
+            self.env.cr.commit()
+            moved_total += moved
+            chunks += 1
+            if moved < chunk_size:
+                break
+
+        self.invalidate_model()
+        self._purge_archive(chunk_size)
+        if moved_total:
+            _logger.info("Archived %d scan logs older than %s", moved_total, cutoff)
+        return moved_total
+
+    def _purge_archive(self, chunk_size):
+        """Drop archived rows past the archive retention (0 keeps them forever)"""
+        archive_days = self._get_retention_days(ARCHIVE_RETENTION_PARAM, 0)
+        if archive_days <= 0:
+            return
+        cutoff = fields.Datetime.now() - timedelta(days=archive_days)
+        while True:
+            self.env.cr.execute("""
+                DELETE FROM device_scan_log_archive
+                 WHERE id IN (
+                    SELECT id FROM device_scan_log_archive
+                     WHERE create_date < %s
+                     LIMIT %s
+                 )
+            """, (cutoff, chunk_size))
+            deleted = self.env.cr.rowcount
+            self.env.cr.commit()
+            if deleted < chunk_size:
+                break
+
+    # ------------------------------------------------------------------
+    # Processing queue
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _notify_queue(self):
+        """Wake the queue workers now instead of waiting for their next run"""
+        global _last_queue_trigger
+        now = time.monotonic()
+        # A pending trigger already covers scans arriving right after it
+        if now - _last_queue_trigger < QUEUE_TRIGGER_THROTTLE:
+            return
+        _last_queue_trigger = now
+        for xmlid in QUEUE_CRON_XMLIDS:
+            cron = self.env.ref(xmlid, raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+
+    @api.model
+    def _claim_batch(self, limit=QUEUE_BATCH_SIZE):
+        """Lock up to ``limit`` ready scans for this transaction.
+
+        SKIP LOCKED lets any number of workers claim disjoint batches from
+        the same queue without waiting on each other.
+        """
+        # Pending ORM writes (a requeue, a retry) must be visible to the SQL
+        self.flush_model(['processed', 'state', 'next_attempt_at'])
+        self.env.cr.execute("""
+            SELECT id FROM device_scan_log
+             WHERE processed = false
+               AND state = 'pending'
+               AND (next_attempt_at IS NULL OR next_attempt_at <= %s)
+             ORDER BY create_date, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, (fields.Datetime.now(), limit))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _process_scan(self):
+        """Business logic for one scan; override to act on scans.
+
+        Raising marks the attempt as failed and schedules a retry.
+        """
+        self.ensure_one()
+        if not self.scan_data:
+            raise ValueError('Empty scan data')
+
+    def _mark_failed(self, error):
+        self.ensure_one()
+        attempts = self.attempts + 1
+        vals = {
+            'attempts': attempts,
+            'error_message': str(error),
+        }
+        if attempts >= QUEUE_MAX_ATTEMPTS:
+            vals['state'] = 'dead'
+            vals['next_attempt_at'] = False
+            _logger.warning("Scan log %s moved to dead letter after %d attempts: %s",
+                            self.id, attempts, error)
+        else:
+            delay = QUEUE_BACKOFF_BASE * (2 ** (attempts - 1))
+            vals['next_attempt_at'] = fields.Datetime.now() + timedelta(seconds=delay)
+        self.write(vals)
+
+    def _process_batch(self):
+        """Process claimed scans one by one, isolating failures in savepoints"""
+        succeeded = failed = 0
+        for scan in self:
+            try:
+                with self.env.cr.savepoint():
+                    scan._process_scan()
+                    scan.write({
+                        'processed': True,
+                        'state': 'done',
+                        'processed_date': fields.Datetime.now(),
+                        'error_message': False,
+                    })
+                succeeded += 1
+            except Exception as e:
+                scan._mark_failed(e)
+                failed += 1
+        return succeeded, failed
+
+    @api.model
+    def _cron_process_scan_queue(self, batch_size=QUEUE_BATCH_SIZE, time_budget=QUEUE_TIME_BUDGET):
+        """Queue worker: claim and process batches until empty or out of time.
+
+        Several cron records run this method concurrently; add cron records
+        (and cron threads) to add workers.
+        """
+        deadline = time.monotonic() + time_budget
+        total = 0
+        while time.monotonic() < deadline:
+            batch = self._claim_batch(batch_size)
+            if not batch:
+                break
+            succeeded, failed = batch._process_batch()
+            # Commit releases the row locks and publishes the results
+            self.env.cr.commit()
+            total += succeeded + failed
+            if failed:
+                _logger.info("Scan queue batch: %d processed, %d failed", succeeded, failed)
+        return total
+
+    @api.model
+    def _get_queue_metrics(self):
+        """Queue depth, dead letters and latency figures in one query"""
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            SELECT
+                count(*) FILTER (WHERE processed = false AND state = 'pending'
+                                 AND (next_attempt_at IS NULL OR next_attempt_at <= %(now)s)),
+                count(*) FILTER (WHERE processed = false AND state = 'pending'
+                                 AND next_attempt_at > %(now)s),
+                count(*) FILTER (WHERE state = 'dead'),
+                EXTRACT(EPOCH FROM %(now)s - min(create_date)
+                        FILTER (WHERE processed = false AND state = 'pending'))
+              FROM device_scan_log
+             WHERE processed = false
+        """, {'now': now})
+        ready, retrying, dead, oldest_age = self.env.cr.fetchone()
+
+        self.env.cr.execute("""
+            SELECT count(*),
+                   avg(EXTRACT(EPOCH FROM processed_date - create_date)),
+                   percentile_cont(0.95) WITHIN GROUP
+                       (ORDER BY EXTRACT(EPOCH FROM processed_date - create_date))
+              FROM device_scan_log
+             WHERE processed_date >= %s
+        """, (now - timedelta(hours=1),))
+        processed_last_hour, avg_latency, p95_latency = self.env.cr.fetchone()
+
+        return {
+            'queue_depth': ready,
+            'retrying': retrying,
+            'dead_letter': dead,
+            'oldest_pending_seconds': float(oldest_age or 0),
+            'processed_last_hour': processed_last_hour,
+            'avg_latency_seconds': float(avg_latency or 0),
+            'p95_latency_seconds': float(p95_latency or 0),
+        }
+
+    def action_requeue(self):
+        """Send dead-letter scans back to the queue"""
+        self.filtered(lambda scan: scan.state == 'dead').write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt_at': False,
+        })
+        self._notify_queue()
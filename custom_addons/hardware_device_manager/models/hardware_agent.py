@@ -0,0 +1,147 @@
+from odoo import models, fields, api
+import logging
+import secrets
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Writing any of these invalidates this worker's cached token data
+TOKEN_FIELDS = {'session_token', 'token_expires', 'name', 'token_generation'}
+
+# Seconds a worker trusts its cached token data. Writes invalidate the
+# writing worker at once; other workers re-read within this delay. Kept
+# out of the registry ormcache so a login or logout doesn't flush every
+# worker's view, ACL and parameter caches.
+TOKEN_CACHE_TTL = 10
+# (dbname, key) -> (value, expires_at)
+_token_cache = {}
+
+# Signing secret for agent JWTs (same key as controllers/auth.py)
+JWT_SECRET_PARAM = 'hardware_agent.jwt_secret'
+
+class HardwareAgent(models.Model):
+    _name = 'hardware.agent'
+    _description = 'Hardware Agent'
+    _order = 'name'
+
+    name = fields.Char('Agent Name', required=True, index=True)
+    agent_id = fields.Char('Agent ID', readonly=True)
+    agent_key = fields.Char('Agent Key Hash', groups='base.group_system')
+    version = fields.Char('Version')
+    ip_address = fields.Char('IP Address')
+    status = fields.Selection([
+        ('online', 'Online'),
+        ('offline', 'Offline'),
+    ], string='Status', default='offline')
+
+    last_heartbeat = fields.Datetime('Last Heartbeat')
+    # Buffered heartbeats older than this are not flushed (see HeartbeatBuffer)
+    logout_date = fields.Datetime('Logged Out At', readonly=True)
+    status_data = fields.Text('Status Data')
+    created_date = fields.Datetime('Created Date')
+
+    session_token = fields.Char('Session Token Hash', groups='base.group_system')
+    token_expires = fields.Datetime('Token Expires', groups='base.group_system')
+    # Bumped on logout; signed tokens of an older generation are revoked
+    token_generation = fields.Integer('Token Generation', default=0, groups='base.group_system')
+
+    device_ids = fields.One2many('hardware.device', 'agent_id', string='Devices')
+    device_count = fields.Integer('Device Count', compute='_compute_device_count')
+
+    @api.depends('device_ids')
+    def _compute_device_count(self):
+        for agent in self:
+            agent.device_count = len(agent.device_ids)
+
+    def _token_cached(self, key, loader):
+        """loader() result cached in this worker for TOKEN_CACHE_TTL seconds"""
+        cache_key = (self.env.cr.dbname, key)
+        now = time.monotonic()
+        hit = _token_cache.get(cache_key)
+        if hit and hit[1] > now:
+            return hit[0]
+        value = loader()
+        _token_cache[cache_key] = (value, now + TOKEN_CACHE_TTL)
+        return value
+
+    def _invalidate_token_cache(self):
+        """Drop this worker's token data, now and again once the transaction commits"""
+        dbname = self.env.cr.dbname
+
+        def invalidate():
+            for cache_key in [key for key in _token_cache if key[0] == dbname]:
+                _token_cache.pop(cache_key, None)
+
+        invalidate()
+        # A read before the commit would otherwise cache the old value again
+        self.env.cr.postcommit.add(invalidate)
+
+    @api.model
+    def _get_session_token_info(self, agent_id):
+        """(token_hash, token_expires, name) for an agent, cached per worker"""
+        def load():
+            agent = self.sudo().browse(agent_id).exists()
+            if not agent or not agent.session_token or not agent.token_expires:
+                return None
+            return (agent.session_token, agent.token_expires, agent.name)
+
+        return self._token_cached(('session', agent_id), load)
+
+    @api.model
+    def _get_token_generations(self):
+        """{agent_id: token_generation} revocation list for signed tokens.
+
+        Only agents that have ever revoked their tokens are listed, so the
+        map stays small; each worker reloads it at most every
+        TOKEN_CACHE_TTL seconds.
+        """
+        def load():
+            agents = self.sudo().search_read([('token_generation', '>', 0)], ['token_generation'])
+            return {agent['id']: agent['token_generation'] for agent in agents}
+
+        return self._token_cached('generations', load)
+
+    @api.model
+    def _ensure_jwt_secret(self):
+        """Create the JWT signing secret if missing and return it.
+
+        Called from the module data at install/upgrade. The insert is a
+        no-op when another worker created the secret first, so every
+        worker ends up signing with the same one.
+        """
+        self.env.cr.execute("""
+            INSERT INTO ir_config_parameter (key, value, create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+            ON CONFLICT (key) DO NOTHING
+        """, (JWT_SECRET_PARAM, secrets.token_urlsafe(48), self.env.uid, self.env.uid))
+        self.env['ir.config_parameter'].clear_caches()
+        self.env['ir.config_parameter'].invalidate_model()
+        return self.env['ir.config_parameter'].sudo().get_param(JWT_SECRET_PARAM)
+
+    def _revoke_signed_tokens(self):
+        """Invalidate every signed token issued so far for these agents"""
+        for agent in self.sudo():
+            agent.token_generation = agent.token_generation + 1
+
+    def write(self, vals):
+        res = super().write(vals)
+        if TOKEN_FIELDS.intersection(vals):
+            self._invalidate_token_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._invalidate_token_cache()
+        return res
+
+    def action_ping_agent(self):
+        """Report when the agent was last heard from"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': f'{self.name} last heartbeat: {self.last_heartbeat or "never"}',
+                'type': 'success' if self.status == 'online' else 'warning',
+            }
+        }
@@ -1,4 +1,4 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -17,21 +17,63 @@ class HardwareDevice(models.Model):
         ('printer', 'Printer'),
         ('payment', 'Payment Terminal'),
         ('camera', 'Camera'),
-    ], string='Device Type', required=True)
+    ], string='Device Type', required=True, index=True)
     
     status = fields.Selection([
         ('connected', 'Connected'),
         ('disconnected', 'Disconnected'),
         ('error', 'Error'),
-    ], string='Status', default='disconnected')
+    ], string='Status', default='disconnected', index=True)
     
-    agent_id = fields.Many2one('hardware.agent', string='Agent')
+    agent_id = fields.Many2one('hardware.agent', string='Agent', index=True)
     last_event = fields.Datetime('Last Event')
     last_event_data = fields.Text('Last Event Data')
     
     # Configuration fields
     printer_config = fields.Text('Printer Configuration')
     payment_terminal_config = fields.Text('Payment Terminal Configuration')
+    notes = fields.Text('Notes')
+    
+    _sql_constraints = [
+        ('device_id_unique', 'unique(device_id)', 'A device with this Device ID already exists.'),
+    ]
+    
+    def init(self):
+        # Delta sync (/hardware/devices?since=...) filters on write_date
+        tools.create_index(self.env.cr, 'hardware_device_write_date_idx',
+                           self._table, ['write_date'])
+        # Devices created by the former models/device.py used 'scanner'
+        self.env.cr.execute("""
+            UPDATE hardware_device SET device_type = 'barcode_scanner'
+             WHERE device_type = 'scanner'
+        """)
+    
+    @api.model
+    @tools.ormcache('device_ref')
+    def _resolve_device_ref(self, device_ref):
+        """Record id for an agent device identifier (MAC, USB path...), or None.
+        
+        Cached per worker; create, unlink and device_id changes clear it.
+        """
+        device = self.sudo().search([('device_id', '=', device_ref)], limit=1)
+        return device.id or None
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.clear_caches()
+        return records
+    
+    def write(self, vals):
+        res = super().write(vals)
+        if 'device_id' in vals:
+            self.clear_caches()
+        return res
+    
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
     
     def action_print_test(self):
         """Test print functionality"""
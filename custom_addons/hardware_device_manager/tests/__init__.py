@@ -0,0 +1,6 @@
+from . import test_hardware_agent
+from . import test_hardware_device
+from . import test_scan_batch
+from . import test_device_list
+from . import test_scan_log_archive
+from . import test_scan_queue
@@ -0,0 +1,34 @@
+import json
+
+from odoo.tests import tagged
+from odoo.tests.common import HttpCase
+
+
+@tagged('post_install', '-at_install')
+class TestDeviceList(HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate('admin', 'admin')
+        self.device = self.env['hardware.device'].create({
+            'name': 'Delta', 'device_id': 'DELTA-1', 'device_type': 'barcode_scanner',
+        })
+
+    def list_devices(self, **params):
+        response = self.url_open('/hardware/devices', data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params}),
+                                 headers={'Content-Type': 'application/json'})
+        return response.json()['result']
+
+    def test_total_is_opt_in(self):
+        self.assertIsNone(self.list_devices()['total'])
+        self.assertGreaterEqual(self.list_devices(with_total=True)['total'], 1)
+
+    def test_late_commit_is_returned_by_the_next_delta(self):
+        cursor = self.list_devices()['server_time']
+        # Written by a transaction that started 30 s ago and committed after the read
+        self.env.cr.execute("""
+            UPDATE hardware_device SET write_date = (now() at time zone 'UTC') - interval '30 seconds'
+             WHERE id = %s
+        """, (self.device.id,))
+        ids = [record['id'] for record in self.list_devices(since=cursor)['records']]
+        self.assertIn(self.device.id, ids)
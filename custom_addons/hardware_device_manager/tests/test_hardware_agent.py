@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from odoo.tests.common import TransactionCase
+
+
+class TestAgentTokenCache(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.agent = self.env['hardware.agent'].create({
+            'name': 'agent-cache',
+            'session_token': 'hash-1',
+            'token_expires': datetime.now() + timedelta(hours=1),
+        })
+
+    def test_token_write_refreshes_cached_info(self):
+        agents = self.env['hardware.agent']
+        self.assertEqual(agents._get_session_token_info(self.agent.id)[0], 'hash-1')
+
+        self.agent.write({'session_token': 'hash-2'})
+        self.assertEqual(agents._get_session_token_info(self.agent.id)[0], 'hash-2')
+
+        self.agent.write({'session_token': False})
+        self.assertIsNone(agents._get_session_token_info(self.agent.id))
+
+    def test_revocation_refreshes_generations(self):
+        agents = self.env['hardware.agent']
+        self.assertNotIn(self.agent.id, agents._get_token_generations())
+        self.agent._revoke_signed_tokens()
+        self.assertEqual(agents._get_token_generations()[self.agent.id], 1)
+
+    def test_token_changes_keep_the_registry_cache(self):
+        with patch.object(type(self.env.registry), '_clear_cache') as clear_cache:
+            self.agent.write({'session_token': 'hash-3'})
+            self.agent._revoke_signed_tokens()
+        clear_cache.assert_not_called()
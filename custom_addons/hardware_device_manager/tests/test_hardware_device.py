@@ -0,0 +1,53 @@
+from psycopg2 import IntegrityError
+
+from odoo.tests.common import TransactionCase
+from odoo.tools import mute_logger
+
+
+class TestHardwareDevice(TransactionCase):
+
+    def test_form_view_fields_exist(self):
+        view = self.env.ref('hardware_device_manager.view_hardware_device_form')
+        # Raises if the arch references a field the model lacks
+        self.env['hardware.device'].get_view(view.id, 'form')
+
+    def test_view_device_types_are_selectable(self):
+        selection = dict(self.env['hardware.device']._fields['device_type'].selection)
+        for device_type in ('barcode_scanner', 'nfc_reader', 'qr_scanner'):
+            self.assertIn(device_type, selection)
+
+
+class TestDeviceRefResolution(TransactionCase):
+
+    def create_device(self, device_id):
+        return self.env['hardware.device'].create({
+            'name': device_id, 'device_id': device_id, 'device_type': 'barcode_scanner',
+        })
+
+    def test_device_id_is_unique(self):
+        self.create_device('AA:BB:CC:00:00:01')
+        with self.assertRaises(IntegrityError), mute_logger('odoo.sql_db'), self.env.cr.savepoint():
+            self.create_device('AA:BB:CC:00:00:01')
+
+    def test_created_device_resolves_after_a_cached_miss(self):
+        devices = self.env['hardware.device']
+        self.assertIsNone(devices._resolve_device_ref('AA:BB:CC:00:00:02'))
+        device = self.create_device('AA:BB:CC:00:00:02')
+        self.assertEqual(devices._resolve_device_ref('AA:BB:CC:00:00:02'), device.id)
+
+    def test_rename_moves_the_ref(self):
+        devices = self.env['hardware.device']
+        device = self.create_device('AA:BB:CC:00:00:03')
+        self.assertEqual(devices._resolve_device_ref('AA:BB:CC:00:00:03'), device.id)
+
+        device.device_id = 'AA:BB:CC:00:00:04'
+        self.assertIsNone(devices._resolve_device_ref('AA:BB:CC:00:00:03'))
+        self.assertEqual(devices._resolve_device_ref('AA:BB:CC:00:00:04'), device.id)
+
+    def test_unlinked_device_stops_resolving(self):
+        devices = self.env['hardware.device']
+        device = self.create_device('AA:BB:CC:00:00:05')
+        self.assertEqual(devices._resolve_device_ref('AA:BB:CC:00:00:05'), device.id)
+
+        device.unlink()
+        self.assertIsNone(devices._resolve_device_ref('AA:BB:CC:00:00:05'))
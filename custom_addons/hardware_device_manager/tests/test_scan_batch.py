@@ -0,0 +1,43 @@
+import json
+
+from odoo.tests import tagged
+from odoo.tests.common import HttpCase
+
+
+@tagged('post_install', '-at_install')
+class TestScanBatch(HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        login = self.rpc('/hardware/auth/login', agent_name='batch-agent', agent_key='key')
+        self.token, self.agent_id = login['token'], login['agent_id']
+        other = self.env['hardware.agent'].create({'name': 'other-agent'})
+        self.own = self.env['hardware.device'].create({
+            'name': 'Own', 'device_id': 'OWN-1', 'device_type': 'barcode_scanner', 'agent_id': self.agent_id,
+        })
+        self.foreign = self.env['hardware.device'].create({
+            'name': 'Foreign', 'device_id': 'FOREIGN-1', 'device_type': 'barcode_scanner', 'agent_id': other.id,
+        })
+
+    def rpc(self, url, **params):
+        response = self.url_open(url, data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params}),
+                                 headers={'Content-Type': 'application/json'})
+        return response.json()['result']
+
+    def test_bad_scans_are_rejected_individually(self):
+        result = self.rpc('/hardware/device/scan/batch', token=self.token, agent_id=self.agent_id, scans=[
+            {'device_id': 'OWN-1', 'scan_data': '123', 'scan_type': 'barcode'},
+            {'device_id': 'OWN-1', 'scan_data': '456', 'scan_type': 'palm'},
+            {'device_id': 'FOREIGN-1', 'scan_data': '789', 'scan_type': 'barcode'},
+            {'device_id': 'OWN-1', 'scan_data': '', 'scan_type': 'qr'},
+        ])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['recorded'], 1)
+        self.assertEqual([rejection['index'] for rejection in result['rejected']], [1, 2, 3])
+        self.assertEqual(self.env['device.scan.log'].search_count([('device_id', '=', self.foreign.id)]), 0)
+
+    def test_missing_token_is_refused(self):
+        result = self.rpc('/hardware/device/scan/batch', agent_id=self.agent_id, scans=[
+            {'device_id': 'OWN-1', 'scan_data': '123', 'scan_type': 'barcode'},
+        ])
+        self.assertEqual(result['code'], 'AUTHENTICATION_FAILED')
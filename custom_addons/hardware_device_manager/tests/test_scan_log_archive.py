@@ -0,0 +1,67 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+from ..models.device_scan_log import RETENTION_PARAM
+
+
+class TestScanLogArchive(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.device = self.env['hardware.device'].create({
+            'name': 'Archive', 'device_id': 'ARCHIVE-1', 'device_type': 'barcode_scanner',
+        })
+        self.env['ir.config_parameter'].set_param(RETENTION_PARAM, '90')
+        # The cron commits after every chunk; keep everything in the test transaction
+        commit = patch.object(self.env.cr, 'commit')
+        self.commit = commit.start()
+        self.addCleanup(commit.stop)
+
+    def create_logs(self, count, age_days=0, **vals):
+        logs = self.env['device.scan.log'].create([
+            dict({'device_id': self.device.id, 'scan_data': f'scan {i}', 'scan_type': 'barcode'}, **vals)
+            for i in range(count)
+        ])
+        if age_days:
+            self.env.cr.execute("UPDATE device_scan_log SET create_date = %s WHERE id IN %s",
+                                (fields.Datetime.now() - timedelta(days=age_days), tuple(logs.ids)))
+        return logs
+
+    def archived(self, logs):
+        self.env.cr.execute("SELECT id, scan_data, state FROM device_scan_log_archive WHERE id IN %s ORDER BY id",
+                            (tuple(logs.ids),))
+        return self.env.cr.fetchall()
+
+    def test_rows_past_retention_are_moved_with_their_state(self):
+        done = self.create_logs(1, age_days=100, state='done', processed=True)
+        dead = self.create_logs(1, age_days=100, state='dead')
+        recent = self.create_logs(1)
+
+        self.assertEqual(self.env['device.scan.log']._cron_archive_scan_logs(), 2)
+        self.assertFalse((done | dead).exists())
+        self.assertTrue(recent.exists())
+        self.assertEqual([row[2] for row in self.archived(done | dead)], ['done', 'dead'])
+
+    def test_rows_are_moved_in_committed_chunks(self):
+        logs = self.create_logs(5, age_days=100)
+
+        moved = self.env['device.scan.log']._cron_archive_scan_logs(chunk_size=2, max_chunks=2)
+        self.assertEqual(moved, 4)
+        self.assertEqual(len(logs.exists()), 1)
+        self.assertEqual(self.commit.call_count, 2)
+
+    def test_already_archived_id_is_replaced_not_lost(self):
+        log = self.create_logs(1, age_days=100)
+        self.env.cr.execute("INSERT INTO device_scan_log_archive (id, scan_data) VALUES (%s, 'stale copy')", (log.id,))
+
+        self.assertEqual(self.env['device.scan.log']._cron_archive_scan_logs(), 1)
+        self.assertEqual(self.archived(log), [(log.id, 'scan 0', 'pending')])
+
+    def test_zero_retention_keeps_everything(self):
+        self.env['ir.config_parameter'].set_param(RETENTION_PARAM, '0')
+        log = self.create_logs(1, age_days=100)
+        self.assertEqual(self.env['device.scan.log']._cron_archive_scan_logs(), 0)
+        self.assertTrue(log.exists())
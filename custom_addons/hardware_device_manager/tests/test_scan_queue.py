@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import SUPERUSER_ID, api, fields
+from odoo.tests.common import TransactionCase
+
+from ..models.device_scan_log import QUEUE_BACKOFF_BASE, QUEUE_MAX_ATTEMPTS
+
+
+class TestScanQueue(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.device = self.env['hardware.device'].create({
+            'name': 'Queue', 'device_id': 'QUEUE-1', 'device_type': 'barcode_scanner',
+        })
+        # No cron triggers from the tests
+        notify = patch.object(type(self.env['device.scan.log']), '_notify_queue')
+        notify.start()
+        self.addCleanup(notify.stop)
+
+    def create_logs(self, *scan_data):
+        return self.env['device.scan.log'].create([
+            {'device_id': self.device.id, 'scan_data': data, 'scan_type': 'barcode'} for data in scan_data
+        ])
+
+    def test_failures_back_off_then_move_to_dead_letter(self):
+        log = self.create_logs(False)
+        for attempt in range(1, QUEUE_MAX_ATTEMPTS):
+            before = fields.Datetime.now()
+            log._process_batch()
+            self.assertEqual(log.attempts, attempt)
+            self.assertEqual(log.state, 'pending')
+            delay = QUEUE_BACKOFF_BASE * 2 ** (attempt - 1)
+            self.assertGreaterEqual(log.next_attempt_at, before + timedelta(seconds=delay))
+            self.assertNotIn(log, self.env['device.scan.log']._claim_batch())
+            log.next_attempt_at = fields.Datetime.now() - timedelta(seconds=1)
+
+        log._process_batch()
+        self.assertEqual(log.state, 'dead')
+        self.assertFalse(log.next_attempt_at)
+        self.assertEqual(log.error_message, 'Empty scan data')
+        self.assertNotIn(log, self.env['device.scan.log']._claim_batch())
+
+    def test_one_failure_does_not_undo_the_batch(self):
+        good, bad = self.create_logs('123', False)
+        self.assertEqual((good | bad)._process_batch(), (1, 1))
+        self.assertEqual(good.state, 'done')
+        self.assertTrue(good.processed_date)
+        self.assertEqual(bad.attempts, 1)
+
+    def test_requeue_resets_dead_letters_only(self):
+        dead, done = self.create_logs('a', 'b')
+        dead.write({'state': 'dead', 'attempts': QUEUE_MAX_ATTEMPTS})
+        done.write({'state': 'done', 'processed': True})
+
+        (dead | done).action_requeue()
+        self.assertEqual((dead.state, dead.attempts, dead.next_attempt_at), ('pending', 0, False))
+        self.assertEqual(done.state, 'done')
+        self.assertIn(dead, self.env['device.scan.log']._claim_batch())
+
+
+class TestScanQueueClaims(TransactionCase):
+    """Claims from separate transactions; the rows are committed, then removed"""
+
+    def setUp(self):
+        super().setUp()
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            device = env['hardware.device'].create({
+                'name': 'Claims', 'device_id': 'CLAIMS-1', 'device_type': 'barcode_scanner',
+            })
+            logs = env['device.scan.log'].create([
+                {'device_id': device.id, 'scan_data': str(i), 'scan_type': 'barcode'} for i in range(6)
+            ])
+            self.device_id, self.log_ids = device.id, set(logs.ids)
+        self.addCleanup(self.remove_committed)
+
+    def remove_committed(self):
+        with self.registry.cursor() as cr:
+            cr.execute("DELETE FROM device_scan_log WHERE device_id = %s", (self.device_id,))
+            cr.execute("DELETE FROM hardware_device WHERE id = %s", (self.device_id,))
+
+    def test_concurrent_claims_are_disjoint(self):
+        with self.registry.cursor() as cr1, self.registry.cursor() as cr2:
+            first = api.Environment(cr1, SUPERUSER_ID, {})['device.scan.log']._claim_batch(limit=3)
+            # The second worker skips the rows the first one holds instead of waiting
+            second = api.Environment(cr2, SUPERUSER_ID, {})['device.scan.log']._claim_batch(limit=100)
+            first_ids, second_ids = set(first.ids) & self.log_ids, set(second.ids) & self.log_ids
+            cr1.rollback()
+            cr2.rollback()
+
+        self.assertEqual(len(first_ids), 3)
+        self.assertFalse(first_ids & second_ids)
+        self.assertEqual(first_ids | second_ids, self.log_ids)
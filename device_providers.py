@@ -0,0 +1,329 @@
+"""
+Platform device enumeration
+===========================
+
+Every provider returns the same normalized records, modelled on the
+Windows PnP fields the services already understood::
+
+    {'class': 'HIDClass', 'device_id': 'USB\\VID_05E0&PID_1900\\...',
+     'name': 'Symbol Bar Code Scanner', 'status': 'OK'}
+
+* LinuxSysfsProvider       - reads /sys (what udev exposes), no subprocess
+* PowerShellSessionProvider - one long-lived powershell.exe fed over stdin
+* FakeDeviceProvider       - fixed list, for tests and unsupported platforms
+
+DeviceInventory caches the result in the shared StateStore so every
+service (and every server worker) reuses one enumeration per TTL.
+"""
+
+import json
+import logging
+import platform
+import queue
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from state_store import get_state_store
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceProviderError(Exception):
+    pass
+
+
+class DeviceProvider:
+    """Enumerates devices present on this machine"""
+
+    name = 'base'
+
+    def list_devices(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FakeDeviceProvider(DeviceProvider):
+    name = 'fake'
+
+    def __init__(self, devices: Optional[List[Dict[str, Any]]] = None):
+        self.devices = devices or []
+        self.calls = 0
+
+    def list_devices(self):
+        self.calls += 1
+        return [dict(device) for device in self.devices]
+
+
+# USB base class codes -> Windows-style device class names
+USB_CLASS_NAMES = {
+    '01': 'Media',
+    '02': 'Net',
+    '03': 'HIDClass',
+    '06': 'Image',
+    '07': 'Printer',
+    '08': 'DiskDrive',
+    '09': 'USB',
+    '0b': 'SmartCardReader',
+    '0e': 'Camera',
+    'e0': 'Bluetooth',
+}
+
+
+class LinuxSysfsProvider(DeviceProvider):
+    name = 'sysfs'
+
+    def __init__(self, sysfs_root: str = '/sys'):
+        self.root = Path(sysfs_root)
+
+    @staticmethod
+    def _read(path: Path) -> Optional[str]:
+        try:
+            return path.read_text().strip()
+        except OSError:
+            return None
+
+    def _usb_class(self, device_dir: Path) -> str:
+        device_class = (self._read(device_dir / 'bDeviceClass') or '00').lower()
+        if device_class == '00':
+            # Class defined per interface; the first interface decides
+            for interface in sorted(device_dir.glob('*:*')):
+                interface_class = self._read(interface / 'bInterfaceClass')
+                if interface_class:
+                    device_class = interface_class.lower()
+                    break
+        return USB_CLASS_NAMES.get(device_class, 'USB')
+
+    def _usb_devices(self) -> List[Dict[str, Any]]:
+        devices = []
+        for device_dir in sorted((self.root / 'bus' / 'usb' / 'devices').glob('*')):
+            vendor = self._read(device_dir / 'idVendor')
+            product = self._read(device_dir / 'idProduct')
+            if not vendor or not product:
+                continue  # interfaces, not devices
+
+            serial = self._read(device_dir / 'serial') or device_dir.name
+            name = ' '.join(filter(None, [
+                self._read(device_dir / 'manufacturer'),
+                self._read(device_dir / 'product')
+            ])) or f'USB Device {vendor}:{product}'
+
+            devices.append({
+                'class': self._usb_class(device_dir),
+                'device_id': f'USB\\VID_{vendor.upper()}&PID_{product.upper()}\\{serial}',
+                'name': name,
+                'status': 'OK'
+            })
+        return devices
+
+    def _net_devices(self) -> List[Dict[str, Any]]:
+        devices = []
+        for net_dir in sorted((self.root / 'class' / 'net').glob('*')):
+            if net_dir.name == 'lo':
+                continue
+            devices.append({
+                'class': 'Net',
+                'device_id': f'NET\\{net_dir.name}',
+                'name': net_dir.name,
+                'status': 'OK' if self._read(net_dir / 'operstate') != 'down' else 'Degraded'
+            })
+        return devices
+
+    def _bluetooth_devices(self) -> List[Dict[str, Any]]:
+        return [{
+            'class': 'Bluetooth',
+            'device_id': f'BTH\\{hci_dir.name}',
+            'name': f'Bluetooth Adapter {hci_dir.name}',
+            'status': 'OK'
+        } for hci_dir in sorted((self.root / 'class' / 'bluetooth').glob('hci*'))]
+
+    def list_devices(self):
+        return self._usb_devices() + self._net_devices() + self._bluetooth_devices()
+
+
+class PowerShellSessionProvider(DeviceProvider):
+    """Keeps one PowerShell process warm and streams queries to it.
+
+    Starting powershell.exe costs hundreds of milliseconds, so instead of
+    one process per call the provider writes each query to the stdin of a
+    persistent ``powershell -Command -`` and reads stdout up to a sentinel.
+    """
+
+    name = 'powershell'
+    QUERY = ('Get-PnpDevice -PresentOnly | '
+             'Select-Object Class, DeviceID, FriendlyName, Status | '
+             'ConvertTo-Json -Compress')
+
+    def __init__(self, timeout: float = 15.0):
+        self.timeout = timeout
+        self._process: Optional[subprocess.Popen] = None
+        self._lines: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            ['powershell', '-NoLogo', '-NoProfile', '-NonInteractive', '-Command', '-'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._process, self._lines),
+                         name='powershell-reader', daemon=True).start()
+
+    @staticmethod
+    def _pump(process: subprocess.Popen, lines: queue.Queue):
+        for line in process.stdout:
+            lines.put(line.rstrip('\r\n'))
+        lines.put(None)  # process exited
+
+    def query(self, command: str) -> str:
+        """Run one single-line command in the session and return its stdout"""
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+
+            sentinel = f'__END_{uuid.uuid4().hex}__'
+            try:
+                self._process.stdin.write(f"{command}; Write-Output '{sentinel}'\n")
+                self._process.stdin.flush()
+            except OSError as e:
+                self._kill()
+                raise DeviceProviderError(f"PowerShell session write failed: {e}")
+
+            output = []
+            deadline = time.monotonic() + self.timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    line = self._lines.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    self._kill()
+                    raise DeviceProviderError("PowerShell query timed out")
+                if line is None:
+                    self._process = None
+                    raise DeviceProviderError("PowerShell session exited")
+                if line == sentinel:
+                    return '\n'.join(output)
+                output.append(line)
+
+    def list_devices(self):
+        output = self.query(self.QUERY).strip()
+        if not output:
+            return []
+
+        devices_data = json.loads(output)
+        # ConvertTo-Json emits a bare object for a single device
+        if isinstance(devices_data, dict):
+            devices_data = [devices_data]
+
+        return [{
+            'class': device.get('Class') or 'Unknown',
+            'device_id': device.get('DeviceID') or '',
+            'name': device.get('FriendlyName') or 'Unknown Device',
+            'status': device.get('Status') or 'Unknown'
+        } for device in devices_data]
+
+    def _kill(self):
+        if self._process is not None:
+            try:
+                self._process.kill()
+            except OSError:
+                pass
+            self._process = None
+
+    def close(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                try:
+                    self._process.stdin.write('exit\n')
+                    self._process.stdin.flush()
+                    self._process.wait(timeout=2)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+
+
+def get_default_provider() -> DeviceProvider:
+    system = platform.system()
+    if system == 'Windows':
+        return PowerShellSessionProvider()
+    if system == 'Linux':
+        return LinuxSysfsProvider()
+    logger.warning(f"No device provider for {system}, device inventory will be empty")
+    return FakeDeviceProvider()
+
+
+class DeviceInventory:
+    """TTL-cached device list shared through the StateStore.
+
+    A failed enumeration keeps serving the last known devices (or none)
+    and is not retried for failure_ttl seconds, so a broken provider
+    costs one timeout per failure_ttl instead of one per request.
+    """
+
+    def __init__(self, provider: DeviceProvider, ttl: float = 5.0, store=None, key: str = 'inventory',
+                 failure_ttl: float = 30.0):
+        self.provider = provider
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.store = store or get_state_store()
+        self.key = key
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_fresh(cached, ttl: float) -> bool:
+        if not cached:
+            return False
+        now = time.time()
+        return now - cached['fetched_at'] < ttl or now < cached.get('retry_at', 0)
+
+    def get(self, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Cached devices, re-enumerating if older than max_age (default ttl)"""
+        ttl = self.ttl if max_age is None else max_age
+        cached = self.store.get(self.key)
+        if self._is_fresh(cached, ttl):
+            return cached['devices']
+
+        # Only one thread enumerates; the rest wait and reuse its result
+        with self._lock:
+            cached = self.store.get(self.key)
+            if self._is_fresh(cached, ttl):
+                return cached['devices']
+            return self.refresh()
+
+    def refresh(self) -> List[Dict[str, Any]]:
+        try:
+            devices = self.provider.list_devices()
+        except Exception as e:
+            logger.error(f"Device enumeration via {self.provider.name} failed: {e}")
+            cached = self.store.get(self.key) or {'fetched_at': 0, 'devices': []}
+            self.store.set(self.key, dict(cached, retry_at=time.time() + self.failure_ttl))
+            return cached['devices']
+
+        self.store.set(self.key, {'fetched_at': time.time(), 'devices': devices})
+        return devices
+
+    def invalidate(self):
+        self.store.update(self.key, lambda cached: (None, None))
+
+
+_inventory: Optional[DeviceInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory() -> DeviceInventory:
+    """Process-wide inventory on the platform's default provider"""
+    global _inventory
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = DeviceInventory(get_default_provider())
+        return _inventory
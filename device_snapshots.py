@@ -0,0 +1,109 @@
+"""
+Warm-start snapshots of discovered devices.
+
+NetworkScanner and BluetoothManager each keep one small JSON file with the
+devices they know about (address, type, ports/services, the endpoint that
+last connected, last_seen). It is written periodically while scanning and
+once more at shutdown, always to a temporary file in the same directory
+that then replaces the old snapshot with os.replace, so a crash mid-write
+leaves the previous snapshot intact. On startup the managers restore from
+it and verify the devices in the background instead of waiting for a full
+discovery cycle.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+class DeviceSnapshot:
+    def __init__(self, path: str, interval: float = 60.0, max_age: Optional[float] = None):
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self._last_written: Optional[bytes] = None
+
+    @classmethod
+    def from_config(cls, config, name: str) -> Optional['DeviceSnapshot']:
+        """Snapshot file for one manager ('network', 'bluetooth'), None when disabled"""
+        if not getattr(config, 'ENABLE_STATE_SNAPSHOTS', False):
+            return None
+        return cls(
+            path=os.path.join(config.STATE_SNAPSHOT_DIR, f'{name}_state.json'),
+            interval=getattr(config, 'STATE_SNAPSHOT_INTERVAL', 60),
+            max_age=getattr(config, 'STATE_SNAPSHOT_MAX_AGE', None),
+        )
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Device records of the last snapshot, minus those older than max_age"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = json.loads(f.read())
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable state snapshot %s: %s", self.path, e)
+            return []
+
+        if not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION:
+            logger.warning("Ignoring state snapshot %s with unknown format", self.path)
+            return []
+
+        records = data.get('devices', [])
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            records = [record for record in records if record.get('last_seen', 0) >= cutoff]
+        return records
+
+    def save(self, records: List[Dict[str, Any]]) -> bool:
+        """Write the snapshot atomically; skipped when nothing changed since the last write"""
+        payload = json.dumps(
+            {'version': SNAPSHOT_VERSION, 'devices': records}, separators=(',', ':')
+        ).encode('utf-8')
+        if payload == self._last_written:
+            return False
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.state-', suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            tmp_path = None
+        except OSError as e:
+            logger.warning("Could not write state snapshot %s: %s", self.path, e)
+            return False
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+        self._last_written = payload
+        return True
+
+    async def save_async(self, records: List[Dict[str, Any]]) -> bool:
+        """save() off the event loop; take the records on the loop, before calling"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.save, records)
+
+    async def run(self, snapshot: Callable[[], List[Dict[str, Any]]]):
+        """Save snapshot() every interval until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save_async(snapshot())
+            except Exception as e:
+                logger.error("Error saving state snapshot: %s", e)
@@ -4,9 +4,17 @@ import socket
 import time
 from typing import Dict, Optional, Any
 from ip_driver import NetworkScanner, NetworkDevice, NetworkDeviceType
+from utils.metrics import REGISTRY
 
 _logger = logging.getLogger(__name__)
 
+CONNECTOR_CONNECTIONS = REGISTRY.counter(
+    'device_connector_connections_total', 'DeviceConnector connection attempts', ['device_type', 'result']
+)
+CONNECTOR_CONNECT_SECONDS = REGISTRY.histogram(
+    'device_connector_connect_duration_seconds', 'Time spent in DeviceConnector.connect_device', ['device_type']
+)
+
 class DeviceConnector:
     """Handles actual device connections and communication"""
     
@@ -16,21 +24,28 @@ class DeviceConnector:
     
     def connect_device(self, ip_address: str, device_type: str) -> bool:
         """Connect to a specific device"""
+        started = time.perf_counter()
         try:
             if device_type == 'barcode_scanner':
-                return self._connect_barcode_scanner(ip_address)
+                connected = self._connect_barcode_scanner(ip_address)
             elif device_type == 'nfc_reader':
-                return self._connect_nfc_reader(ip_address)
+                connected = self._connect_nfc_reader(ip_address)
             elif device_type == 'qr_scanner':
-                return self._connect_qr_scanner(ip_address)
+                connected = self._connect_qr_scanner(ip_address)
             elif device_type == 'printer':
-                return self._connect_printer(ip_address)
+                connected = self._connect_printer(ip_address)
             else:
-                return self._connect_generic_device(ip_address)
+                connected = self._connect_generic_device(ip_address)
+            
+            CONNECTOR_CONNECTIONS.labels(device_type, 'success' if connected else 'failure').inc()
+            return connected
                 
         except Exception as e:
+            CONNECTOR_CONNECTIONS.labels(device_type, 'error').inc()
             self.logger.error(f"Error connecting to {device_type} at {ip_address}: {e}")
             return False
+        finally:
+            CONNECTOR_CONNECT_SECONDS.labels(device_type).observe(time.perf_counter() - started)
     
     def _connect_barcode_scanner(self, ip_address: str) -> bool:
         """Connect to barcode scanner"""
@@ -156,6 +171,20 @@ class DeviceConnector:
                 device_info = self.connected_devices[ip_address]
                 if device_info.get('connection'):
                     device_info['connection'].close()
-                    del self.connected_devices[ip_address]
-                    self.logger.info(f"Disconnected from {device_info['type']} at {ip_address}:{device_info['port']}")
-                    return True
\ No newline at end of file
+                del self.connected_devices[ip_address]
+                self.logger.info(f"Disconnected from {device_info['type']} at {ip_address}:{device_info['port']}")
+                return True
+            
+            return False
+            
+        except Exception as e:
+            self.logger.error(f"Error disconnecting from {ip_address}: {e}")
+            return False
+    
+    def _test_tcp_connection(self, ip_address: str, port: int, timeout: float = 2.0) -> bool:
+        """Check whether a TCP port accepts connections"""
+        try:
+            with socket.create_connection((ip_address, port), timeout=timeout):
+                return True
+        except OSError:
+            return False
@@ -0,0 +1,218 @@
+"""
+Publish/subscribe of scanner events for the /events SSE stream.
+
+EventBus fans events out inside one process. SharedEventBus also carries
+them between server worker processes through the shared StateStore, so a
+client connected to any worker sees detections from scanners running in
+every worker.
+
+Each open SSE stream holds one server thread for as long as the client
+stays connected (gunicorn gthread: --threads, 8 per worker by default),
+so size --threads for the expected stream count plus regular requests.
+"""
+
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from state_store import StateStore
+
+# Events kept in the shared log for workers that poll late
+EVENT_LOG_SIZE = 256
+EVENT_LOG_KEY = 'events'
+
+
+class Subscription:
+    """A single consumer of an EventBus with its own bounded queue.
+
+    When the queue is full the oldest pending event is dropped so a slow
+    consumer only ever loses its own backlog and never blocks publishers.
+    """
+
+    def __init__(self, bus: 'EventBus', device_types: Optional[Iterable[str]] = None, max_queue: int = 256):
+        self.bus = bus
+        self.device_types = set(device_types) if device_types else None
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.delivered = 0
+        self.closed = False
+
+    def accepts(self, event: Dict[str, Any]) -> bool:
+        return self.device_types is None or event.get('device_type') in self.device_types
+
+    def offer(self, event: Dict[str, Any]):
+        """Enqueue without blocking, dropping the oldest event on overflow"""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within timeout"""
+        try:
+            event = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.delivered += 1
+        return event
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class EventBus:
+    """In-process publish/subscribe bus for scanner events"""
+
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._sequence = itertools.count(1)
+        self.published = 0
+
+    def subscribe(self, device_types: Optional[Iterable[str]] = None, max_queue: Optional[int] = None) -> Subscription:
+        subscription = Subscription(self, device_types, max_queue or self.max_queue)
+        with self._lock:
+            # Copy-on-write so publish() can iterate without holding the lock
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscription]
+
+    def publish(self, device_type: str, payload: Dict[str, Any], event: str = 'detected') -> Dict[str, Any]:
+        message = {
+            'id': next(self._sequence),
+            'event': event,
+            'device_type': device_type,
+            'data': payload,
+            'published_at': time.time()
+        }
+        self.published += 1
+        self._deliver(message)
+        return message
+
+    def _deliver(self, message: Dict[str, Any]):
+        for subscription in self._subscribers:
+            if subscription.accepts(message):
+                subscription.offer(message)
+
+    def stats(self) -> Dict[str, Any]:
+        subscribers = self._subscribers
+        return {
+            'published': self.published,
+            'subscribers': len(subscribers),
+            'dropped': sum(s.dropped for s in subscribers),
+            'queued': sum(s.queue.qsize() for s in subscribers)
+        }
+
+
+class SharedEventBus(EventBus):
+    """EventBus whose events reach subscribers in every worker process.
+
+    publish() appends the event to a bounded log in the StateStore, which
+    also assigns the ids, and a relay thread in each process polls the log
+    every ``poll_interval`` seconds and delivers new events to the local
+    subscribers. Events published by this process take the same path, so
+    every subscriber sees one sequence of ids whichever worker it is on.
+    """
+
+    def __init__(self, store: StateStore, max_queue: int = 256, poll_interval: float = 0.2,
+                 log_size: int = EVENT_LOG_SIZE):
+        super().__init__(max_queue)
+        self.store = store
+        self.poll_interval = poll_interval
+        self.log_size = log_size
+        self.logger = logging.getLogger(__name__)
+        self._relay: Optional[threading.Thread] = None
+        self._last_id = 0
+
+    def subscribe(self, device_types: Optional[Iterable[str]] = None, max_queue: Optional[int] = None) -> Subscription:
+        self._ensure_relay()
+        return super().subscribe(device_types, max_queue)
+
+    def publish(self, device_type: str, payload: Dict[str, Any], event: str = 'detected') -> Dict[str, Any]:
+        message = {
+            'event': event,
+            'device_type': device_type,
+            'data': payload,
+            'published_at': time.time()
+        }
+
+        def append(log):
+            log = log or {'next_id': 1, 'messages': []}
+            message['id'] = log['next_id']
+            log['next_id'] += 1
+            log['messages'] = (log['messages'] + [message])[-self.log_size:]
+            return log, message
+
+        self.store.update(EVENT_LOG_KEY, append)
+        self.published += 1
+        return message
+
+    def _ensure_relay(self):
+        with self._lock:
+            if self._relay is not None:
+                return
+            # Only events published from now on are streamed
+            self._last_id = self.store.get(EVENT_LOG_KEY, {}).get('next_id', 1) - 1
+            self._relay = threading.Thread(target=self._run_relay, name='event-relay', daemon=True)
+            self._relay.start()
+
+    def _run_relay(self):
+        while True:
+            try:
+                self.relay_once()
+            except Exception as e:
+                self.logger.warning("Event relay failed: %s", e)
+            time.sleep(self.poll_interval)
+
+    def relay_once(self) -> int:
+        """Deliver events logged since the last poll; returns how many"""
+        messages = self.store.get(EVENT_LOG_KEY, {}).get('messages', [])
+        delivered = 0
+        for message in messages:
+            if message['id'] > self._last_id:
+                self._deliver(message)
+                self._last_id = message['id']
+                delivered += 1
+        return delivered
+
+
+def format_sse(message: Dict[str, Any]) -> str:
+    """Render a bus message as a Server-Sent Events frame"""
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {json.dumps(message)}\n\n"
+
+
+def sse_stream(subscription: Subscription, keepalive: float = 15.0):
+    """Generator of SSE frames; closes the subscription when the client goes away"""
+    try:
+        yield ": connected\n\n"
+        while True:
+            message = subscription.get(timeout=keepalive)
+            if message is None:
+                # Comment frame keeps proxies and idle connections open
+                yield ": keepalive\n\n"
+            else:
+                yield format_sse(message)
+    finally:
+        subscription.close()
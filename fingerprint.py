@@ -0,0 +1,390 @@
+"""
+Protocol fingerprinting for network devices.
+
+Signatures live in fingerprints.json: each names a device type (a
+NetworkDeviceType value) and manufacturer, and lists evidence that points
+to it - typical ports, service banner patterns, HTTP title / header / body
+patterns and IPP attributes (printer-make-and-model or the mDNS TXT
+equivalent). At load time all patterns for one field are compiled into a
+single alternation with one named group per signature, so a field is
+scanned once no matter how many signatures exist.
+
+Evidence is only ever read, never printed: nothing is written to raw
+print ports (a receipt printer prints whatever arrives there), and IPP
+printers are asked for printer-make-and-model with Get-Printer-Attributes.
+
+Matches are cached per (MAC, port set): a device that looks the same as
+last time is not probed or re-matched again. Evidence that matched nothing
+is cached for NEGATIVE_TTL only, and an empty probe is not cached at all.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SIGNATURES_FILE = Path(__file__).with_name('fingerprints.json')
+
+BANNER_LIMIT = 256  # bytes read from a service banner
+HTTP_BODY_LIMIT = 16 * 1024  # bytes of an HTTP body inspected
+IPP_RESPONSE_LIMIT = 8 * 1024  # bytes of an IPP response inspected
+CACHE_SIZE = 4096
+NEGATIVE_TTL = 1800  # seconds a "no signature matched" result is reused
+
+# Raw print ports (JetDirect/AppSocket): anything written there is printed
+RAW_PRINT_PORTS = frozenset({9100, 9101, 9102})
+IPP_PORT = 631
+
+# Points per kind of evidence; a match needs at least MIN_SCORE
+WEIGHTS = {'ports': 1, 'banner': 3, 'http_title': 3, 'http_header': 2, 'http_body': 1, 'ipp': 4}
+MIN_SCORE = 2
+
+TITLE_RE = re.compile(rb'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    name: str
+    device_type: str
+    manufacturer: Optional[str] = None
+    model: Optional[str] = None
+    score: int = 0
+
+
+class _PatternMatcher:
+    """Many signatures' patterns for one field, each searched on its own.
+
+    A single alternation scanned with finditer only reports non-overlapping
+    matches, first alternative winning, so a signature whose pattern
+    overlaps an earlier one on the same text would get no evidence and the
+    scores would depend on file order.
+    """
+
+    def __init__(self, patterns: List[Tuple[int, str]]):
+        self.patterns = [(signature, re.compile(pattern, re.IGNORECASE)) for signature, pattern in patterns]
+
+    def match(self, text: str) -> set:
+        if not text:
+            return set()
+        return {signature for signature, regex in self.patterns if regex.search(text)}
+
+
+def _ipp_attribute(tag: int, name: str, value: str) -> bytes:
+    name_bytes, value_bytes = name.encode('ascii'), value.encode('utf-8')
+    return (struct.pack('>BH', tag, len(name_bytes)) + name_bytes
+            + struct.pack('>H', len(value_bytes)) + value_bytes)
+
+
+def ipp_make_and_model_request(ip: str, port: int = IPP_PORT) -> bytes:
+    """HTTP POST carrying an IPP Get-Printer-Attributes for printer-make-and-model"""
+    body = (
+        struct.pack('>BBHI', 1, 1, 0x000B, 1)  # IPP/1.1, Get-Printer-Attributes, request-id 1
+        + b'\x01'  # operation-attributes-tag
+        + _ipp_attribute(0x47, 'attributes-charset', 'utf-8')
+        + _ipp_attribute(0x48, 'attributes-natural-language', 'en')
+        + _ipp_attribute(0x45, 'printer-uri', f'ipp://{ip}:{port}/ipp/print')
+        + _ipp_attribute(0x44, 'requested-attributes', 'printer-make-and-model')
+        + b'\x03'  # end-of-attributes-tag
+    )
+    head = (
+        f'POST /ipp/print HTTP/1.1\r\nHost: {ip}:{port}\r\n'
+        f'Content-Type: application/ipp\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+    )
+    return head.encode('ascii') + body
+
+
+def parse_ipp_make_and_model(response: bytes) -> Optional[str]:
+    """printer-make-and-model from a raw HTTP response to the request above"""
+    head, sep, body = response.partition(b'\r\n\r\n')
+    if not sep or not head.startswith(b'HTTP/'):
+        return None
+    if b'transfer-encoding: chunked' in head.lower():
+        body = _dechunk(body)
+
+    # version(2) status(2) request-id(4), then tagged attributes
+    position = 8
+    while position < len(body):
+        tag = body[position]
+        position += 1
+        if tag == 0x03:
+            break
+        if tag < 0x10:  # delimiter: start of the next attribute group
+            continue
+        if position + 2 > len(body):
+            break
+        (name_length,) = struct.unpack_from('>H', body, position)
+        name = body[position + 2:position + 2 + name_length]
+        position += 2 + name_length
+        if position + 2 > len(body):
+            break
+        (value_length,) = struct.unpack_from('>H', body, position)
+        value = body[position + 2:position + 2 + value_length]
+        position += 2 + value_length
+        if name == b'printer-make-and-model':
+            return value.decode('utf-8', errors='replace').strip() or None
+    return None
+
+
+def _dechunk(body: bytes) -> bytes:
+    chunks = []
+    while body:
+        size_line, sep, rest = body.partition(b'\r\n')
+        try:
+            size = int(size_line.split(b';')[0], 16)
+        except ValueError:
+            break
+        if not sep or size == 0:
+            break
+        chunks.append(rest[:size])
+        body = rest[size + 2:]
+    return b''.join(chunks)
+
+
+class FingerprintEngine:
+    def __init__(self, path: Path = SIGNATURES_FILE, cache_size: int = CACHE_SIZE):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        self.signatures: List[Dict[str, Any]] = data.get('signatures', [])
+        self.probes: Dict[int, bytes] = {}
+        for port, payload in data.get('probes', {}).items():
+            port = int(port)
+            if payload and port in RAW_PRINT_PORTS:
+                logger.warning("Ignoring fingerprint probe for raw print port %s: it would be printed", port)
+                payload = ''
+            self.probes[port] = payload.encode('latin-1')
+        self._port_owners: Dict[int, List[int]] = {}
+        self._models: Dict[int, re.Pattern] = {}
+
+        fields: Dict[str, List[Tuple[int, str]]] = {
+            'banner': [], 'http_title': [], 'http_body': [], 'ipp': []
+        }
+        headers: Dict[str, List[Tuple[int, str]]] = {}
+        for index, signature in enumerate(self.signatures):
+            for port in signature.get('ports', []):
+                self._port_owners.setdefault(port, []).append(index)
+            for field, patterns in fields.items():
+                patterns.extend((index, pattern) for pattern in signature.get(field, []))
+            for header, patterns in signature.get('http_header', {}).items():
+                headers.setdefault(header.lower(), []).extend((index, pattern) for pattern in patterns)
+            if signature.get('model'):
+                self._models[index] = re.compile(signature['model'], re.IGNORECASE)
+
+        self._matchers = {field: _PatternMatcher(patterns) for field, patterns in fields.items()}
+        self._header_matchers = {header: _PatternMatcher(patterns) for header, patterns in headers.items()}
+
+        # key -> (fingerprint, expiry on the monotonic clock or None)
+        self._cache: 'OrderedDict[Tuple[str, FrozenSet[int]], Tuple[Optional[Fingerprint], Optional[float]]]' = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _cache_key(mac: Optional[str], ports: Iterable[int]):
+        return (mac.upper(), frozenset(ports)) if mac else None
+
+    def lookup(self, mac: Optional[str], ports: Iterable[int]) -> Tuple[bool, Optional[Fingerprint]]:
+        """(hit, fingerprint) for a device seen before with the same ports"""
+        key = self._cache_key(mac, ports)
+        if key is None:
+            return False, None
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return False, None
+            result, expires = entry
+            if expires is not None and time.monotonic() >= expires:
+                del self._cache[key]
+                return False, None
+            self._cache.move_to_end(key)
+            return True, result
+
+    def _store(self, mac: Optional[str], ports: Iterable[int], result: Optional[Fingerprint]):
+        key = self._cache_key(mac, ports)
+        if key is None:
+            return
+        # A miss may be down to a device that was busy or still booting
+        expires = None if result is not None else time.monotonic() + NEGATIVE_TTL
+        with self._cache_lock:
+            self._cache[key] = (result, expires)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+
+    def parse_http(self, body: bytes, headers: Dict[str, str]) -> Dict[str, Any]:
+        """Evidence from an HTTP response: title, server and matched signatures"""
+        body = body[:HTTP_BODY_LIMIT]
+        title_match = TITLE_RE.search(body)
+        title = title_match.group(1).decode('utf-8', errors='replace').strip() if title_match else None
+        headers = {name.lower(): value for name, value in headers.items()}
+
+        info: Dict[str, Any] = {}
+        if title:
+            info['title'] = title
+        if headers.get('server'):
+            info['server'] = headers['server']
+
+        best = self.identify(
+            None, (), http_title=title, http_headers=headers,
+            http_body=body.decode('utf-8', errors='replace'), min_score=1
+        )
+        if best:
+            info['device_type'] = best.device_type
+            if best.manufacturer:
+                info['manufacturer'] = best.manufacturer
+            if best.model:
+                info['model'] = best.model
+        return info
+
+    def identify(self, mac: Optional[str], ports: Iterable[int], banners: Optional[Dict[int, bytes]] = None,
+                 http_title: Optional[str] = None, http_headers: Optional[Dict[str, str]] = None,
+                 http_body: Optional[str] = None, ipp: Optional[str] = None,
+                 min_score: int = MIN_SCORE) -> Optional[Fingerprint]:
+        """Best-scoring signature for the evidence, cached per (mac, ports)"""
+        ports = frozenset(ports)
+        hit, cached = self.lookup(mac, ports)
+        if hit:
+            return cached
+
+        port_scores: Dict[int, int] = {}
+        scores: Dict[int, int] = {}
+        evidence: Dict[int, List[str]] = {}
+
+        def add(owners, field, text):
+            for owner in owners:
+                scores[owner] = scores.get(owner, 0) + WEIGHTS[field]
+                if text:
+                    evidence.setdefault(owner, []).append(text)
+
+        for port in ports:
+            for owner in self._port_owners.get(port, ()):
+                port_scores[owner] = port_scores.get(owner, 0) + WEIGHTS['ports']
+
+        banner_text = ' '.join(
+            banner.decode('latin-1') for banner in (banners or {}).values() if banner
+        )
+        add(self._matchers['banner'].match(banner_text), 'banner', banner_text)
+        add(self._matchers['http_title'].match(http_title or ''), 'http_title', http_title)
+        add(self._matchers['http_body'].match(http_body or ''), 'http_body', None)
+        add(self._matchers['ipp'].match(ipp or ''), 'ipp', ipp)
+        for header, value in (http_headers or {}).items():
+            matcher = self._header_matchers.get(header.lower())
+            if matcher:
+                add(matcher.match(value), 'http_header', value)
+
+        result = None
+        if scores:
+            # Ports alone never decide; they only add to signatures with real evidence
+            index, score = max(
+                ((owner, score + port_scores.get(owner, 0)) for owner, score in scores.items()),
+                key=lambda item: item[1]
+            )
+            if score >= min_score:
+                signature = self.signatures[index]
+                result = Fingerprint(
+                    name=signature['name'],
+                    device_type=signature['device_type'],
+                    manufacturer=signature.get('manufacturer'),
+                    model=self._model(index, evidence.get(index, [])),
+                    score=score,
+                )
+
+        # Only cache conclusions drawn from real evidence; an empty or failed
+        # probe says nothing about the device
+        if banner_text or http_title or http_headers or http_body or ipp:
+            self._store(mac, ports, result)
+        return result
+
+    def _model(self, index: int, texts: List[str]) -> Optional[str]:
+        pattern = self._models.get(index)
+        if pattern is None:
+            return None
+        for text in texts:
+            match = pattern.search(text)
+            if match:
+                return (match.group(1) if match.groups() else match.group(0)).strip()
+        return None
+
+    # ------------------------------------------------------------------
+    # Banner grabbing
+    # ------------------------------------------------------------------
+
+    async def grab_banner(self, ip: str, port: int, timeout: float = 1.0) -> bytes:
+        """First BANNER_LIMIT bytes a service sends (after its probe, if any)"""
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=timeout)
+            probe = self.probes.get(port)
+            if probe and port not in RAW_PRINT_PORTS:
+                writer.write(probe)
+                await writer.drain()
+            return await asyncio.wait_for(reader.read(BANNER_LIMIT), timeout=timeout)
+        except (asyncio.TimeoutError, OSError):
+            return b''
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def grab_banners(self, ip: str, ports: Iterable[int], timeout: float = 1.0) -> Dict[int, bytes]:
+        """Banners from the ports that have a probe configured, concurrently"""
+        targets = [port for port in ports if port in self.probes]
+        banners = await asyncio.gather(*(self.grab_banner(ip, port, timeout) for port in targets))
+        return {port: banner for port, banner in zip(targets, banners) if banner}
+
+    async def query_ipp(self, ip: str, port: int = IPP_PORT, timeout: float = 2.0) -> Optional[str]:
+        """printer-make-and-model via IPP Get-Printer-Attributes; prints nothing"""
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=timeout)
+            writer.write(ipp_make_and_model_request(ip, port))
+            await writer.drain()
+            response = b''
+            while len(response) < IPP_RESPONSE_LIMIT:
+                chunk = await asyncio.wait_for(reader.read(IPP_RESPONSE_LIMIT - len(response)), timeout=timeout)
+                if not chunk:
+                    break
+                response += chunk
+            return parse_ipp_make_and_model(response)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def collect(self, ip: str, ports: Iterable[int]) -> Dict[str, Any]:
+        """Banners and IPP make-and-model for identify(), gathered concurrently"""
+        ports = list(ports)
+        banners, ipp = await asyncio.gather(
+            self.grab_banners(ip, ports),
+            self.query_ipp(ip) if IPP_PORT in ports else asyncio.sleep(0, None),
+        )
+        return {'banners': banners, 'ipp': ipp}
+
+
+_engine: Optional[FingerprintEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_fingerprint_engine() -> FingerprintEngine:
+    """Process-wide engine, compiled on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FingerprintEngine()
+        return _engine
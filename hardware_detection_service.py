@@ -1,35 +1,42 @@
 from flask import Flask, jsonify, request
 import logging
 import socket
-import subprocess
 import re
-import platform
 import json
 import os
 import time
 from threading import Thread, Lock
 
+from device_providers import get_inventory
+from state_store import get_state_store
+from utils.metrics import instrument_flask_app
+
 app = Flask(__name__)
+instrument_flask_app(app, 'hardware_detection')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Global state
-state = {
-    'devices': [],
-    'scanning': False,
-    'last_scan': None,
-    'scan_lock': Lock()
-}
+# Shared state: devices and last_scan live in the state store so every
+# server worker sees the same inventory; the scan lock is a store lease
+# so only one worker scans at a time.
+store = get_state_store()
+scan_lock = Lock()
+SCAN_LEASE_TTL = 120  # seconds
+STARTUP_LEASE_TTL = 60  # seconds
+
+# Device classes this service reports
+DEVICE_CLASS_PATTERN = re.compile(r'Printer|USB|HIDClass|Camera|Media|Bluetooth|Net')
 
 def save_devices_to_file():
     """Save detected devices to a JSON file"""
     try:
         with open('detected_devices.json', 'w') as f:
-            json.dump(state['devices'], f)
-        logger.info(f"Saved {len(state['devices'])} devices to file")
+            devices = store.get('devices', [])
+            json.dump(devices, f)
+        logger.info(f"Saved {len(devices)} devices to file")
     except Exception as e:
         logger.error(f"Error saving devices to file: {e}")
 
@@ -38,8 +45,9 @@ def load_devices_from_file():
     try:
         if os.path.exists('detected_devices.json'):
             with open('detected_devices.json', 'r') as f:
-                state['devices'] = json.load(f)
-                logger.info(f"Loaded {len(state['devices'])} devices from file")
+                devices = json.load(f)
+                store.set('devices', devices)
+                logger.info(f"Loaded {len(devices)} devices from file")
     except Exception as e:
         logger.error(f"Error loading devices from file: {e}")
 
@@ -47,77 +55,69 @@ def detect_usb_devices():
     """Detect USB devices connected to the server"""
     devices = []
     
-    try:
-        if platform.system() == 'Windows':
-            # On Windows, use PowerShell to get USB devices
-            cmd = "Get-PnpDevice -PresentOnly | Where-Object { $_.Class -match 'Printer|USB|HIDClass|Camera|Media|Bluetooth|Net' } | Select-Object FriendlyName, DeviceID, Class | ConvertTo-Json"
-            output = subprocess.check_output(['powershell', '-Command', cmd], stderr=subprocess.STDOUT).decode('utf-8')
-            
-            # Parse JSON output
-            try:
-                device_list = json.loads(output)
-                # Handle case where only one device is returned (not in a list)
-                if not isinstance(device_list, list):
-                    device_list = [device_list]
-                    
-                for device in device_list:
-                    friendly_name = device.get('FriendlyName', 'Unknown Device')
-                    device_id = device.get('DeviceID', '')
-                    device_class = device.get('Class', '')
-                    
-                    # Determine device type based on class
-                    device_type = 'other'
-                    if 'Printer' in device_class:
-                        device_type = 'printer'
-                    elif 'Camera' in device_class or 'Camera' in friendly_name:
-                        device_type = 'camera'
-                    elif 'HID' in device_class and ('Scanner' in friendly_name or 'Scan' in friendly_name):
-                        device_type = 'scanner'
-                    elif 'Media' in device_class:
-                        device_type = 'media'
-                    
-                    devices.append({
-                        'name': friendly_name,
-                        'device_id': device_id,
-                        'type': device_type,
-                        'class': device_class
-                    })
-            except json.JSONDecodeError as je:
-                logger.error(f"JSON Decode Error: {je}")
-                logger.error(f"Raw output: {output}")
+    for device in get_inventory().get():
+        friendly_name = device.get('name', 'Unknown Device')
+        device_id = device.get('device_id', '')
+        device_class = device.get('class', '')
+        
+        if not DEVICE_CLASS_PATTERN.search(device_class):
+            continue
         
-        # TODO: Add detection for Linux and macOS
-        elif platform.system() == 'Linux':
-            # Linux USB device detection logic
-            pass
-        elif platform.system() == 'Darwin':  # macOS
-            # macOS USB device detection logic
-            pass
+        # Determine device type based on class
+        device_type = 'other'
+        if 'Printer' in device_class:
+            device_type = 'printer'
+        elif 'Camera' in device_class or 'Camera' in friendly_name:
+            device_type = 'camera'
+        elif 'HID' in device_class and ('Scanner' in friendly_name or 'Scan' in friendly_name):
+            device_type = 'scanner'
+        elif 'Media' in device_class:
+            device_type = 'media'
         
-        return devices
+        devices.append({
+            'name': friendly_name,
+            'device_id': device_id,
+            'type': device_type,
+            'class': device_class
+        })
     
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error detecting USB devices: {e}")
-        return []
+    return devices
+
+def startup():
+    """Restore saved devices and run the first scan in the background.
+
+    Called when the module is loaded, i.e. once per server worker; only
+    the worker that takes the startup lease does the work. The lease is
+    left to expire so workers starting alongside it skip the work too.
+    """
+    if not store.acquire_lease('startup', STARTUP_LEASE_TTL):
+        return False
+    load_devices_from_file()
+    Thread(target=scan_devices, name='initial-device-scan', daemon=True).start()
+    return True
 
 def scan_devices():
     """Perform a device scan in a thread-safe manner"""
-    with state['scan_lock']:
-        if state['scanning']:
+    if not scan_lock.acquire(blocking=False):
+        return False
+    
+    try:
+        if not store.acquire_lease('scan', SCAN_LEASE_TTL):
             return False
         
-        state['scanning'] = True
         try:
             devices = detect_usb_devices()
-            state['devices'] = devices
-            state['last_scan'] = time.time()
+            store.set('devices', devices)
+            store.set('last_scan', time.time())
             save_devices_to_file()
             return True
         except Exception as e:
             logger.error(f"Device scan error: {e}")
             return False
         finally:
-            state['scanning'] = False
+            store.release_lease('scan')
+    finally:
+        scan_lock.release()
 
 @app.route('/scan', methods=['POST'])
 def trigger_scan():
@@ -131,14 +131,11 @@ def trigger_scan():
 @app.route('/devices', methods=['GET'])
 def get_devices():
     """Endpoint to retrieve detected devices"""
-    return jsonify(state['devices'])
+    return jsonify(store.get('devices', []))
+
+# Runs under serve.py and the development server alike
+startup()
 
 if __name__ == '__main__':
-    # Load previously saved devices on startup
-    load_devices_from_file()
-    
-    # Optional: Perform initial scan
-    scan_devices()
-    
     # Run Flask app
     app.run(host='0.0.0.0', port=5000, debug=True)
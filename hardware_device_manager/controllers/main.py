@@ -1,35 +1,112 @@
-from odoo import http
+from odoo import http, fields
 from odoo.http import request
+from odoo.addons.hardware_device_manager.controllers.auth import HardwareAuthController
 import json
 import logging
+from datetime import timedelta
 
 _logger = logging.getLogger(__name__)
 
+# Largest batch accepted by /hardware/device/scan/batch
+MAX_SCAN_BATCH = 1000
+
+# /hardware/devices paging and projection
+DEVICE_LIST_FIELDS = ['name', 'device_id', 'device_type', 'status', 'agent_id', 'last_event', 'write_date']
+DEFAULT_PAGE_SIZE = 80
+MAX_PAGE_SIZE = 500
+# write_date is the writing transaction's start time, so a write can commit
+# with a write_date before a delta cursor handed out meanwhile. The cursor
+# lags by Odoo's default limit_time_real, past which requests are killed.
+DELTA_CURSOR_MARGIN = timedelta(seconds=120)
+
 class HardwareDeviceController(http.Controller):
     
-    @http.route('/hardware/devices', type='json', auth='user', methods=['GET'])
-    def get_devices(self):
-        """Get all hardware devices"""
-        devices = request.env['hardware.device'].search([])
-        return [{
-            'id': device.id,
-            'name': device.name,
-            'device_type': device.device_type,
-            'status': device.status,
-        } for device in devices]
+    @http.route('/hardware/devices', type='json', auth='user', methods=['GET', 'POST'])
+    def get_devices(self, offset=0, limit=DEFAULT_PAGE_SIZE, status=None, device_type=None,
+                    agent_id=None, since=None, after_id=None, with_total=False):
+        """Get one page of hardware devices.
+        
+        Filters: status, device_type, agent_id (single value or list).
+        Paging: offset/limit, or keyset with after_id (the previous page's
+        next_after_id), which stays constant-time on deep pages.
+        Delta mode: since=<server_time of a previous call> returns only
+        devices written after it. server_time lags DELTA_CURSOR_MARGIN behind
+        the clock, so deltas overlap and a device may be returned twice;
+        clients merge records by id.
+        total costs a count query; pass with_total=True on the first page only.
+        """
+        try:
+            limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+            offset = max(0, int(offset))
+            after_id = int(after_id) if after_id else None
+            
+            domain = []
+            for field_name, value in (('status', status), ('device_type', device_type), ('agent_id', agent_id)):
+                if isinstance(value, list):
+                    domain.append((field_name, 'in', value))
+                elif value:
+                    domain.append((field_name, '=', value))
+            if since:
+                domain.append(('write_date', '>', fields.Datetime.to_datetime(since)))
+        except (TypeError, ValueError) as e:
+            return {'success': False, 'error': f'Invalid parameter: {e}'}
+        
+        devices = request.env['hardware.device']
+        server_time = fields.Datetime.now() - DELTA_CURSOR_MARGIN
+        
+        page_domain = domain
+        if after_id:
+            # Keyset pagination: seek past the last id instead of counting rows
+            page_domain = domain + [('id', '>', after_id)]
+            offset = 0
+        
+        records = devices.search_read(page_domain, DEVICE_LIST_FIELDS, offset=offset,
+                                      limit=limit, order='id', load=None)
+        for record in records:
+            for date_field in ('last_event', 'write_date'):
+                if record[date_field]:
+                    record[date_field] = fields.Datetime.to_string(record[date_field])
+        
+        return {
+            'success': True,
+            'records': records,
+            'total': devices.search_count(domain) if with_total else None,
+            'offset': offset,
+            'limit': limit,
+            'next_after_id': records[-1]['id'] if len(records) == limit else None,
+            'server_time': fields.Datetime.to_string(server_time),
+        }
+    
+    def _resolve_device_id(self, device_ref):
+        """(record_id, verified) for a numeric record id or an agent device_id string.
+        
+        Agent identifiers go through the ormcached resolver, so they cost no
+        query once warm and are known to exist; numeric ids still need an
+        existence check by the caller.
+        """
+        if isinstance(device_ref, bool) or device_ref is None:
+            return None, False
+        if isinstance(device_ref, int):
+            return device_ref, False
+        if isinstance(device_ref, str) and device_ref:
+            return request.env['hardware.device']._resolve_device_ref(device_ref), True
+        return None, False
     
     @http.route('/hardware/device/scan', type='json', auth='user', methods=['POST'])
     def device_scan(self, device_id, scan_data, scan_type):
-        """Record device scan data"""
+        """Record device scan data; device_id is a record id or the agent's device_id"""
         try:
-            device = request.env['hardware.device'].browse(device_id)
-            if device.exists():
+            record_id, verified = self._resolve_device_id(device_id)
+            device = request.env['hardware.device'].browse(record_id) if record_id else None
+            if device is not None and (verified or device.exists()):
                 # Create scan log
                 request.env['device.scan.log'].create({
-                    'device_id': device_id,
+                    'device_id': record_id,
                     'scan_data': scan_data,
                     'scan_type': scan_type,
                 })
+                # Processed asynchronously by the scan queue workers
+                request.env['device.scan.log']._notify_queue()
                 
                 # Update device last event
                 device.write({
@@ -42,4 +119,95 @@ class HardwareDeviceController(http.Controller):
                 return {'success': False, 'error': 'Device not found'}
         except Exception as e:
             _logger.error("Error recording scan: %s", str(e))
-            return {'success': False, 'error': str(e)}
\ No newline at end of file
+            return {'success': False, 'error': str(e)}
+    
+    @http.route('/hardware/scan/queue/metrics', type='json', auth='user', methods=['POST'])
+    def scan_queue_metrics(self):
+        """Scan processing queue depth and latency"""
+        return request.env['device.scan.log']._get_queue_metrics()
+    
+    @http.route('/hardware/device/scan/batch', type='json', auth='none', methods=['POST'], csrf=False)
+    def device_scan_batch(self, scans, token=None, agent_id=None):
+        """Record a batch of scans in one transaction.
+        
+        Called by agents with the token from /hardware/auth/login. Each scan
+        is validated on its own and rejected individually (bad scan_type or
+        scan_data, unknown device, or a device of another agent), so one bad
+        scan never costs the rest of the batch. Accepted scan logs are
+        inserted with a single multi-record create and each device's
+        last_event is written once, from the last scan for it in the batch.
+        Each scan's device_id may be a record id or the agent's device_id
+        string.
+        
+        A refused batch carries code INVALID_BATCH (resending cannot help);
+        SERVER_ERROR means the agent should retry later.
+        """
+        if not HardwareAuthController()._verify_request(token, agent_id):
+            return {'success': False, 'error': 'Authentication failed', 'code': 'AUTHENTICATION_FAILED'}
+        
+        if not isinstance(scans, list) or not scans:
+            return {'success': False, 'error': 'No scans provided', 'code': 'INVALID_BATCH'}
+        if len(scans) > MAX_SCAN_BATCH:
+            return {'success': False, 'error': f'Batch larger than {MAX_SCAN_BATCH} scans', 'code': 'INVALID_BATCH'}
+        
+        try:
+            scan_logs = request.env['device.scan.log'].sudo()
+            scan_types = set(scan_logs._fields['scan_type'].get_values(request.env))
+            
+            rejected = []
+            candidates = []
+            for index, scan in enumerate(scans):
+                if not isinstance(scan, dict):
+                    rejected.append({'index': index, 'error': 'Invalid scan'})
+                    continue
+                if scan.get('scan_type') not in scan_types:
+                    rejected.append({'index': index, 'error': f"Unknown scan_type {scan.get('scan_type')!r}"})
+                    continue
+                if not isinstance(scan.get('scan_data'), str) or not scan['scan_data']:
+                    rejected.append({'index': index, 'error': 'Missing scan_data'})
+                    continue
+                device_id, _verified = self._resolve_device_id(scan.get('device_id'))
+                if not device_id:
+                    rejected.append({'index': index, 'error': 'Device not found'})
+                    continue
+                candidates.append((index, scan, device_id))
+            
+            # One query checks existence and that the calling agent owns the device
+            owned_ids = set(request.env['hardware.device'].sudo().search([
+                ('id', 'in', list({device_id for _, _, device_id in candidates})),
+                ('agent_id', '=', int(agent_id)),
+            ]).ids) if candidates else set()
+            
+            log_vals = []
+            latest_scan = {}
+            for index, scan, device_id in candidates:
+                if device_id not in owned_ids:
+                    rejected.append({'index': index, 'error': 'Device not found'})
+                    continue
+                log_vals.append({
+                    'device_id': device_id,
+                    'scan_data': scan['scan_data'],
+                    'scan_type': scan['scan_type'],
+                })
+                # Later scans in the batch win
+                latest_scan[device_id] = scan
+            
+            if log_vals:
+                scan_logs.create(log_vals)
+                scan_logs._notify_queue()
+            
+            now = fields.Datetime.now()
+            for device_id, scan in latest_scan.items():
+                request.env['hardware.device'].sudo().browse(device_id).write({
+                    'last_event': now,
+                    'last_event_data': scan['scan_data'],
+                })
+            
+            return {
+                'success': True,
+                'recorded': len(log_vals),
+                'rejected': sorted(rejected, key=lambda rejection: rejection['index']),
+            }
+        except Exception as e:
+            _logger.error("Error recording scan batch: %s", str(e))
+            return {'success': False, 'error': str(e), 'code': 'SERVER_ERROR'}
\ No newline at end of file
@@ -2,8 +2,7 @@ import asyncio
 import socket
 import logging
 import time
-import ipaddress
-from typing import Dict, List, Optional, Callable, Any, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Callable, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import struct
@@ -22,6 +21,21 @@ except ImportError:
     NMAP_AVAILABLE = False
 
 from config import Config
+from network_ranges import ScanRange, build_scan_ranges, in_scope, interleave_hosts
+from passive_discovery import PassiveDiscovery
+from device_snapshots import DeviceSnapshot
+from fingerprint import HTTP_BODY_LIMIT, Fingerprint, get_fingerprint_engine
+from utils.logger import log_event
+from utils.metrics import REGISTRY
+from utils.tracing import Tracer
+
+SCAN_SECONDS = REGISTRY.histogram('network_scan_duration_seconds', 'Duration of one network sweep')
+HOSTS_SCANNED = REGISTRY.counter('network_hosts_scanned_total', 'Hosts probed per sweep, by ping result', ['result'])
+PROBE_TIMEOUTS = REGISTRY.counter('network_probe_timeouts_total', 'Port probes that timed out')
+NETWORK_CONNECTIONS = REGISTRY.counter('network_connections_total', 'Network device connection attempts', ['result'])
+PASSIVE_ANNOUNCEMENTS = REGISTRY.counter('network_passive_announcements_total', 'mDNS/SSDP announcements handled', ['source'])
+PASSIVE_SKIPPED = REGISTRY.counter('network_passive_skipped_total', 'Active probes skipped for recently announced hosts')
+NETWORK_DEVICES = REGISTRY.gauge('network_devices', 'Network devices known to the scanner', ['state'])
 
 class NetworkDeviceType(Enum):
     BARCODE_SCANNER = "barcode_scanner"
@@ -55,6 +69,8 @@ class NetworkDevice:
     last_seen: float = 0
     connection_attempts: int = 0
     response_time: Optional[float] = None
+    connected_port: Optional[int] = None  # endpoint of the last successful connection
+    connected_protocol: Optional[ConnectionProtocol] = None
     
     def __post_init__(self):
         if self.open_ports is None:
@@ -64,6 +80,37 @@ class NetworkDevice:
         if self.device_info is None:
             self.device_info = {}
         self.last_seen = time.time()
+    
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Compact record for the warm-start state file"""
+        return {
+            'ip': self.ip_address,
+            'hostname': self.hostname,
+            'mac': self.mac_address,
+            'type': self.device_type.value,
+            'ports': self.open_ports,
+            'protocols': [protocol.value for protocol in self.protocols],
+            'manufacturer': self.manufacturer,
+            'port': self.connected_port,
+            'protocol': self.connected_protocol.value if self.connected_protocol else None,
+            'last_seen': round(self.last_seen, 1),
+        }
+    
+    @classmethod
+    def from_snapshot(cls, record: Dict[str, Any]) -> 'NetworkDevice':
+        device = cls(
+            ip_address=record['ip'],
+            hostname=record.get('hostname'),
+            mac_address=record.get('mac'),
+            device_type=NetworkDeviceType(record.get('type', 'unknown')),
+            open_ports=list(record.get('ports', [])),
+            protocols=[ConnectionProtocol(value) for value in record.get('protocols', [])],
+            manufacturer=record.get('manufacturer'),
+            connected_port=record.get('port'),
+            connected_protocol=ConnectionProtocol(record['protocol']) if record.get('protocol') else None,
+        )
+        device.last_seen = record.get('last_seen', 0)
+        return device
 
 class NetworkScanner:
     def __init__(self, config: Config, device_callback: Optional[Callable] = None):
@@ -80,8 +127,23 @@ class NetworkScanner:
         self.scan_task = None
         self.connection_tasks: Dict[str, asyncio.Task] = {}
         
-        # Network configuration
-        self.scan_network = ipaddress.IPv4Network(self.config.NETWORK_SCAN_RANGE, strict=False)
+        # Hosts that announced themselves via mDNS/SSDP: ip -> monotonic time
+        self.passive_hosts: Dict[str, float] = {}
+        self.passive_discovery: Optional[PassiveDiscovery] = None
+        
+        # Signature-based identification, shared and compiled once per process
+        self.fingerprints = get_fingerprint_engine()
+        
+        # Opt-in per-stage tracing of sampled hosts
+        self.tracer = Tracer.from_config(config)
+        
+        # Warm-start state: snapshotted while scanning, restored on start
+        self.snapshot = DeviceSnapshot.from_config(config, 'network')
+        self.state_task = None
+        
+        # Network configuration: one or more ranges, with per-range stats
+        self.scan_ranges: List[ScanRange] = build_scan_ranges(self.config)
+        self.range_stats: Dict[str, Dict[str, Any]] = {}
         
         # Check available libraries
         self.aiohttp_available = AIOHTTP_AVAILABLE
@@ -140,7 +202,7 @@ class NetworkScanner:
             return False, None
             
         except Exception as e:
-            self.logger.debug(f"Ping failed for {ip}: {e}")
+            self.logger.debug("Ping failed for %s: %s", ip, e)
             return False, None
     
     async def _scan_port(self, ip: str, port: int, timeout: float = 1.0) -> bool:
@@ -151,10 +213,13 @@ class NetworkScanner:
             writer.close()
             await writer.wait_closed()
             return True
-        except (asyncio.TimeoutError, ConnectionRefusedError, OSError):
+        except asyncio.TimeoutError:
+            PROBE_TIMEOUTS.inc()
+            return False
+        except (ConnectionRefusedError, OSError):
             return False
         except Exception as e:
-            self.logger.debug(f"Port scan error for {ip}:{port}: {e}")
+            self.logger.debug("Port scan error for %s:%s: %s", ip, port, e)
             return False
     
     async def _scan_host_ports(self, ip: str) -> List[int]:
@@ -207,45 +272,28 @@ class NetworkScanner:
                                     data = await response.json()
                                     return {'source': endpoint, 'data': data}
                                 else:
-                                    text = await response.text()
-                                    # Look for device information in HTML/text
-                                    info = self._parse_device_info_from_text(text)
+                                    # Only the head of the page is needed to fingerprint it
+                                    body = await response.content.read(HTTP_BODY_LIMIT)
+                                    info = self.fingerprints.parse_http(body, dict(response.headers))
                                     if info:
                                         return {'source': endpoint, 'data': info}
                     except Exception:
                         continue
         
         except Exception as e:
-            self.logger.debug(f"HTTP device info failed for {ip}: {e}")
+            self.logger.debug("HTTP device info failed for %s: %s", ip, e)
         
         return {}
     
     def _parse_device_info_from_text(self, text: str) -> Dict[str, Any]:
         """Parse device information from HTML/text response"""
-        info = {}
-        text_lower = text.lower()
-        
-        # Look for common device identifiers
-        if 'printer' in text_lower:
-            info['device_type'] = 'printer'
-        elif 'scanner' in text_lower:
-            info['device_type'] = 'scanner'
-        elif 'camera' in text_lower:
-            info['device_type'] = 'camera'
-        
-        # Look for manufacturer information
-        manufacturers = ['hp', 'canon', 'epson', 'brother', 'zebra', 'honeywell', 'symbol']
-        for manufacturer in manufacturers:
-            if manufacturer in text_lower:
-                info['manufacturer'] = manufacturer.title()
-                break
-        
-        return info
+        return self.fingerprints.parse_http(text[:HTTP_BODY_LIMIT].encode('utf-8', errors='replace'), {})
     
     async def _resolve_hostname(self, ip: str) -> Optional[str]:
         """Resolve hostname for IP address"""
         try:
-            hostname = socket.gethostbyaddr(ip)[0]
+            # gethostbyaddr blocks; keep it off the event loop
+            hostname = (await asyncio.get_running_loop().run_in_executor(None, socket.gethostbyaddr, ip))[0]
             return hostname
         except (socket.herror, socket.gaierror):
             return None
@@ -275,82 +323,149 @@ class NetworkScanner:
                                     return part.upper()
         
         except Exception as e:
-            self.logger.debug(f"MAC address lookup failed for {ip}: {e}")
+            self.logger.debug("MAC address lookup failed for %s: %s", ip, e)
         
         return None
     
+    @staticmethod
+    def _protocols_for_ports(open_ports: List[int]) -> List[ConnectionProtocol]:
+        """Connection protocols implied by the open ports"""
+        protocols = []
+        if 80 in open_ports or 8080 in open_ports:
+            protocols.append(ConnectionProtocol.HTTP)
+        if 443 in open_ports or 8443 in open_ports:
+            protocols.append(ConnectionProtocol.HTTPS)
+        if 9100 in open_ports:
+            protocols.append(ConnectionProtocol.RAW)
+        if 631 in open_ports:
+            protocols.append(ConnectionProtocol.IPP)
+        if 515 in open_ports:
+            protocols.append(ConnectionProtocol.LPR)
+        if 554 in open_ports:
+            protocols.append(ConnectionProtocol.RTSP)
+        return protocols
+    
+    async def _collect_fingerprint(self, ip: str, open_ports: List[int], mac_task) -> Dict[str, Any]:
+        """Banner and IPP evidence for fingerprinting; empty when (MAC, ports) is cached"""
+        hit, _ = self.fingerprints.lookup(await mac_task, open_ports)
+        if hit:
+            return {}
+        return await self.fingerprints.collect(ip, open_ports)
+    
+    @staticmethod
+    def _apply_fingerprint(device: NetworkDevice, match: Optional[Fingerprint]):
+        """Let a signature match refine the port-based classification"""
+        if match is None:
+            return
+        try:
+            device.device_type = NetworkDeviceType(match.device_type)
+        except ValueError:
+            pass
+        device.manufacturer = device.manufacturer or match.manufacturer
+        device.device_info['fingerprint'] = {'name': match.name, 'model': match.model, 'score': match.score}
+    
+    @staticmethod
+    async def _run_stage(trace, stage: str, coro):
+        with trace.span(stage):
+            return await coro
+    
     async def _scan_single_host(self, ip: str) -> Optional[NetworkDevice]:
         """Scan a single host for device information"""
+        trace = self.tracer.host(ip)
         try:
             # First check if host is alive
-            is_alive, response_time = await self._ping_host(ip)
+            with trace.span('ping'):
+                is_alive, response_time = await self._ping_host(ip)
             
             if not is_alive:
+                HOSTS_SCANNED.labels('down').inc()
+                trace.finish(outcome='down')
                 return None
             
-            self.logger.debug(f"Host {ip} is alive, scanning ports...")
+            HOSTS_SCANNED.labels('alive').inc()
+            self.logger.debug("Host %s is alive, scanning ports...", ip)
             
             # Scan ports
-            open_ports = await self._scan_host_ports(ip)
+            with trace.span('ports'):
+                open_ports = await self._scan_host_ports(ip)
             
             if not open_ports:
-                self.logger.debug(f"No open ports found on {ip}")
+                self.logger.debug("No open ports found on %s", ip)
+                trace.finish(outcome='no_ports')
                 return None
             
-            # Get additional information
-            hostname = await self._resolve_hostname(ip)
-            mac_address = await self._get_mac_address(ip)
-            
-            # Try to get device info via HTTP
-            device_info = {}
-            if 80 in open_ports or 8080 in open_ports:
-                port = 80 if 80 in open_ports else 8080
-                device_info = await self._get_device_info_http(ip, port)
-            
-            # Identify device type
-            device_type = self._identify_device_type(ip, open_ports, device_info)
+            # The type depends on the open ports only, so classify before
+            # enrichment and don't spend it on hosts we would skip anyway
+            with trace.span('classify'):
+                device_type = self._identify_device_type(ip, open_ports)
             
             # Skip unknown devices if not configured to detect them
             if device_type == NetworkDeviceType.UNKNOWN:
-                self.logger.debug(f"Unknown device type for {ip}, skipping")
+                self.logger.debug("Unknown device type for %s, skipping", ip)
+                trace.finish(outcome=device_type.value, ports=len(open_ports))
                 return None
             
-            # Determine protocols
-            protocols = []
-            if 80 in open_ports or 8080 in open_ports:
-                protocols.append(ConnectionProtocol.HTTP)
-            if 443 in open_ports or 8443 in open_ports:
-                protocols.append(ConnectionProtocol.HTTPS)
-            if 9100 in open_ports:
-                protocols.append(ConnectionProtocol.RAW)
-            if 631 in open_ports:
-                protocols.append(ConnectionProtocol.IPP)
-            if 515 in open_ports:
-                protocols.append(ConnectionProtocol.LPR)
-            if 554 in open_ports:
-                protocols.append(ConnectionProtocol.RTSP)
-            
-            # Extract manufacturer from device info
-            manufacturer = None
-            if device_info and 'data' in device_info:
-                manufacturer = device_info['data'].get('manufacturer')
-            
             device = NetworkDevice(
                 ip_address=ip,
-                hostname=hostname,
-                mac_address=mac_address,
                 device_type=device_type,
                 open_ports=open_ports,
-                protocols=protocols,
-                manufacturer=manufacturer,
-                device_info=device_info,
+                protocols=self._protocols_for_ports(open_ports),
                 response_time=response_time
             )
             
+            # Enrichment stages run concurrently; fingerprint probing waits for
+            # the MAC only to skip itself when the result is already cached
+            mac_task = asyncio.ensure_future(self._run_stage(trace, 'mac', self._get_mac_address(ip)))
+            tasks: Dict[str, asyncio.Future] = {}
+            try:
+                # Publish the port-based result of a new host now; the same object
+                # is enriched below. With an allow-list the MAC has to pass first.
+                if self.device_callback and ip not in self.discovered_devices:
+                    if not self.config.ALLOWED_DEVICE_MACS or self._is_device_allowed(await mac_task):
+                        await self._safe_callback(device, 'partial')
+                
+                stages = {
+                    'hostname': self._resolve_hostname(ip),
+                    'probes': self._collect_fingerprint(ip, open_ports, mac_task),
+                }
+                if 80 in open_ports or 8080 in open_ports:
+                    stages['http_info'] = self._get_device_info_http(ip, 80 if 80 in open_ports else 8080)
+                tasks = {stage: asyncio.ensure_future(self._run_stage(trace, stage, coro))
+                         for stage, coro in stages.items()}
+                
+                results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+                results['mac'] = await mac_task
+            finally:
+                # A failed stage must not leave its siblings running; no-op when done
+                for task in (mac_task, *tasks.values()):
+                    task.cancel()
+            
+            device.hostname = results['hostname']
+            device.mac_address = results['mac']
+            device.device_info = results.get('http_info') or {}
+            
+            # Extract manufacturer from device info
+            http_data = device.device_info.get('data')
+            if isinstance(http_data, dict):
+                device.manufacturer = http_data.get('manufacturer')
+            else:
+                http_data = {}
+            
+            with trace.span('fingerprint'):
+                match = self.fingerprints.identify(
+                    device.mac_address, open_ports,
+                    banners=results['probes'].get('banners'),
+                    ipp=results['probes'].get('ipp'),
+                    http_title=http_data.get('title'),
+                    http_headers={'server': http_data['server']} if http_data.get('server') else None,
+                )
+            self._apply_fingerprint(device, match)
+            trace.finish(outcome=device.device_type.value, ports=len(open_ports))
+            
             return device
             
         except Exception as e:
-            self.logger.error(f"Error scanning host {ip}: {e}")
+            self.logger.error("Error scanning host %s: %s", ip, e)
             return None
     
     async def _handle_device_discovery(self, device: NetworkDevice):
@@ -358,9 +473,9 @@ class NetworkScanner:
         try:
             ip = device.ip_address
             
-            # Check if device is allowed (if MAC address is available)
-            if device.mac_address and not self._is_device_allowed(device.mac_address):
-                self.logger.debug(f"Device {ip} not in allowed list, skipping")
+            # Check if device is allowed
+            if not self._is_device_allowed(device.mac_address):
+                self.logger.debug("Device %s not in allowed list, skipping", ip)
                 return
             
             # Create or update device record
@@ -376,7 +491,11 @@ class NetworkScanner:
             else:
                 self.discovered_devices[ip] = device
                 
-                self.logger.info(f"Discovered network device: {device.hostname or ip} ({ip}) - Type: {device.device_type.value}")
+                if self.logger.isEnabledFor(logging.INFO):
+                    log_event(self.logger, logging.INFO, 'discovered',
+                              device=ip, hostname=device.hostname, transport='network',
+                              device_type=device.device_type.value, ports=device.open_ports,
+                              latency=device.response_time)
                 
                 # Notify callback about new device
                 if self.device_callback:
@@ -389,24 +508,30 @@ class NetworkScanner:
                     )
         
         except Exception as e:
-            self.logger.error(f"Error handling device discovery: {e}")
+            self.logger.error("Error handling device discovery: %s", e)
     
-    def _is_device_allowed(self, mac_address: str) -> bool:
+    def _is_device_allowed(self, mac_address: Optional[str]) -> bool:
         """Check if device is allowed based on MAC address whitelist"""
         if not self.config.ALLOWED_DEVICE_MACS:
             return True  # Empty list means allow all
+        if not mac_address:
+            return False  # Unknown MAC (e.g. routed subnet) cannot be on the list
         return mac_address.upper() in [mac.upper() for mac in self.config.ALLOWED_DEVICE_MACS]
     
     async def _connect_to_device(self, device: NetworkDevice) -> bool:
         """Attempt to connect to a network device"""
         try:
             ip = device.ip_address
-            self.logger.info(f"Attempting to connect to {device.hostname or ip} ({ip})")
+            started = time.monotonic()
+            self.logger.info("Attempting to connect to %s (%s)", device.hostname or ip, ip)
             
             # Try different connection methods based on available protocols
             connected = False
             
-            for protocol in device.protocols:
+            # The protocol that worked last time (e.g. from a restored snapshot) goes first
+            protocols = sorted(device.protocols, key=lambda protocol: protocol != device.connected_protocol)
+            
+            for protocol in protocols:
                 if protocol == ConnectionProtocol.HTTP and self.aiohttp_available:
                     connected = await self._test_http_connection(device)
                 elif protocol == ConnectionProtocol.RAW:
@@ -415,14 +540,21 @@ class NetworkScanner:
                     connected = await self._test_ipp_connection(device)
                 
                 if connected:
+                    device.connected_protocol = protocol
+                    device.connected_port = self._protocol_port(device, protocol)
                     break
             
             if connected:
                 device.is_connected = True
                 device.connection_attempts = 0
                 self.connected_devices[ip] = device
+                NETWORK_CONNECTIONS.labels('success').inc()
                 
-                self.logger.info(f"Connected to {device.hostname or ip}")
+                if self.logger.isEnabledFor(logging.INFO):
+                    log_event(self.logger, logging.INFO, 'connected',
+                              device=ip, hostname=device.hostname, transport='network',
+                              protocols=[protocol.value for protocol in device.protocols],
+                              latency=round(time.monotonic() - started, 3))
                 
                 # Notify callback about connection
                 if self.device_callback:
@@ -431,22 +563,31 @@ class NetworkScanner:
                 return True
             else:
                 device.connection_attempts += 1
+                NETWORK_CONNECTIONS.labels('failure').inc()
                 
                 # Check if we should stop trying to connect
                 if device.connection_attempts >= self.config.MAX_RECONNECT_ATTEMPTS:
-                    self.logger.warning(f"Max connection attempts reached for {device.hostname or ip}")
+                    self.logger.warning("Max connection attempts reached for %s", device.hostname or ip)
                     return False
             
             return False
             
         except Exception as e:
-            self.logger.error(f"Error connecting to device {ip}: {e}")
+            NETWORK_CONNECTIONS.labels('error').inc()
+            self.logger.error("Error connecting to device %s: %s", ip, e)
             return False
         finally:
             # Clean up connection task
             if device.ip_address in self.connection_tasks:
                 del self.connection_tasks[device.ip_address]
     
+    @staticmethod
+    def _protocol_port(device: NetworkDevice, protocol: ConnectionProtocol) -> Optional[int]:
+        """Port the connection test for a protocol uses"""
+        if protocol == ConnectionProtocol.HTTP:
+            return 80 if 80 in device.open_ports else 8080
+        return {ConnectionProtocol.RAW: 9100, ConnectionProtocol.IPP: 631}.get(protocol)
+    
     async def _test_http_connection(self, device: NetworkDevice) -> bool:
         """Test HTTP connection to device"""
         if not self.aiohttp_available:
@@ -505,7 +646,7 @@ class NetworkScanner:
             else:
                 self.device_callback(device, event)
         except Exception as e:
-            self.logger.error(f"Error in device callback: {e}")
+            self.logger.error("Error in device callback: %s", e)
     
     async def start_scanning(self):
         """Start network device scanning"""
@@ -518,15 +659,23 @@ class NetworkScanner:
             return
         
         self.is_scanning = True
-        self.logger.info(f"Starting network device scanning on {self.config.NETWORK_SCAN_RANGE}")
+        self.logger.info("Starting network device scanning on %s", ', '.join(r.cidr for r in self.scan_ranges))
         
         try:
+            if self.snapshot is not None:
+                await self.restore_state()
+                self.state_task = asyncio.create_task(self.snapshot.run(self.snapshot_state))
+            
+            if self.config.ENABLE_PASSIVE_DISCOVERY and self.passive_discovery is None:
+                self.passive_discovery = PassiveDiscovery(self.handle_announcement)
+                await self.passive_discovery.start()
+            
             while self.is_scanning:
                 await self.scan_once()
                 await asyncio.sleep(self.config.SCAN_INTERVAL)
         
         except Exception as e:
-            self.logger.error(f"Error during network scanning: {e}")
+            self.logger.error("Error during network scanning: %s", e)
         finally:
             self.is_scanning = False
     
@@ -535,6 +684,17 @@ class NetworkScanner:
         self.logger.info("Stopping network scanning")
         self.is_scanning = False
         
+        if self.passive_discovery is not None:
+            await self.passive_discovery.stop()
+            self.passive_discovery = None
+        
+        # Final snapshot while connection state is still intact
+        if self.state_task is not None:
+            self.state_task.cancel()
+            self.state_task = None
+        if self.snapshot is not None:
+            await self.snapshot.save_async(self.snapshot_state())
+        
         # Cancel all connection tasks
         for task in self.connection_tasks.values():
             if not task.done():
@@ -545,36 +705,231 @@ class NetworkScanner:
         for device in list(self.connected_devices.values()):
             await self._disconnect_device(device)
     
+    async def handle_announcement(self, ip: str, hints: Dict[str, Any]):
+        """Register a device that announced itself via mDNS/SSDP.
+        
+        When the announcement names a service port the device is registered
+        straight away; otherwise (plain SSDP) only that one host is probed.
+        Either way it is left out of active sweeps for PASSIVE_DISCOVERY_TTL.
+        """
+        PASSIVE_ANNOUNCEMENTS.labels(hints.get('source', 'unknown')).inc()
+        if not self._in_scope(ip):
+            self.logger.debug("Ignoring announcement from %s outside the scan ranges", ip)
+            return
+        self.passive_hosts[ip] = time.monotonic()
+        
+        known = self.discovered_devices.get(ip)
+        port = hints.get('port')
+        if port and (known is None or port not in known.open_ports):
+            open_ports = sorted(set(known.open_ports if known else []) | {port})
+            device_type = self._identify_device_type(ip, open_ports)
+            if device_type != NetworkDeviceType.UNKNOWN:
+                mac_address = known.mac_address if known else await self._get_mac_address(ip)
+                if not self._is_device_allowed(mac_address):
+                    self.logger.debug("Announced device %s not in allowed list, skipping", ip)
+                    return
+                device = NetworkDevice(
+                    ip_address=ip,
+                    hostname=hints.get('hostname'),
+                    mac_address=mac_address,
+                    device_type=device_type,
+                    open_ports=open_ports,
+                    protocols=self._protocols_for_ports(open_ports),
+                    manufacturer=hints.get('manufacturer'),
+                    device_info={'source': hints['source'], 'data': hints}
+                )
+                # mDNS TXT records carry the IPP make-and-model
+                self._apply_fingerprint(device, self.fingerprints.identify(mac_address, open_ports, ipp=hints.get('model')))
+                await self._handle_device_discovery(device)
+                return
+        
+        if known is None:
+            device = await self._scan_single_host(ip)
+            if device is not None:
+                await self._handle_device_discovery(device)
+        else:
+            known.last_seen = time.time()
+    
+    def _in_scope(self, ip: str) -> bool:
+        """Inside the configured scan ranges and not excluded"""
+        return in_scope(ip, self.scan_ranges, self.config.NETWORK_SCAN_EXCLUDE)
+    
+    def _recently_announced(self, ip: str) -> bool:
+        heard = self.passive_hosts.get(ip)
+        return (heard is not None and ip in self.discovered_devices
+                and time.monotonic() - heard < self.config.PASSIVE_DISCOVERY_TTL)
+    
+    def snapshot_state(self) -> List[Dict[str, Any]]:
+        """Records of all known devices, for the snapshot file"""
+        return [device.to_snapshot() for device in self.discovered_devices.values()]
+    
+    async def restore_state(self) -> int:
+        """Load the last snapshot and verify its devices in the background.
+        
+        Restored devices are known right away, so the first sweep only
+        updates them. Each is checked with a single connect to the port that
+        worked last time; live ones are announced and reconnected without
+        waiting for a sweep, dead ones are dropped again.
+        """
+        records = await asyncio.get_running_loop().run_in_executor(None, self.snapshot.load)
+        restored = 0
+        for record in records:
+            try:
+                device = NetworkDevice.from_snapshot(record)
+            except (KeyError, ValueError) as e:
+                self.logger.debug("Skipping invalid state record %r: %s", record, e)
+                continue
+            if device.ip_address in self.discovered_devices:
+                continue
+            # Ranges, exclusions and the allow-list may have changed since the snapshot
+            if not self._in_scope(device.ip_address) or not self._is_device_allowed(device.mac_address):
+                self.logger.debug("Not restoring %s: no longer in scope or allowed", device.ip_address)
+                continue
+            self.discovered_devices[device.ip_address] = device
+            self.connection_tasks[device.ip_address] = asyncio.create_task(self._verify_restored(device))
+            restored += 1
+        
+        if restored:
+            self.logger.info("Restored %s network devices from %s", restored, self.snapshot.path)
+        return restored
+    
+    async def _verify_restored(self, device: NetworkDevice):
+        ip = device.ip_address
+        restored_seen = device.last_seen
+        try:
+            port = device.connected_port or (device.open_ports[0] if device.open_ports else None)
+            alive = port is not None and await self._scan_port(ip, port)
+        finally:
+            self.connection_tasks.pop(ip, None)
+        
+        if not alive:
+            # Keep it if a sweep has seen the device in the meantime
+            if self.discovered_devices.get(ip) is device and device.last_seen == restored_seen:
+                del self.discovered_devices[ip]
+                self.logger.debug("Restored device %s is not reachable, dropped", ip)
+            return
+        
+        device.last_seen = time.time()
+        if self.device_callback:
+            await self._safe_callback(device, 'discovered')
+        if self.config.AUTO_CONNECT_DEVICES and not device.is_connected and ip not in self.connection_tasks:
+            self.connection_tasks[ip] = asyncio.create_task(self._connect_to_device(device))
+    
+    def refresh_scan_ranges(self):
+        """Rebuild the range list, picking up interface changes"""
+        self.scan_ranges = build_scan_ranges(self.config)
+    
+    def _start_range_stats(self, scan_range: ScanRange) -> Dict[str, Any]:
+        stats = self.range_stats.setdefault(scan_range.cidr, {
+            'interface': scan_range.interface,
+            'source': scan_range.source,
+            'hosts': scan_range.host_count,
+            'sweeps': 0,
+        })
+        stats.update(scanned=0, devices=0, last_scan=time.time(), last_duration=0.0)
+        stats['sweeps'] += 1
+        return stats
+    
+    def get_range_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-range progress of the current or last sweep"""
+        return {cidr: dict(stats) for cidr, stats in self.range_stats.items()}
+    
+    async def iter_scan(self, concurrency: int = 50) -> AsyncIterator[NetworkDevice]:
+        """Yield devices as soon as each host finishes scanning.
+        
+        A fixed pool of workers pulls addresses from a bounded queue that is
+        fed lazily, round-robin across all scan ranges, so memory stays flat
+        however large the ranges are and no subnet is flooded. Each range
+        also has its own cap on concurrent probes. Results go through a
+        bounded queue too: a slow consumer pauses the workers instead of
+        piling up devices.
+        """
+        work: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        done = object()
+        
+        per_range = self.config.NETWORK_RANGE_CONCURRENCY
+        limits = {scan_range.cidr: asyncio.Semaphore(per_range) for scan_range in self.scan_ranges}
+        stats = {scan_range.cidr: self._start_range_stats(scan_range) for scan_range in self.scan_ranges}
+        
+        async def produce():
+            for item in interleave_hosts(self.scan_ranges, self.config.NETWORK_SCAN_EXCLUDE):
+                if self._recently_announced(item[0]):
+                    # Announced itself recently and is already known: no probe needed
+                    PASSIVE_SKIPPED.inc()
+                    await results.put(self.discovered_devices[item[0]])
+                    continue
+                await work.put(item)
+            for _ in range(concurrency):
+                await work.put(None)
+        
+        async def scan_worker():
+            while True:
+                item = await work.get()
+                if item is None:
+                    return
+                ip, scan_range = item
+                range_stats = stats[scan_range.cidr]
+                async with limits[scan_range.cidr]:
+                    device = await self._scan_single_host(ip)
+                range_stats['scanned'] += 1
+                range_stats['last_duration'] = round(time.time() - range_stats['last_scan'], 3)
+                if device is not None:
+                    range_stats['devices'] += 1
+                    await results.put(device)
+        
+        async def run():
+            tasks = [asyncio.ensure_future(produce())]
+            tasks.extend(asyncio.ensure_future(scan_worker()) for _ in range(concurrency))
+            try:
+                await asyncio.gather(*tasks)
+            except asyncio.CancelledError:
+                # Closed early by the consumer: nobody is waiting for the sentinel
+                raise
+            except Exception:
+                for task in tasks:
+                    task.cancel()
+                await results.put(done)
+                raise
+            await results.put(done)
+        
+        runner = asyncio.ensure_future(run())
+        try:
+            while True:
+                device = await results.get()
+                if device is done:
+                    break
+                yield device
+            await runner  # surface worker errors
+        finally:
+            if not runner.done():
+                runner.cancel()
+                await asyncio.gather(runner, return_exceptions=True)
+    
     async def scan_once(self) -> List[NetworkDevice]:
         """Perform a single network scan"""
         try:
             self.logger.info("Performing network scan")
-            
-            # Get all IP addresses in the network range
-            ip_addresses = [str(ip) for ip in self.scan_network.hosts()]
-            
-            # Limit concurrent scans to avoid overwhelming the network
-            semaphore = asyncio.Semaphore(50)
-            
-            async def scan_with_semaphore(ip):
-                async with semaphore:
-                    return await self._scan_single_host(ip)
-            
-            # Scan all hosts concurrently
-            tasks = [scan_with_semaphore(ip) for ip in ip_addresses]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            started = time.perf_counter()
+            if self.config.NETWORK_AUTO_DETECT_SUBNETS:
+                self.refresh_scan_ranges()
+            sweep = self.tracer.start_sweep()
             
             discovered = []
-            for result in results:
-                if isinstance(result, NetworkDevice):
-                    await self._handle_device_discovery(result)
-                    discovered.append(result)
-            
-            self.logger.info(f"Network scan completed, found {len(discovered)} devices")
+            async for device in self.iter_scan():
+                await self._handle_device_discovery(device)
+                discovered.append(device)
+            
+            SCAN_SECONDS.observe(time.perf_counter() - started)
+            if sweep is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.tracer.finish_sweep, sweep)
+            NETWORK_DEVICES.labels('discovered').set(len(self.discovered_devices))
+            NETWORK_DEVICES.labels('connected').set(len(self.connected_devices))
+            self.logger.info("Network scan completed, found %s devices", len(discovered))
             return discovered
             
         except Exception as e:
-            self.logger.error(f"Error during network scan: {e}")
+            self.logger.error("Error during network scan: %s", e)
             return []
     
     async def _disconnect_device(self, device: NetworkDevice):
@@ -585,14 +940,14 @@ class NetworkScanner:
             if device.ip_address in self.connected_devices:
                 del self.connected_devices[device.ip_address]
             
-            self.logger.info(f"Disconnected from {device.hostname or device.ip_address}")
+            self.logger.info("Disconnected from %s", device.hostname or device.ip_address)
             
             # Notify callback about disconnection
             if self.device_callback:
                 await self._safe_callback(device, 'disconnected')
                 
         except Exception as e:
-            self.logger.error(f"Error disconnecting from {device.hostname or device.ip_address}: {e}")
+            self.logger.error("Error disconnecting from %s: %s", device.hostname or device.ip_address, e)
     
     def get_discovered_devices(self) -> List[NetworkDevice]:
         """Get list of all discovered devices"""
@@ -604,5 +959,4 @@ class NetworkScanner:
     
     def get_device_by_ip(self, ip: str) -> Optional[NetworkDevice]:
         """Get device by IP address"""
-        return self.discovered_devices.get(ip)        
-    return False
\ No newline at end of file
+        return self.discovered_devices.get(ip)
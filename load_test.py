@@ -0,0 +1,85 @@
+"""
+Load test for the Flask device services.
+
+Hammers one endpoint from a pool of keep-alive clients and reports
+throughput and latency percentiles, e.g. dev server vs serve.py:
+
+    python apps.py                          # terminal 1 (before)
+    python load_test.py http://127.0.0.1:5001/status
+
+    python serve.py apps --workers 4        # terminal 1 (after)
+    python load_test.py http://127.0.0.1:5001/status
+"""
+
+import argparse
+import threading
+import time
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def worker(url, method, deadline, latencies, errors, lock):
+    session = requests.Session()  # reuse the TCP connection
+    local_latencies = []
+    local_errors = 0
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=10)
+            if response.status_code >= 500:
+                local_errors += 1
+        except requests.RequestException:
+            local_errors += 1
+        local_latencies.append(time.perf_counter() - start)
+
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure requests/sec and latency of an endpoint')
+    parser.add_argument('url')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    args = parser.parse_args()
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    threads = [
+        threading.Thread(target=worker, args=(args.url, args.method, deadline, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"URL:          {args.method} {args.url}")
+    print(f"Concurrency:  {args.concurrency}")
+    print(f"Requests:     {total} in {elapsed:.2f}s ({errors[0]} errors)")
+    print(f"Requests/sec: {total / elapsed:.1f}")
+    print(f"Latency p50:  {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"Latency p95:  {percentile(latencies, 95) * 1000:.2f} ms")
+    print(f"Latency p99:  {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"Latency max:  {(latencies[-1] if latencies else 0) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Logging overhead benchmark for the scan loop.
+
+Replays the per-host log calls of NetworkScanner._scan_single_host with
+eager f-strings, lazy %-style arguments and structured events, and
+reports the cost per host with debug disabled and enabled:
+
+    python log_benchmark.py --hosts 100000
+"""
+
+import argparse
+import logging
+import time
+
+from utils.logger import log_event
+
+
+def fstring_host(logger, ip, ports, e):
+    logger.debug(f"Host {ip} is alive, scanning ports...")
+    logger.debug(f"Port scan error for {ip}:{ports[0]}: {e}")
+    logger.debug(f"MAC address lookup failed for {ip}: {e}")
+
+
+def lazy_host(logger, ip, ports, e):
+    logger.debug("Host %s is alive, scanning ports...", ip)
+    logger.debug("Port scan error for %s:%s: %s", ip, ports[0], e)
+    logger.debug("MAC address lookup failed for %s: %s", ip, e)
+
+
+def event_host(logger, ip, ports, e):
+    log_event(logger, logging.DEBUG, 'alive', device=ip, transport='network')
+    log_event(logger, logging.DEBUG, 'port_error', device=ip, port=ports[0], error=e)
+    log_event(logger, logging.DEBUG, 'mac_lookup_failed', device=ip, error=e)
+
+
+def guarded_event_host(logger, ip, ports, e):
+    # How the agent calls log_event: the fields are only packed when enabled
+    if logger.isEnabledFor(logging.DEBUG):
+        log_event(logger, logging.DEBUG, 'alive', device=ip, transport='network')
+    if logger.isEnabledFor(logging.DEBUG):
+        log_event(logger, logging.DEBUG, 'port_error', device=ip, port=ports[0], error=e)
+    if logger.isEnabledFor(logging.DEBUG):
+        log_event(logger, logging.DEBUG, 'mac_lookup_failed', device=ip, error=e)
+
+
+def run(fn, logger, hosts):
+    ports = [9100, 515, 631]
+    error = OSError('timed out')
+    start = time.perf_counter()
+    for i in range(hosts):
+        fn(logger, f'192.168.{i >> 8 & 255}.{i & 255}', ports, error)
+    return (time.perf_counter() - start) / hosts * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-host logging cost in the scan loop')
+    parser.add_argument('--hosts', type=int, default=100000)
+    args = parser.parse_args()
+
+    logger = logging.getLogger('log_benchmark')
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+
+    # Baseline: the address formatting every variant pays
+    baseline = run(lambda logger, ip, ports, e: None, logger, args.hosts)
+
+    for level in (logging.INFO, logging.DEBUG):
+        logger.setLevel(level)
+        print(f"Level {logging.getLevelName(level)} (debug {'enabled' if level == logging.DEBUG else 'disabled'}):")
+        for name, fn in (('f-string', fstring_host), ('lazy %-style', lazy_host),
+                         ('structured', event_host), ('guarded', guarded_event_host)):
+            cost = run(fn, logger, args.hosts) - baseline
+            print(f"  {name:<14} {cost:8.0f} ns/host")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Scan target planning for NetworkScanner.
+
+Builds the list of IPv4 ranges to sweep from the configured CIDRs and,
+optionally, the subnets of the local interfaces (via netifaces). Ranges
+are deduplicated with ipaddress.collapse_addresses, and hosts are handed
+out round-robin across ranges so that no single subnet takes the whole
+probe budget at once.
+"""
+
+import ipaddress
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import netifaces
+    NETIFACES_AVAILABLE = True
+except ImportError:
+    NETIFACES_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Auto-detected subnets wider than this are narrowed around the interface address
+AUTO_SUBNET_MIN_PREFIX = 22
+
+
+@dataclass
+class ScanRange:
+    network: ipaddress.IPv4Network
+    interface: Optional[str] = None
+    source: str = 'config'  # 'config' or 'interface'
+
+    @property
+    def cidr(self) -> str:
+        return str(self.network)
+
+    @property
+    def host_count(self) -> int:
+        """Addresses network.hosts() yields: no network/broadcast below /31"""
+        if self.network.prefixlen >= 31:
+            return self.network.num_addresses
+        return self.network.num_addresses - 2
+
+
+def _parse_networks(values: Iterable[str]) -> List[ipaddress.IPv4Network]:
+    networks = []
+    for value in values:
+        value = str(value).strip()
+        if not value:
+            continue
+        try:
+            networks.append(ipaddress.IPv4Network(value, strict=False))
+        except ValueError:
+            logger.warning("Ignoring invalid scan range %r", value)
+    return networks
+
+
+def detect_local_subnets(min_prefix: int = AUTO_SUBNET_MIN_PREFIX) -> List[ScanRange]:
+    """IPv4 subnets of the local interfaces, skipping loopback and link-local"""
+    if not NETIFACES_AVAILABLE:
+        logger.warning("netifaces not available, cannot auto-detect subnets. Install with: pip install netifaces")
+        return []
+
+    ranges = []
+    for interface in netifaces.interfaces():
+        for address in netifaces.ifaddresses(interface).get(netifaces.AF_INET, []):
+            try:
+                iface = ipaddress.IPv4Interface(f"{address['addr']}/{address.get('netmask', '255.255.255.255')}")
+            except (KeyError, ValueError):
+                continue
+            if iface.ip.is_loopback or iface.ip.is_link_local or iface.network.prefixlen >= 31:
+                continue
+            network = iface.network
+            if network.prefixlen < min_prefix:
+                network = ipaddress.IPv4Network(f'{iface.ip}/{min_prefix}', strict=False)
+            ranges.append(ScanRange(network, interface, 'interface'))
+    return ranges
+
+
+def build_scan_ranges(config, local_subnets: Optional[List[ScanRange]] = None) -> List[ScanRange]:
+    """Configured plus auto-detected ranges, overlaps merged"""
+    configured = list(getattr(config, 'NETWORK_SCAN_RANGES', None) or [config.NETWORK_SCAN_RANGE])
+    candidates = [ScanRange(network) for network in _parse_networks(configured)]
+
+    if getattr(config, 'NETWORK_AUTO_DETECT_SUBNETS', False):
+        candidates.extend(local_subnets if local_subnets is not None else detect_local_subnets())
+
+    ranges = []
+    for network in ipaddress.collapse_addresses(candidate.network for candidate in candidates):
+        covered = [candidate for candidate in candidates if candidate.network.subnet_of(network)]
+        # A range the user configured stays 'config' even if a detected subnet
+        # falls inside it; only purely detected ranges carry the interface
+        if any(candidate.source == 'config' for candidate in covered):
+            ranges.append(ScanRange(network))
+        else:
+            origin = covered[0]
+            ranges.append(ScanRange(network, origin.interface, origin.source))
+    return ranges
+
+
+def interleave_hosts(ranges: List[ScanRange], exclude: Iterable[str] = ()) -> Iterator[Tuple[str, ScanRange]]:
+    """Yield (ip, range) round-robin across ranges, lazily, minus exclusions"""
+    excluded = list(ipaddress.collapse_addresses(_parse_networks(exclude)))
+    iterators: Dict[int, Tuple[Iterator, ScanRange]] = {
+        index: (iter(scan_range.network.hosts()), scan_range) for index, scan_range in enumerate(ranges)
+    }
+    while iterators:
+        for index in list(iterators):
+            hosts, scan_range = iterators[index]
+            ip = next(hosts, None)
+            if ip is None:
+                del iterators[index]
+                continue
+            if excluded and any(ip in network for network in excluded):
+                continue
+            yield str(ip), scan_range
+
+
+def in_scope(ip: str, ranges: List[ScanRange], exclude: Iterable[str] = ()) -> bool:
+    """Whether an address lies in one of the ranges and is not excluded"""
+    try:
+        address = ipaddress.IPv4Address(ip)
+    except ValueError:
+        return False
+    if any(address in network for network in _parse_networks(exclude)):
+        return False
+    return any(address in scan_range.network for scan_range in ranges)
@@ -0,0 +1,219 @@
+"""
+Passive network discovery
+=========================
+
+Listens for devices announcing themselves instead of probing for them:
+
+* mDNS / DNS-SD (zeroconf, optional) for printing and scanning services
+  such as _ipp._tcp and _pdl-datastream._tcp
+* SSDP NOTIFY messages and M-SEARCH replies on 239.255.255.250:1900
+
+Every announcement is reported as ``on_announcement(ip, hints)`` where the
+hints carry what the announcement already tells us (source, service,
+port, protocol, name, manufacturer/model from TXT records, SSDP headers),
+so the scanner can register the device without a full probe.
+"""
+
+import asyncio
+import logging
+import socket
+import struct
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+try:
+    from zeroconf import IPVersion, ServiceStateChange
+    from zeroconf.asyncio import AsyncServiceBrowser, AsyncServiceInfo, AsyncZeroconf
+    ZEROCONF_AVAILABLE = True
+except ImportError:
+    ZEROCONF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# DNS-SD service type -> (default port, protocol value of ip_driver.ConnectionProtocol)
+MDNS_SERVICES = {
+    '_ipp._tcp.local.': (631, 'ipp'),
+    '_ipps._tcp.local.': (631, 'ipp'),
+    '_pdl-datastream._tcp.local.': (9100, 'raw'),
+    '_printer._tcp.local.': (515, 'lpr'),
+    '_uscan._tcp.local.': (80, 'http'),
+    '_scanner._tcp.local.': (80, 'http'),
+}
+
+SSDP_ADDRESS = '239.255.255.250'
+SSDP_PORT = 1900
+SSDP_SEARCH = (
+    'M-SEARCH * HTTP/1.1\r\n'
+    f'HOST: {SSDP_ADDRESS}:{SSDP_PORT}\r\n'
+    'MAN: "ssdp:discover"\r\n'
+    'MX: 2\r\n'
+    'ST: ssdp:all\r\n\r\n'
+).encode()
+
+Announcement = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def parse_ssdp(data: bytes) -> Optional[Dict[str, str]]:
+    """Headers of an SSDP NOTIFY or M-SEARCH response, keys lowercased"""
+    try:
+        text = data.decode('utf-8', errors='replace')
+    except Exception:
+        return None
+    lines = text.split('\r\n')
+    start = lines[0].upper()
+    if not (start.startswith('NOTIFY') or start.startswith('HTTP/1.1 200')):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+class _SSDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, discovery: 'PassiveDiscovery'):
+        self.discovery = discovery
+
+    def datagram_received(self, data, addr):
+        headers = parse_ssdp(data)
+        if headers is None or headers.get('nts') == 'ssdp:byebye':
+            return
+        location = headers.get('location', '')
+        parsed = urlparse(location)
+        hints = {
+            'source': 'ssdp',
+            'location': location,
+            'server': headers.get('server'),
+            'type': headers.get('nt') or headers.get('st'),
+            'usn': headers.get('usn'),
+        }
+        if parsed.port or parsed.scheme:
+            hints['port'] = parsed.port or (443 if parsed.scheme == 'https' else 80)
+            hints['protocol'] = 'https' if parsed.scheme == 'https' else 'http'
+        self.discovery.announce(addr[0], hints)
+
+
+class PassiveDiscovery:
+    """Runs the mDNS browser and SSDP listener on the scanner's event loop"""
+
+    def __init__(self, on_announcement: Announcement, repeat_after: float = 300.0):
+        self.on_announcement = on_announcement
+        self.repeat_after = repeat_after
+
+        self._zeroconf = None
+        self._browser = None
+        self._ssdp_transport = None
+        self._last_reported: Dict[tuple, float] = {}
+        self._tasks = set()
+        self.stats = {'mdns': 0, 'ssdp': 0, 'suppressed': 0}
+
+    async def start(self):
+        if ZEROCONF_AVAILABLE:
+            try:
+                self._zeroconf = AsyncZeroconf(ip_version=IPVersion.V4Only)
+                self._browser = AsyncServiceBrowser(
+                    self._zeroconf.zeroconf, list(MDNS_SERVICES), handlers=[self._on_service_state_change]
+                )
+            except OSError as e:
+                logger.warning("mDNS discovery unavailable: %s", e)
+                self._zeroconf = None
+        else:
+            logger.warning("zeroconf not available, mDNS discovery disabled. Install with: pip install zeroconf")
+
+        try:
+            self._ssdp_transport = await self._start_ssdp()
+        except OSError as e:
+            logger.warning("SSDP listener unavailable: %s", e)
+
+    async def stop(self):
+        if self._browser is not None:
+            await self._browser.async_cancel()
+            self._browser = None
+        if self._zeroconf is not None:
+            await self._zeroconf.async_close()
+            self._zeroconf = None
+        if self._ssdp_transport is not None:
+            self._ssdp_transport.close()
+            self._ssdp_transport = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _start_ssdp(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except OSError:
+                pass
+        sock.bind(('', SSDP_PORT))
+        membership = struct.pack('4s4s', socket.inet_aton(SSDP_ADDRESS), socket.inet_aton('0.0.0.0'))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        sock.setblocking(False)
+
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: _SSDPProtocol(self), sock=sock)
+        # One search on startup so devices that are already up answer now
+        transport.sendto(SSDP_SEARCH, (SSDP_ADDRESS, SSDP_PORT))
+        return transport
+
+    def _on_service_state_change(self, zeroconf, service_type, name, state_change):
+        if state_change is ServiceStateChange.Removed:
+            return
+        self._spawn(self._resolve_service(zeroconf, service_type, name))
+
+    async def _resolve_service(self, zeroconf, service_type: str, name: str):
+        info = AsyncServiceInfo(service_type, name)
+        if not await info.async_request(zeroconf, 3000):
+            return
+
+        default_port, protocol = MDNS_SERVICES.get(service_type, (None, None))
+        txt = {}
+        for key, value in (info.properties or {}).items():
+            if value is not None:
+                txt[key.decode('utf-8', errors='replace')] = value.decode('utf-8', errors='replace')
+
+        hints = {
+            'source': 'mdns',
+            'service': service_type,
+            'name': name,
+            'hostname': (info.server or '').rstrip('.') or None,
+            'port': info.port or default_port,
+            'protocol': protocol,
+            'manufacturer': txt.get('usb_MFG'),
+            'model': txt.get('ty') or txt.get('usb_MDL') or txt.get('product'),
+            'txt': txt,
+        }
+        for address in info.parsed_addresses(IPVersion.V4Only):
+            self.announce(address, hints)
+
+    def announce(self, ip: str, hints: Dict[str, Any]):
+        """Report an announcement, rate-limited per (ip, source, port)"""
+        key = (ip, hints.get('source'), hints.get('port'))
+        now = time.monotonic()
+        self._forget_expired(now)
+        if key in self._last_reported:
+            self.stats['suppressed'] += 1
+            return
+        self._last_reported[key] = now
+        self.stats[hints['source']] += 1
+        self._spawn(self.on_announcement(ip, hints))
+
+    def _forget_expired(self, now: float):
+        """Drop announcers last reported a full window ago.
+
+        Entries are only added once their old one has expired, so the dict
+        is ordered oldest first and pruning stops at the first live entry.
+        """
+        while self._last_reported:
+            key, reported = next(iter(self._last_reported.items()))
+            if now - reported < self.repeat_after:
+                break
+            del self._last_reported[key]
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -1,39 +1,506 @@
+import logging
+import os
+import queue
+import select
 import socket
-import struct
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
-def test_printer_communication(ip, port=9100):
+_logger = logging.getLogger(__name__)
+
+RAW_PORT = 9100
+STATUS_REQUEST = b'\x1b\x40\x1b\x28\x41\x01\x00\x01'
+# Largest slice handed to the socket at once when streaming generated data
+STREAM_CHUNK_SIZE = 64 * 1024
+# Encoding for text (str) payloads
+TEXT_ENCODING = 'utf-8'
+
+Payload = Union[bytes, List[bytes], str, Iterable[bytes]]
+
+
+class SpoolerError(Exception):
+    pass
+
+
+class SpoolerFullError(SpoolerError):
+    """The printer's job queue is full; try again later"""
+
+
+class PrintJob:
+    def __init__(self, kind: str, payload: Optional[Payload] = None):
+        self.kind = kind  # 'print', 'file', 'stream' or 'status'
+        self.payload = payload
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+
+
+_STOP = object()
+
+
+class PrinterSpooler:
+    """Serializes jobs for one printer over a single long-lived connection.
+
+    Callers hand jobs to a bounded queue and get a Future back, so a slow
+    or offline printer never blocks them. One worker thread owns the 9100
+    socket: it reconnects with exponential backoff, writes jobs with
+    sendall/sendmsg (no partial writes) and answers status queries between
+    jobs on the same connection.
+    """
+
+    def __init__(self, ip: str, port: int = RAW_PORT, max_queue: int = 100,
+                 connect_timeout: float = 5.0, io_timeout: float = 30.0,
+                 max_backoff: float = 30.0, connect_attempts: int = 3,
+                 status_timeout: float = 2.0):
+        self.ip = ip
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.io_timeout = io_timeout
+        self.status_timeout = status_timeout
+        self.max_backoff = max_backoff
+        self.connect_attempts = connect_attempts
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._sock: Optional[socket.socket] = None
+        self._backoff = 0.0
+        self._thread = threading.Thread(target=self._run, name=f'spooler-{ip}:{port}', daemon=True)
+        self._closed = False
+
+        self.jobs_sent = 0
+        self.bytes_sent = 0
+        self.connects = 0
+        self.failures = 0
+
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit(self, payload: Payload) -> Future:
+        """Queue a print job; the Future resolves to the number of bytes sent"""
+        return self._enqueue(PrintJob('print', payload))
+
+    def submit_file(self, path: Union[str, os.PathLike]) -> Future:
+        """Queue a job streamed from disk with sendfile; the file is opened
+        only when the job runs, so nothing is buffered in the meantime"""
+        return self._enqueue(PrintJob('file', os.fspath(path)))
+
+    def submit_stream(self, chunks: Iterable[bytes]) -> Future:
+        """Queue a job produced lazily by an iterator of byte chunks.
+
+        The iterator is only advanced once the previous chunk has been
+        accepted by the socket, so a slow printer throttles the producer
+        and at most one chunk is held in memory.
+        """
+        return self._enqueue(PrintJob('stream', chunks))
+
+    def query_status(self) -> Future:
+        """Queue a status query; runs between print jobs on the same connection"""
+        return self._enqueue(PrintJob('status'))
+
+    def close(self, timeout: float = 5.0):
+        """Finish queued jobs, then close the connection"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            'printer': f'{self.ip}:{self.port}',
+            'connected': self._sock is not None,
+            'queued': self._queue.qsize(),
+            'jobs_sent': self.jobs_sent,
+            'bytes_sent': self.bytes_sent,
+            'connects': self.connects,
+            'failures': self.failures,
+        }
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, job: PrintJob) -> Future:
+        if self._closed:
+            raise SpoolerError(f"Spooler for {self.ip}:{self.port} is closed")
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise SpoolerFullError(f"Print queue for {self.ip}:{self.port} is full")
+        return job.future
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                sock = self._ensure_connected()
+                if job.kind == 'status':
+                    result = self._status(sock)
+                else:
+                    if job.kind == 'file':
+                        result = self._send_file(sock, job.payload)
+                    elif job.kind == 'stream':
+                        result = self._send_stream(sock, job.payload)
+                    else:
+                        result = self._send(sock, job.payload)
+                    self.bytes_sent += result
+                    self.jobs_sent += 1
+                job.future.set_result(result)
+            except Exception as e:
+                self.failures += 1
+                self._disconnect()
+                _logger.warning(f"Printer {self.ip}:{self.port} {job.kind} job failed: {e}")
+                job.future.set_exception(e)
+
+        self._disconnect()
+
+    def _ensure_connected(self) -> socket.socket:
+        if self._sock is not None and not self._peer_closed(self._sock):
+            return self._sock
+        self._disconnect()
+
+        last_error = None
+        for _ in range(self.connect_attempts):
+            if self._backoff:
+                time.sleep(self._backoff)
+            try:
+                sock = socket.create_connection((self.ip, self.port), timeout=self.connect_timeout)
+                sock.settimeout(self.io_timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                self._sock = sock
+                self._backoff = 0.0
+                self.connects += 1
+                return sock
+            except OSError as e:
+                last_error = e
+                self._backoff = min(self.max_backoff, (self._backoff * 2) or 0.5)
+
+        raise SpoolerError(f"Cannot connect to printer {self.ip}:{self.port}: {last_error}")
+
+    @staticmethod
+    def _peer_closed(sock: socket.socket) -> bool:
+        """True if an idle connection was closed by the printer"""
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return False
+            return sock.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _send(self, sock: socket.socket, payload: Payload) -> int:
+        if isinstance(payload, str):
+            payload = payload.encode(TEXT_ENCODING)
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            sock.sendall(payload)
+            return len(payload)
+        return self._send_buffers(sock, [
+            buffer.encode(TEXT_ENCODING) if isinstance(buffer, str) else buffer for buffer in payload
+        ])
+
+    @staticmethod
+    def _send_file(sock: socket.socket, path: str) -> int:
+        """Zero-copy file to socket transfer (os.sendfile where available)"""
+        with open(path, 'rb') as f:
+            return sock.sendfile(f)
+
+    @staticmethod
+    def _send_stream(sock: socket.socket, chunks: Iterable[bytes]) -> int:
+        sent = 0
+        for chunk in chunks:
+            view = memoryview(chunk)
+            # Slices of a memoryview share the buffer; nothing is copied
+            for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+                piece = view[offset:offset + STREAM_CHUNK_SIZE]
+                sock.sendall(piece)
+                sent += len(piece)
+        return sent
+
+    @staticmethod
+    def _send_buffers(sock: socket.socket, buffers: List[bytes]) -> int:
+        """Scatter-gather write of several buffers without joining them"""
+        total = sum(len(buffer) for buffer in buffers)
+        if not hasattr(sock, 'sendmsg'):
+            # Windows: no sendmsg, fall back to one sendall per buffer
+            for buffer in buffers:
+                sock.sendall(buffer)
+            return total
+
+        views = [memoryview(buffer) for buffer in buffers if len(buffer)]
+        while views:
+            sent = sock.sendmsg(views)
+            # Drop fully written buffers and trim the partially written one
+            while views and sent >= len(views[0]):
+                sent -= len(views[0])
+                views.pop(0)
+            if views and sent:
+                views[0] = views[0][sent:]
+        return total
+
+    @staticmethod
+    def _drain(sock: socket.socket) -> int:
+        """Discard bytes already received, e.g. a reply to an earlier query that timed out"""
+        discarded = 0
+        while select.select([sock], [], [], 0)[0]:
+            data = sock.recv(4096)
+            if not data:
+                break
+            discarded += len(data)
+        return discarded
+
+    def _status(self, sock: socket.socket) -> Dict[str, object]:
+        # A late answer still waiting in the buffer would be read as this one's
+        self._drain(sock)
+        sock.sendall(STATUS_REQUEST)
+        # Many printers never answer on 9100; don't hold the jobs behind us for io_timeout
+        sock.settimeout(self.status_timeout)
+        try:
+            response = sock.recv(1024)
+        except socket.timeout:
+            return {'status': 'unknown', 'raw': ''}
+        finally:
+            sock.settimeout(self.io_timeout)
+        return parse_printer_status(response)
+
+
+_spoolers: Dict[Tuple[str, int], PrinterSpooler] = {}
+_spoolers_lock = threading.Lock()
+
+
+def get_spooler(ip: str, port: int = RAW_PORT) -> PrinterSpooler:
+    """Shared spooler for a printer, created on first use"""
+    with _spoolers_lock:
+        spooler = _spoolers.get((ip, port))
+        if spooler is None:
+            spooler = _spoolers[(ip, port)] = PrinterSpooler(ip, port)
+        return spooler
+
+
+def close_all_spoolers():
+    with _spoolers_lock:
+        spoolers = list(_spoolers.values())
+        _spoolers.clear()
+    for spooler in spoolers:
+        spooler.close()
+
+
+def parse_printer_status(response: bytes) -> Dict[str, object]:
+    """Decode the printer's status byte"""
+    if not response:
+        return {'status': 'unknown', 'raw': ''}
+
+    status_byte = response[0]
+    if status_byte & 0x08:
+        status = 'offline'
+    elif status_byte & 0x40:
+        status = 'error'
+    elif status_byte & 0x20:
+        status = 'paper_out'
+    else:
+        status = 'online'
+    return {'status': status, 'raw': response.hex()}
+
+
+def print_file(ip, path, port=9100) -> Future:
+    """Stream a prepared job file (raster labels, PDF, PCL...) to a printer"""
+    return get_spooler(ip, port).submit_file(path)
+
+
+class PrinterStatusService:
+    """Polls ESC/POS printers in the background and caches the result.
+
+    Printers are probed concurrently on a schedule with strict connect and
+    read timeouts, so an offline printer costs one timeout per cycle
+    instead of hanging callers. get_status() answers from the cache; an
+    on-demand refresh is shared by everyone asking for the same printer
+    while it is in flight.
+
+    The status query is ESC/POS; PCL, PostScript or ZPL printers would
+    print it. Only printers registered with escpos=True are queried and
+    polled; for the others a probe just checks that the port accepts a
+    connection, without writing to it, and reports 'unknown'.
+    """
+
+    def __init__(self, interval: float = 30.0, timeout: float = 3.0, max_workers: int = 8):
+        self.interval = interval
+        self.timeout = timeout
+
+        self._printers: Dict[Tuple[str, int], bool] = {}  # -> ESC/POS confirmed
+        self._cache: Dict[Tuple[str, int], Tuple[Dict[str, object], float]] = {}
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='printer-status')
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='printer-status-poller', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout)
+            self._thread = None
+        self._executor.shutdown(wait=False)
+
+    def add_printer(self, ip: str, port: int = RAW_PORT, escpos: bool = False):
+        """Track a printer; escpos=True opts it into status queries and polling"""
+        with self._lock:
+            self._printers[(ip, port)] = escpos or self._printers.get((ip, port), False)
+
+    def remove_printer(self, ip: str, port: int = RAW_PORT):
+        with self._lock:
+            self._printers.pop((ip, port), None)
+            self._cache.pop((ip, port), None)
+
+    def get_status(self, ip: str, port: int = RAW_PORT, max_age: Optional[float] = None,
+                   refresh: bool = False, escpos: bool = False) -> Dict[str, object]:
+        """Cached status with its age in seconds.
+
+        Waits for a probe only when there is no cached value, the cached
+        one is older than max_age, or refresh is requested; otherwise it
+        returns immediately.
+        """
+        key = (ip, port)
+        self.add_printer(ip, port, escpos=escpos)
+
+        cached = self._cache.get(key)
+        if cached and not refresh and (max_age is None or time.monotonic() - cached[1] <= max_age):
+            return self._with_age(*cached)
+
+        try:
+            self.refresh(ip, port).result(timeout=self.timeout * 2)
+        except FutureTimeout:
+            pass
+        cached = self._cache.get(key)
+        return self._with_age(*cached) if cached else {'status': 'unknown'}
+
+    def refresh(self, ip: str, port: int = RAW_PORT) -> Future:
+        """Probe a printer now, joining a probe already in flight"""
+        key = (ip, port)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = self._executor.submit(self._poll, key)
+                future.add_done_callback(lambda f: self._done(key, f))
+            return future
+
+    def get_all(self) -> Dict[str, Dict[str, object]]:
+        return {f'{ip}:{port}': self._with_age(*cached) for (ip, port), cached in list(self._cache.items())}
+
+    def _done(self, key, future: Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    @staticmethod
+    def _with_age(status: Dict[str, object], checked_at: float) -> Dict[str, object]:
+        return dict(status, age=round(time.monotonic() - checked_at, 3))
+
+    def _poll(self, key: Tuple[str, int]) -> Dict[str, object]:
+        ip, port = key
+        try:
+            status = self._probe(ip, port)
+        except Exception as e:
+            status = {'status': 'offline', 'error': str(e)}
+        self._cache[key] = (status, time.monotonic())
+        return status
+
+    def _probe(self, ip: str, port: int) -> Dict[str, object]:
+        spooler = _spoolers.get((ip, port))
+        if not self._printers.get((ip, port), False):
+            if spooler is not None:
+                # The spooler holds the printer's only connection
+                return {'status': 'unknown'}
+            # Not known to speak ESC/POS: anything written would be printed
+            with socket.create_connection((ip, port), timeout=self.timeout):
+                return {'status': 'unknown', 'reachable': True}
+
+        if spooler is not None:
+            # Ask on the spooler's connection instead of opening a second one
+            try:
+                future = spooler.query_status()
+            except SpoolerFullError:
+                return {'status': 'busy'}
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                return {'status': 'busy'}
+
+        with socket.create_connection((ip, port), timeout=self.timeout) as sock:
+            sock.settimeout(self.timeout)
+            sock.sendall(STATUS_REQUEST)
+            try:
+                return parse_printer_status(sock.recv(1024))
+            except socket.timeout:
+                # Connected but silent: many printers never answer on 9100
+                return {'status': 'unknown', 'raw': ''}
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                printers = [key for key, escpos in self._printers.items() if escpos]
+            for ip, port in printers:
+                self.refresh(ip, port)
+            self._stop_event.wait(self.interval)
+
+
+_status_service: Optional[PrinterStatusService] = None
+
+
+def get_status_service() -> PrinterStatusService:
+    """Shared status service, polling from its first use"""
+    global _status_service
+    with _spoolers_lock:
+        if _status_service is None:
+            _status_service = PrinterStatusService()
+            _status_service.start()
+        return _status_service
+
+
+def test_printer_communication(ip, port=9100, timeout=30):
     """Test actual printer communication"""
     try:
-        # Connect to printer
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((ip, port))
-        
         # Send test print job (ESC/P or PCL)
-        test_job = b'\x1b\x40'  # ESC @ (Initialize printer)
-        test_job += b'Hardware Test Print\n'
-        test_job += b'Timestamp: ' + str(datetime.now()).encode() + b'\n'
-        test_job += b'\x0c'  # Form feed
-        
-        sock.send(test_job)
-        sock.close()
-        
+        test_job = [
+            b'\x1b\x40',  # ESC @ (Initialize printer)
+            b'Hardware Test Print\n',
+            b'Timestamp: ' + str(datetime.now()).encode() + b'\n',
+            b'\x0c',  # Form feed
+        ]
+        future = get_spooler(ip, port).submit(test_job)
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeout:
+            # Don't let a test page the caller gave up on print later
+            future.cancel()
+            return False
         return True
-    except Exception as e:
+    except Exception:
         return False
 
-def get_printer_status(ip, port=9100):
-    """Get actual printer status"""
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((ip, port))
-        
-        # Send status request
-        status_request = b'\x1b\x40\x1b\x28\x41\x01\x00\x01'
-        sock.send(status_request)
-        
-        response = sock.recv(1024)
-        sock.close()
-        
-        return parse_printer_status(response)
-    except Exception:
-        return {'status': 'offline'} 
\ No newline at end of file
+
+def get_printer_status(ip, port=9100, max_age=None, refresh=False, escpos=False):
+    """Get printer status from the polling cache (see PrinterStatusService)"""
+    return get_status_service().get_status(ip, port, max_age=max_age, refresh=refresh, escpos=escpos)
@@ -0,0 +1,284 @@
+import collections
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import requests
+
+from config import Config
+from state_store import StateStore
+
+# Scanner types whose detections are recorded as device.scan.log rows,
+# mapped to the server's scan_type
+SCAN_TYPES = {'nfc': 'nfc', 'qr': 'qr', 'barcode': 'barcode'}
+
+# Returned by the server when the agent token is missing, expired or revoked
+AUTH_FAILED_CODE = 'AUTHENTICATION_FAILED'
+# Returned for a batch the server will never accept; anything else is retried
+INVALID_BATCH_CODE = 'INVALID_BATCH'
+
+# Longest wait between retries while uploads keep failing
+MAX_RETRY_BACKOFF = 60.0  # seconds
+
+# Shared agent token, and the lease serializing logins across workers
+AUTH_STATE_KEY = 'scan_uploader:auth'
+LOGIN_LEASE = 'scan-uploader-login'
+LOGIN_LEASE_TTL = 30.0
+
+
+class ScanUploader:
+    """Buffers scans on the agent and uploads them in batches.
+
+    A batch is sent to ``/hardware/device/scan/batch`` as soon as
+    ``SCAN_BATCH_SIZE`` scans are waiting, or ``SCAN_FLUSH_INTERVAL``
+    seconds after the oldest one arrived, whichever comes first. While the
+    server is unreachable scans stay buffered up to ``SCAN_BUFFER_LIMIT``;
+    beyond that the oldest scans are dropped and counted.
+
+    The uploader logs in through ``/hardware/auth/login`` with
+    ``AGENT_NAME``/``API_KEY`` and sends the agent token with every batch;
+    when the server reports the token invalid it logs in again and the
+    batch is retried. Given a shared StateStore, every worker process uses
+    the same token and only one of them logs in at a time, so workers
+    never invalidate each other's session token.
+
+    Failed uploads are retried with exponential backoff up to
+    ``MAX_RETRY_BACKOFF``; a batch is only dropped (and counted) when the
+    server answers INVALID_BATCH.
+    """
+
+    def __init__(self, config: Config, session: Optional[requests.Session] = None,
+                 store: Optional[StateStore] = None):
+        self.config = config
+        self.session = session or requests.Session()
+        self.store = store
+        base_url = config.API_SERVER_URL.rstrip('/')
+        self.url = f"{base_url}/hardware/device/scan/batch"
+        self.login_url = f"{base_url}/hardware/auth/login"
+        self.logger = logging.getLogger(__name__)
+
+        self._auth: Optional[Dict[str, Any]] = None  # without a shared store
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+        self._buffer = collections.deque()
+        self._condition = threading.Condition()
+        self._oldest_at: Optional[float] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.sent = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failed_requests = 0
+
+    def add_scan(self, device_id: Union[int, str], scan_data: str, scan_type: str):
+        """Queue one scan; device_id is a record id or the agent's device_id. Never blocks"""
+        with self._condition:
+            if len(self._buffer) >= self.config.SCAN_BUFFER_LIMIT:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append({
+                'device_id': device_id,
+                'scan_data': scan_data,
+                'scan_type': scan_type,
+            })
+            if self._oldest_at is None:
+                # Wake the worker so it starts the flush interval countdown
+                self._oldest_at = time.monotonic()
+                self._condition.notify()
+            elif len(self._buffer) >= self.config.SCAN_BATCH_SIZE:
+                self._condition.notify()
+
+    def add_detection(self, scanner_type: str, item: Dict[str, Any]) -> bool:
+        """Queue a scanner detection; returns False for types the server does not record"""
+        scan_type = SCAN_TYPES.get(scanner_type)
+        if scan_type is None:
+            return False
+        device_id = (self.config.SCAN_DEVICE_IDS.get(scanner_type)
+                     or f"{self.config.AGENT_NAME}:{scanner_type}")
+        self.add_scan(device_id, item.get('uid') or item.get('data'), scan_type)
+        return True
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='scan-uploader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the uploader after a final flush"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.flush()
+
+    def flush(self) -> bool:
+        """Upload everything buffered now; returns False if a batch failed"""
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return True
+            if not self._send(batch):
+                self._requeue(batch)
+                return False
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._is_due():
+                    self._condition.wait(timeout=self._time_until_due())
+                if not self._running:
+                    return
+
+            if self.flush():
+                self._backoff = 0.0
+            else:
+                # Server unreachable or failing: wait longer after each failure
+                self._backoff = min(max(self._backoff * 2, self.config.SCAN_FLUSH_INTERVAL), MAX_RETRY_BACKOFF)
+                self._retry_at = time.monotonic() + self._backoff
+
+    def _is_due(self) -> bool:
+        if not self._buffer or time.monotonic() < self._retry_at:
+            return False
+        if len(self._buffer) >= self.config.SCAN_BATCH_SIZE:
+            return True
+        return time.monotonic() - self._oldest_at >= self.config.SCAN_FLUSH_INTERVAL
+
+    def _time_until_due(self) -> Optional[float]:
+        if self._oldest_at is None:
+            return None
+        now = time.monotonic()
+        due = max(self._oldest_at + self.config.SCAN_FLUSH_INTERVAL, self._retry_at)
+        return max(0.0, due - now)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            count = min(len(self._buffer), self.config.SCAN_BATCH_SIZE)
+            batch = [self._buffer.popleft() for _ in range(count)]
+            self._oldest_at = time.monotonic() if self._buffer else None
+            return batch
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        with self._condition:
+            self._buffer.extendleft(reversed(batch))
+            while len(self._buffer) > self.config.SCAN_BUFFER_LIMIT:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._oldest_at = time.monotonic()
+
+    def _call(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON-RPC call; raises on transport errors and on JSON-RPC error replies"""
+        payload = {
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': params,
+        }
+        response = self.session.post(url, json=payload, timeout=10)
+        response.raise_for_status()
+        body = response.json()
+        if body.get('error'):
+            # Server-side exception or expired session; the batch is still ours
+            error = body['error']
+            raise ValueError(error.get('message', error) if isinstance(error, dict) else error)
+        return body.get('result') or {}
+
+    def _credentials(self) -> Optional[Dict[str, Any]]:
+        """{'token', 'agent_id'} in use, logging in when there is none"""
+        auth = self.store.get(AUTH_STATE_KEY) if self.store is not None else self._auth
+        return auth or self._login()
+
+    def _login(self) -> Optional[Dict[str, Any]]:
+        if self.store is not None and not self.store.acquire_lease(LOGIN_LEASE, LOGIN_LEASE_TTL):
+            # Another worker is logging in; its token is used on the retry
+            return None
+        try:
+            try:
+                result = self._call(self.login_url, {
+                    'agent_name': self.config.AGENT_NAME,
+                    'agent_key': self.config.API_KEY,
+                })
+            except (requests.RequestException, ValueError) as e:
+                self.logger.warning(f"Scan uploader login failed: {e}")
+                return None
+            if not result.get('success'):
+                self.logger.error(f"Scan uploader login refused: {result.get('error')}")
+                return None
+            auth = {'token': result['token'], 'agent_id': result['agent_id']}
+            if self.store is not None:
+                self.store.set(AUTH_STATE_KEY, auth)
+            else:
+                self._auth = auth
+            return auth
+        finally:
+            if self.store is not None:
+                self.store.release_lease(LOGIN_LEASE)
+
+    def _forget_token(self, token: str):
+        """Drop a rejected token unless another worker already replaced it"""
+        if self.store is None:
+            if self._auth and self._auth['token'] == token:
+                self._auth = None
+            return
+
+        def forget(auth):
+            if auth and auth['token'] == token:
+                return None, True
+            return auth, False
+
+        self.store.update(AUTH_STATE_KEY, forget)
+
+    def _send(self, batch: List[Dict[str, Any]]) -> bool:
+        auth = self._credentials()
+        if auth is None:
+            self.failed_requests += 1
+            return False
+        try:
+            result = self._call(self.url, {
+                'scans': batch,
+                'token': auth['token'],
+                'agent_id': auth['agent_id'],
+            })
+        except (requests.RequestException, ValueError) as e:
+            self.failed_requests += 1
+            self.logger.warning(f"Scan batch upload failed ({len(batch)} scans): {e}")
+            return False
+
+        if result.get('code') == AUTH_FAILED_CODE:
+            # Token expired or revoked: log in again before the retry
+            self._forget_token(auth['token'])
+            self.failed_requests += 1
+            self.logger.info("Scan uploader token rejected, logging in again")
+            return False
+
+        if result.get('code') == INVALID_BATCH_CODE:
+            # The server will never take this batch; resending cannot help
+            self.failed_requests += 1
+            self.dropped += len(batch)
+            self.logger.error(f"Scan batch of {len(batch)} dropped: {result.get('error')}")
+            return True
+
+        if not result.get('success'):
+            # Server-side failure; keep the batch and retry with backoff
+            self.failed_requests += 1
+            self.logger.warning(f"Scan batch upload failed ({len(batch)} scans): {result.get('error')}")
+            return False
+
+        self.sent += result.get('recorded', 0)
+        self.rejected += len(result.get('rejected', []))
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            buffered = len(self._buffer)
+        return {
+            'buffered': buffered,
+            'sent': self.sent,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+            'failed_requests': self.failed_requests,
+        }
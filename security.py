@@ -1,7 +1,10 @@
 import jwt
 from cryptography.fernet import Fernet
+from datetime import datetime, timedelta
 import hashlib
 import hmac
+import secrets
+import time
 
 class SecurityManager:
     def __init__(self, secret_key):
@@ -17,6 +20,44 @@ class SecurityManager:
         }
         return jwt.encode(payload, self.secret_key, algorithm='HS256')
     
+    def generate_agent_token(self, agent_id, agent_name, permissions, generation=0, expires_minutes=15):
+        """Generate a short-lived signed token for a hardware agent.
+
+        Everything needed to authorize a request is in the token, so it can
+        be verified by signature alone. ``generation`` lets the server revoke
+        all earlier tokens of an agent by bumping its counter.
+        """
+        now = datetime.utcnow()
+        payload = {
+            'typ': 'agent',
+            'sub': str(agent_id),
+            'name': agent_name,
+            'perms': list(permissions),
+            'gen': generation,
+            'jti': secrets.token_hex(8),
+            'iat': now,
+            'exp': now + timedelta(minutes=expires_minutes)
+        }
+        return jwt.encode(payload, self.secret_key, algorithm='HS256')
+    
+    def refresh_agent_token(self, payload, expires_minutes=15):
+        """New agent token for a verified payload with under a third of its lifetime left.
+
+        Returns None while the token is still fresh. The new token keeps
+        the agent, permissions and generation of the old one, so a
+        revocation also covers refreshed tokens.
+        """
+        remaining = payload['exp'] - time.time()
+        if remaining > expires_minutes * 60 / 3:
+            return None
+        return self.generate_agent_token(
+            int(payload['sub']),
+            payload['name'],
+            payload['perms'],
+            generation=payload.get('gen', 0),
+            expires_minutes=expires_minutes,
+        )
+    
     def verify_token(self, token):
         """Verify API token"""
         try:
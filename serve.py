@@ -0,0 +1,203 @@
+"""
+Production entry point for the Flask device services
+=====================================================
+
+Runs one of the device APIs under a real WSGI server instead of the
+single-process Werkzeug development server:
+
+    python serve.py apps --workers 4 --threads 8
+    python serve.py detection --server waitress --port 5000
+
+Server selection (``--server auto``) prefers gunicorn (multi-process,
+POSIX only), then waitress (multi-threaded, works on Windows) and falls
+back to a threaded Werkzeug server. With more than one worker process the
+shared state is moved to SQLite (HARDWARE_STATE_DB) so every worker
+reports the same devices and scanner state.
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import signal
+import sys
+import threading
+from pathlib import Path
+
+try:
+    import gunicorn.app.base
+    GUNICORN_AVAILABLE = True
+except ImportError:
+    GUNICORN_AVAILABLE = False
+
+try:
+    import waitress
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('serve')
+
+# name -> (module, default port)
+APPS = {
+    'apps': ('apps', 5001),
+    'detection': ('hardware_detection_service', 5000),
+    'device_api': ('custom_addon.device_api', 5000),
+    'test': ('test_app', 5000),
+}
+
+
+def load_app(name):
+    """Import the service module and return (module, flask_app)"""
+    module = importlib.import_module(APPS[name][0])
+    return module, module.app
+
+
+def run_shutdown_hook(module):
+    """Call the module's shutdown() so background workers stop cleanly"""
+    hook = getattr(module, 'shutdown', None)
+    if hook:
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"Shutdown hook failed: {e}")
+
+
+def serve_gunicorn(name, args):
+    class ServiceApplication(gunicorn.app.base.BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Imported in each worker after fork so threads are not shared
+            return load_app(name)[1]
+
+    def worker_exit(server, worker):
+        run_shutdown_hook(sys.modules.get(APPS[name][0]))
+
+    options = {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'keepalive': args.keepalive,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'backlog': args.backlog,
+        'worker_exit': worker_exit,
+    }
+    ServiceApplication(options).run()
+
+
+def serve_waitress(name, args):
+    module, app = load_app(name)
+    server = waitress.create_server(
+        app,
+        host=args.host,
+        port=args.port,
+        threads=args.threads,
+        backlog=args.backlog,
+        channel_timeout=args.keepalive,
+        connection_limit=args.connection_limit,
+    )
+
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        server.close()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.run()
+    finally:
+        run_shutdown_hook(module)
+
+
+def serve_werkzeug(name, args):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveRequestHandler(WSGIRequestHandler):
+        # HTTP/1.1 keeps connections alive between requests; the socket
+        # timeout closes a connection left idle for --keepalive seconds
+        protocol_version = 'HTTP/1.1'
+        timeout = args.keepalive
+
+    module, app = load_app(name)
+    server = make_server(args.host, args.port, app, threaded=True,
+                         request_handler=KeepAliveRequestHandler)
+
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        # shutdown() blocks until serve_forever returns, so not from here
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        run_shutdown_hook(module)
+
+
+def choose_server(requested):
+    if requested != 'auto':
+        return requested
+    if GUNICORN_AVAILABLE and os.name != 'nt':
+        return 'gunicorn'
+    if WAITRESS_AVAILABLE:
+        return 'waitress'
+    return 'werkzeug'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a hardware device API')
+    parser.add_argument('app', choices=sorted(APPS))
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'waitress', 'werkzeug'], default='auto')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                        help='worker processes (gunicorn only)')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='threads per worker; each open /events stream holds one')
+    parser.add_argument('--keepalive', type=int, default=5, help='idle keep-alive seconds')
+    parser.add_argument('--timeout', type=int, default=60, help='worker request timeout (gunicorn)')
+    parser.add_argument('--graceful-timeout', type=int, default=15,
+                        help='seconds to finish in-flight requests on shutdown')
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--connection-limit', type=int, default=1000, help='open connections (waitress)')
+    args = parser.parse_args()
+
+    if args.port is None:
+        args.port = APPS[args.app][1]
+
+    server = choose_server(args.server)
+    if server != 'gunicorn':
+        args.workers = 1
+
+    if args.workers > 1 and not os.getenv('HARDWARE_STATE_DB'):
+        state_db = Path.home() / '.hardware_agent' / 'state.db'
+        state_db.parent.mkdir(parents=True, exist_ok=True)
+        os.environ['HARDWARE_STATE_DB'] = str(state_db)
+        logger.info(f"Sharing state between workers in {state_db}")
+
+    logger.info(f"Serving {args.app} on {args.host}:{args.port} with {server} "
+                f"({args.workers} worker(s) x {args.threads} thread(s))")
+
+    if server == 'gunicorn':
+        serve_gunicorn(args.app, args)
+    elif server == 'waitress':
+        serve_waitress(args.app, args)
+    else:
+        serve_werkzeug(args.app, args)
+
+
+if __name__ == '__main__':
+    main()
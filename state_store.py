@@ -0,0 +1,150 @@
+"""
+Shared state for the Flask device services.
+
+The services used to keep their state in module-level dicts, which only
+works on a single-process development server. Everything that must look
+the same from every worker now goes through a StateStore:
+
+* MemoryStateStore - single process, many threads (default)
+* SqliteStateStore - shared by every worker process on the host
+
+Set HARDWARE_STATE_DB to a file path to select the SQLite store.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class StateStore:
+    """Key/value store with atomic read-modify-write"""
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def update(self, key: str, fn: Callable[[Any], Tuple[Any, Any]], default: Any = None) -> Any:
+        """Atomically replace the value with fn(value)[0] and return fn(value)[1]"""
+        raise NotImplementedError
+
+    def acquire_lease(self, name: str, ttl: float) -> bool:
+        """Take a named lease held by this process for at most ttl seconds"""
+        owner = os.getpid()
+        now = time.time()
+
+        def take(lease):
+            if lease and lease['owner'] != owner and lease['expires'] > now:
+                return lease, False
+            return {'owner': owner, 'expires': now + ttl}, True
+
+        return self.update(f'lease:{name}', take)
+
+    def release_lease(self, name: str):
+        owner = os.getpid()
+
+        def drop(lease):
+            if lease and lease['owner'] == owner:
+                return None, True
+            return lease, False
+
+        self.update(f'lease:{name}', drop)
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key)
+            # Hand out copies so callers never mutate shared state in place
+            return default if value is None else json.loads(json.dumps(value))
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def update(self, key, fn, default=None):
+        with self._lock:
+            current = self._data.get(key, default)
+            value, result = fn(json.loads(json.dumps(current)))
+            if value is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = value
+            return result
+
+
+class SqliteStateStore(StateStore):
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; isolation_level=None lets us issue
+        # BEGIN IMMEDIATE ourselves for read-modify-write
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._connect().execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        self._connect().execute(
+            'INSERT INTO state (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+            (key, json.dumps(value))
+        )
+
+    def update(self, key, fn, default=None):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+            value, result = fn(json.loads(row[0]) if row else default)
+            if value is None:
+                conn.execute('DELETE FROM state WHERE key = ?', (key,))
+            else:
+                conn.execute(
+                    'INSERT INTO state (key, value) VALUES (?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                    (key, json.dumps(value))
+                )
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+
+_store: Optional[StateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """Process-wide store selected by HARDWARE_STATE_DB"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            db_path = os.getenv('HARDWARE_STATE_DB')
+            _store = SqliteStateStore(db_path) if db_path else MemoryStateStore()
+        return _store
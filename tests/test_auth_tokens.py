@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip('jwt')
+pytest.importorskip('cryptography')
+
+from security import SecurityManager  # noqa: E402
+
+
+@pytest.fixture
+def manager():
+    return SecurityManager('test-secret-' + 'x' * 32)
+
+
+def test_agent_token_carries_identity_and_generation(manager):
+    payload = manager.verify_token(manager.generate_agent_token(7, 'agent-1', ['device_scan'], generation=2))
+
+    assert payload['typ'] == 'agent'
+    assert payload['sub'] == '7'
+    assert payload['name'] == 'agent-1'
+    assert payload['perms'] == ['device_scan']
+    assert payload['gen'] == 2
+
+
+def test_token_signed_with_another_secret_is_rejected(manager):
+    token = SecurityManager('other-secret-' + 'x' * 32).generate_agent_token(7, 'agent-1', [])
+    assert manager.verify_token(token) is None
+
+
+def test_refresh_near_expiry_keeps_agent_and_generation(manager):
+    old = manager.verify_token(manager.generate_agent_token(7, 'agent-1', ['device_scan'], generation=2,
+                                                            expires_minutes=4))
+    refreshed = manager.refresh_agent_token(old, expires_minutes=15)
+
+    new = manager.verify_token(refreshed)
+    assert (new['sub'], new['name'], new['perms'], new['gen']) == ('7', 'agent-1', ['device_scan'], 2)
+    assert new['exp'] > old['exp']
+    assert new['jti'] != old['jti']
+
+
+def test_no_refresh_while_token_is_fresh(manager):
+    payload = manager.verify_token(manager.generate_agent_token(7, 'agent-1', [], expires_minutes=15))
+    assert manager.refresh_agent_token(payload, expires_minutes=15) is None
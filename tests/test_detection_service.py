@@ -0,0 +1,31 @@
+import json
+import os
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def detection(config, tmp_path, monkeypatch):
+    # The module restores and saves detected_devices.json in the working directory
+    monkeypatch.chdir(tmp_path)
+    import hardware_detection_service
+    # Let the scan started by the import finish before the test touches the store
+    for thread in threading.enumerate():
+        if thread.name == 'initial-device-scan':
+            thread.join(timeout=30)
+    return hardware_detection_service
+
+
+def test_startup_runs_once_per_store(detection, tmp_path, monkeypatch):
+    scanned = threading.Event()
+    monkeypatch.setattr(detection, 'scan_devices', scanned.set)
+    (tmp_path / 'detected_devices.json').write_text(json.dumps([{'name': 'Saved printer'}]))
+    detection.store.release_lease('startup')
+
+    assert detection.startup() is True
+    assert detection.store.get('devices') == [{'name': 'Saved printer'}]
+    assert scanned.wait(2)
+    # Another worker starting on the same store leaves it alone
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert detection.startup() is False
@@ -0,0 +1,138 @@
+import queue
+import re
+import time
+
+import pytest
+
+import device_providers
+from device_providers import (DeviceInventory, DeviceProviderError, FakeDeviceProvider,
+                              LinuxSysfsProvider, PowerShellSessionProvider)
+from state_store import MemoryStateStore
+
+
+def write_files(directory, **files):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, content in files.items():
+        (directory / name).write_text(content + '\n')
+
+
+def test_sysfs_devices_are_normalized(tmp_path):
+    usb = tmp_path / 'bus' / 'usb' / 'devices'
+    write_files(usb / '1-1', idVendor='05e0', idProduct='1900', serial='S123',
+                manufacturer='Symbol', product='Bar Code Scanner', bDeviceClass='00')
+    write_files(usb / '1-1' / '1-1:1.0', bInterfaceClass='03')
+    write_files(usb / '1-2', idVendor='04b8', idProduct='0202', bDeviceClass='07')
+    write_files(usb / '1-1:1.0', bInterfaceClass='03')  # interface entry, skipped
+    write_files(tmp_path / 'class' / 'net' / 'lo', operstate='unknown')
+    write_files(tmp_path / 'class' / 'net' / 'eth0', operstate='down')
+    (tmp_path / 'class' / 'bluetooth' / 'hci0').mkdir(parents=True)
+
+    assert LinuxSysfsProvider(str(tmp_path)).list_devices() == [
+        {'class': 'HIDClass', 'device_id': 'USB\\VID_05E0&PID_1900\\S123',
+         'name': 'Symbol Bar Code Scanner', 'status': 'OK'},
+        {'class': 'Printer', 'device_id': 'USB\\VID_04B8&PID_0202\\1-2',
+         'name': 'USB Device 04b8:0202', 'status': 'OK'},
+        {'class': 'Net', 'device_id': 'NET\\eth0', 'name': 'eth0', 'status': 'Degraded'},
+        {'class': 'Bluetooth', 'device_id': 'BTH\\hci0', 'name': 'Bluetooth Adapter hci0', 'status': 'OK'},
+    ]
+
+
+class FakePowerShell:
+    """Stands in for powershell.exe: answers each query, then echoes its sentinel"""
+
+    def __init__(self, reply, answer=True):
+        self.reply = reply
+        self.answer = answer
+        self.stdin = self
+        self._out = queue.Queue()
+        self.stdout = iter(self._out.get, None)
+        self.returncode = None
+        self.commands = []
+
+    def write(self, text):
+        self.commands.append(text)
+        if self.answer:
+            for line in self.reply:
+                self._out.put(line + '\n')
+            self._out.put(re.search(r"Write-Output '(.+)'", text).group(1) + '\n')
+
+    def flush(self):
+        pass
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+        self._out.put(None)
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+@pytest.fixture
+def powershell(monkeypatch):
+    started = []
+
+    def start(reply, answer=True):
+        def popen(*args, **kwargs):
+            process = FakePowerShell(reply, answer)
+            started.append(process)
+            return process
+        monkeypatch.setattr(device_providers.subprocess, 'Popen', popen)
+        return started
+
+    return start
+
+
+def test_session_reads_output_up_to_the_sentinel(powershell):
+    started = powershell(['{"Class":"Printer","DeviceID":"USB\\\\VID_04B8","FriendlyName":"TM-T88","Status":"OK"}'])
+    provider = PowerShellSessionProvider(timeout=1)
+
+    assert provider.list_devices() == [
+        {'class': 'Printer', 'device_id': 'USB\\VID_04B8', 'name': 'TM-T88', 'status': 'OK'}]
+    assert provider.list_devices()
+    # Both queries went to the same warm process
+    assert len(started) == 1
+    assert len(started[0].commands) == 2
+
+
+def test_unanswered_query_kills_the_session(powershell):
+    started = powershell([], answer=False)
+    provider = PowerShellSessionProvider(timeout=0.1)
+
+    with pytest.raises(DeviceProviderError, match='timed out'):
+        provider.query('Get-PnpDevice')
+    assert started[0].returncode == -9
+    with pytest.raises(DeviceProviderError):
+        provider.query('Get-PnpDevice')
+    assert len(started) == 2
+
+
+def test_inventory_reuses_devices_within_ttl():
+    provider = FakeDeviceProvider([{'name': 'Scanner'}])
+    inventory = DeviceInventory(provider, ttl=0.2, store=MemoryStateStore())
+
+    assert inventory.get() == inventory.get() == [{'name': 'Scanner'}]
+    assert provider.calls == 1
+    time.sleep(0.25)
+    inventory.get()
+    assert provider.calls == 2
+
+
+class BrokenProvider(FakeDeviceProvider):
+    def list_devices(self):
+        self.calls += 1
+        raise DeviceProviderError('PowerShell query timed out')
+
+
+def test_failed_enumeration_is_not_retried_until_failure_ttl():
+    provider = BrokenProvider()
+    inventory = DeviceInventory(provider, ttl=0, store=MemoryStateStore(), failure_ttl=0.2)
+
+    assert inventory.get() == []
+    assert inventory.get() == []
+    assert provider.calls == 1
+    time.sleep(0.25)
+    inventory.get()
+    assert provider.calls == 2
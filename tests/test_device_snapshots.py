@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+
+from device_snapshots import SNAPSHOT_VERSION, DeviceSnapshot
+from ip_driver import ConnectionProtocol, NetworkDevice, NetworkDeviceType, NetworkScanner
+
+
+def test_save_is_atomic_and_skips_unchanged(tmp_path):
+    snapshot = DeviceSnapshot(str(tmp_path / 'state' / 'network_state.json'))
+    records = [{'ip': '10.0.0.1', 'last_seen': 1.0}]
+
+    assert snapshot.save(records) is True
+    assert snapshot.save(records) is False
+    assert os.listdir(tmp_path / 'state') == ['network_state.json']
+    with open(snapshot.path) as f:
+        assert json.load(f) == {'version': SNAPSHOT_VERSION, 'devices': records}
+
+
+def test_load_ignores_corrupt_and_stale(tmp_path):
+    path = tmp_path / 'network_state.json'
+    path.write_text('{"version": 1, "devices": [')
+    assert DeviceSnapshot(str(path)).load() == []
+
+    path.write_text(json.dumps({'version': 1, 'devices': [{'ip': 'a', 'last_seen': 0}]}))
+    assert DeviceSnapshot(str(path), max_age=60).load() == []
+
+
+def test_network_device_round_trip():
+    device = NetworkDevice('10.0.0.1', mac_address='AA', device_type=NetworkDeviceType.PRINTER,
+                           open_ports=[631, 9100], protocols=[ConnectionProtocol.IPP, ConnectionProtocol.RAW],
+                           connected_port=631, connected_protocol=ConnectionProtocol.IPP)
+    device.last_seen = 1234.5
+    restored = NetworkDevice.from_snapshot(device.to_snapshot())
+    assert restored.to_snapshot() == device.to_snapshot()
+    assert restored.last_seen == 1234.5
+
+
+def test_restore_filters_out_of_scope_and_disallowed(config):
+    config.NETWORK_SCAN_RANGE = '192.168.1.0/24'
+    config.NETWORK_SCAN_EXCLUDE = ['192.168.1.50']
+    config.ALLOWED_DEVICE_MACS = ['AA:AA:AA:AA:AA:AA']
+    config.AUTO_CONNECT_DEVICES = False
+    scanner = NetworkScanner(config)
+
+    def record(ip, mac):
+        device = NetworkDevice(ip, mac_address=mac, device_type=NetworkDeviceType.PRINTER, open_ports=[9100])
+        return device.to_snapshot()
+
+    scanner.snapshot.save([
+        record('192.168.1.10', 'AA:AA:AA:AA:AA:AA'),
+        record('192.168.1.50', 'AA:AA:AA:AA:AA:AA'),  # excluded
+        record('10.0.0.10', 'AA:AA:AA:AA:AA:AA'),  # outside the ranges
+        record('192.168.1.11', 'BB:BB:BB:BB:BB:BB'),  # not allowed
+        record('192.168.1.12', None),  # unknown MAC with an allow-list
+    ])
+
+    async def restore():
+        async def scan_port(ip, port, timeout=1.0):
+            return True
+        scanner._scan_port = scan_port
+        count = await scanner.restore_state()
+        await asyncio.sleep(0)
+        return count
+
+    assert asyncio.run(restore()) == 1
+    assert list(scanner.discovered_devices) == ['192.168.1.10']
@@ -0,0 +1,33 @@
+import time
+
+from event_bus import SharedEventBus
+from state_store import SqliteStateStore
+
+
+def test_events_reach_subscribers_in_other_workers(tmp_path):
+    db_path = str(tmp_path / 'state.db')
+    # One bus per worker process, sharing only the SQLite store
+    scanner_worker = SharedEventBus(SqliteStateStore(db_path), poll_interval=0.01)
+    stream_worker = SharedEventBus(SqliteStateStore(db_path), poll_interval=0.01)
+
+    subscription = stream_worker.subscribe(['nfc'])
+    scanner_worker.publish('qr', {'data': 'skipped'})
+    published = scanner_worker.publish('nfc', {'uid': '04:AA'})
+
+    message = subscription.get(timeout=2)
+    assert message['id'] == published['id']
+    assert message['data'] == {'uid': '04:AA'}
+    assert subscription.get(timeout=0.1) is None
+
+
+def test_relay_starts_after_existing_events(tmp_path):
+    store = SqliteStateStore(str(tmp_path / 'state.db'))
+    bus = SharedEventBus(store, poll_interval=60)
+    bus.publish('nfc', {'uid': 'old'})
+
+    subscription = bus.subscribe()
+    time.sleep(0.05)
+    assert bus.relay_once() == 0
+    bus.publish('nfc', {'uid': 'new'})
+    assert bus.relay_once() == 1
+    assert subscription.get(timeout=0)['data'] == {'uid': 'new'}
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import struct
+
+import fingerprint
+from fingerprint import FingerprintEngine, ipp_make_and_model_request, parse_ipp_make_and_model
+
+MAC = 'aa:bb:cc:dd:ee:ff'
+
+
+def ipp_response(make_and_model: str, chunked: bool = False) -> bytes:
+    value = make_and_model.encode()
+    name = b'printer-make-and-model'
+    body = (struct.pack('>BBHI', 1, 1, 0, 1) + b'\x04'
+            + struct.pack('>BH', 0x41, len(name)) + name + struct.pack('>H', len(value)) + value + b'\x03')
+    if chunked:
+        return (b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                + b'%x\r\n' % len(body) + body + b'\r\n0\r\n\r\n')
+    return b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n' % len(body) + body
+
+
+def test_no_probe_is_configured_for_raw_print_ports():
+    engine = FingerprintEngine()
+    assert not any(engine.probes.get(port) for port in fingerprint.RAW_PRINT_PORTS)
+
+
+def test_probe_for_raw_print_port_is_ignored(tmp_path):
+    path = tmp_path / 'fingerprints.json'
+    path.write_text('{"probes": {"9100": "@PJL INFO ID\\r\\n"}, "signatures": []}')
+    assert FingerprintEngine(path).probes[9100] == b''
+
+
+def test_grab_banner_never_writes_to_9100(monkeypatch):
+    engine = FingerprintEngine()
+    engine.probes[9100] = b'@PJL INFO ID\r\n'
+    received = []
+
+    async def handle(reader, writer):
+        received.append(await reader.read(64))
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(fingerprint, 'RAW_PRINT_PORTS', frozenset({port}))
+        engine.probes[port] = engine.probes[9100]
+        await engine.grab_banner('127.0.0.1', port, timeout=0.2)
+        await asyncio.sleep(0.05)
+        server.close()
+
+    asyncio.run(main())
+    assert received in ([], [b''])
+
+
+def test_empty_banner_grab_is_not_cached():
+    engine = FingerprintEngine()
+    assert engine.identify(MAC, [23], banners={}) is None
+    assert engine.lookup(MAC, [23]) == (False, None)
+
+    match = engine.identify(MAC, [23], banners={23: b'EPSON TM-T88VI'})
+    assert match is not None and match.name == 'epson_printer'
+    assert match.model == 'TM-T88VI'
+
+
+def test_negative_result_expires(monkeypatch):
+    engine = FingerprintEngine()
+    now = [1000.0]
+    monkeypatch.setattr(fingerprint.time, 'monotonic', lambda: now[0])
+
+    assert engine.identify(MAC, [23], banners={23: b'unrelated telnet service'}) is None
+    assert engine.lookup(MAC, [23]) == (True, None)
+
+    now[0] += fingerprint.NEGATIVE_TTL + 1
+    assert engine.lookup(MAC, [23]) == (False, None)
+
+
+def test_ipp_make_and_model_round_trip():
+    request = ipp_make_and_model_request('10.0.0.5')
+    assert request.startswith(b'POST /ipp/print HTTP/1.1')
+    assert b'printer-make-and-model' in request
+
+    assert parse_ipp_make_and_model(ipp_response('EPSON TM-m30')) == 'EPSON TM-m30'
+    assert parse_ipp_make_and_model(ipp_response('HP LaserJet Pro M404', chunked=True)) == 'HP LaserJet Pro M404'
+    assert parse_ipp_make_and_model(b'garbage') is None
+
+
+def test_query_ipp_identifies_printer():
+    engine = FingerprintEngine()
+
+    async def handle(reader, writer):
+        await reader.read(4096)
+        writer.write(ipp_response('Brother QL-820NWB'))
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await engine.query_ipp('127.0.0.1', port, timeout=1)
+        finally:
+            server.close()
+
+    make_and_model = asyncio.run(main())
+    match = engine.identify(MAC, [631], ipp=make_and_model)
+    assert match.name == 'brother_printer' and match.model == 'QL-820NWB'
+
+
+def test_overlapping_patterns_score_regardless_of_file_order(tmp_path):
+    generic = {'name': 'generic_epson', 'device_type': 'printer', 'banner': ['EPSON']}
+    receipt = {'name': 'epson_receipt', 'device_type': 'printer', 'ports': [9100], 'banner': ['EPSON TM-\\w+']}
+
+    for order in ([generic, receipt], [receipt, generic]):
+        path = tmp_path / 'fingerprints.json'
+        path.write_text(json.dumps({'signatures': order}))
+        match = FingerprintEngine(path).identify(MAC, [9100], banners={9100: b'EPSON TM-T88VI'})
+        assert match.name == 'epson_receipt'
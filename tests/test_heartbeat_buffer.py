@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from controllers.heartbeat import HeartbeatBuffer
+
+
+class FakeCursor:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def execute(self, query, params=None):
+        if self.fail:
+            raise RuntimeError('could not serialize access')
+        self.calls.append((query, params))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def no_cursor(dbname):
+    raise AssertionError('the test flushes explicitly')
+
+
+def test_heartbeats_are_coalesced_into_one_update():
+    buffer = HeartbeatBuffer('test', no_cursor)
+    buffer.record(1)
+    buffer.record(2, {'devices': 2})
+    buffer.record(1)
+    cursor = FakeCursor()
+
+    assert buffer.flush(cursor) == 2
+    assert len(cursor.calls) == 1
+    ids, _heartbeats, status_data = cursor.calls[0][1]
+    assert ids == [1, 2]
+    assert status_data == [None, '{"devices": 2}']
+    assert buffer.flush(cursor) == 0
+
+
+def test_flush_skips_heartbeats_from_before_logout():
+    buffer = HeartbeatBuffer('test', no_cursor)
+    buffer.record(1, {'devices': 2})
+    cursor = FakeCursor()
+
+    buffer.flush(cursor)
+    query, _params = cursor.calls[0]
+    assert 'v.last_heartbeat > a.logout_date' in query
+
+
+def test_unchanged_status_data_is_not_rewritten():
+    buffer = HeartbeatBuffer('test', no_cursor)
+    cursor = FakeCursor()
+    buffer.record(1, {'devices': 2})
+    buffer.flush(cursor)
+
+    buffer.record(1, {'devices': 2})
+    buffer.flush(cursor)
+    assert cursor.calls[-1][1][2] == [None]
+
+
+def test_failed_flush_keeps_heartbeats_for_the_next_one():
+    buffer = HeartbeatBuffer('test', no_cursor)
+    buffer.record(1, {'devices': 2})
+
+    with pytest.raises(RuntimeError):
+        buffer.flush(FakeCursor(fail=True))
+    cursor = FakeCursor()
+    assert buffer.flush(cursor) == 1
+    assert cursor.calls[0][1][2] == ['{"devices": 2}']
+
+
+def test_logout_drops_pending_heartbeats():
+    buffer = HeartbeatBuffer('test', no_cursor)
+    buffer.record(1)
+    buffer.forget(1)
+    assert buffer.flush(FakeCursor()) == 0
+
+
+def test_timer_flushes_without_further_heartbeats():
+    cursor = FakeCursor()
+    buffer = HeartbeatBuffer('test', lambda dbname: cursor, flush_interval=0.05)
+    buffer.record(1)
+    buffer.ensure_flusher()
+
+    deadline = time.monotonic() + 2
+    while not cursor.calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cursor.calls
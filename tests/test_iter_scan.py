@@ -0,0 +1,59 @@
+import asyncio
+
+from ip_driver import NetworkDevice, NetworkDeviceType, NetworkScanner
+
+
+def make_scanner(config, cidr='10.0.0.0/28'):
+    config.NETWORK_SCAN_RANGE = cidr
+    config.ENABLE_PASSIVE_DISCOVERY = False
+    config.ENABLE_STATE_SNAPSHOTS = False
+    scanner = NetworkScanner(config)
+
+    async def scan_single_host(ip):
+        return NetworkDevice(ip_address=ip, device_type=NetworkDeviceType.PRINTER, open_ports=[9100])
+
+    scanner._scan_single_host = scan_single_host
+    return scanner
+
+
+def test_iter_scan_yields_every_host(config):
+    scanner = make_scanner(config)
+
+    async def collect():
+        return [device.ip_address async for device in scanner.iter_scan(concurrency=4)]
+
+    ips = asyncio.run(collect())
+    assert sorted(ips) == sorted(f'10.0.0.{i}' for i in range(1, 15))
+
+
+def test_iter_scan_early_close_does_not_hang(config):
+    scanner = make_scanner(config, '10.0.0.0/24')
+
+    async def first_then_close():
+        scan = scanner.iter_scan(concurrency=2)
+        first = await scan.__anext__()
+        # Let the workers fill the bounded results queue before closing
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(scan.aclose(), timeout=2)
+        return first
+
+    assert asyncio.run(first_then_close()).ip_address.startswith('10.0.0.')
+
+
+def test_iter_scan_propagates_worker_errors(config):
+    scanner = make_scanner(config)
+
+    async def failing(ip):
+        raise RuntimeError('boom')
+
+    scanner._scan_single_host = failing
+
+    async def collect():
+        return [device async for device in scanner.iter_scan(concurrency=2)]
+
+    try:
+        asyncio.run(asyncio.wait_for(collect(), timeout=2))
+    except RuntimeError as e:
+        assert str(e) == 'boom'
+    else:
+        raise AssertionError('worker error was swallowed')
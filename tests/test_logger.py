@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import queue
+
+import pytest
+
+import utils.logger as logger_module
+from utils.logger import (DeviceLogger, DroppingQueueHandler, JsonLineFormatter, RoutingQueueListener,
+                          StructuredMessage, add_log_handler, log_event)
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def capture(logger):
+    handler = Capture()
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return handler
+
+
+def test_log_event_reports_call_site():
+    logger = logging.getLogger('test_logger.events')
+    handler = capture(logger)
+    log_event(logger, logging.INFO, 'discovered', device='10.0.0.1')
+
+    record = handler.records[-1]
+    assert record.funcName == 'test_log_event_reports_call_site'
+    line = json.loads(JsonLineFormatter().format(record))
+    assert line['event'] == 'discovered' and line['device'] == '10.0.0.1'
+
+
+def test_log_event_skips_disabled_level():
+    logger = logging.getLogger('test_logger.disabled')
+    handler = capture(logger)
+    logger.setLevel(logging.INFO)
+    log_event(logger, logging.DEBUG, 'alive', device='10.0.0.1')
+    assert handler.records == []
+
+
+def test_device_logger_wrappers_report_real_caller():
+    device_logger = DeviceLogger.__new__(DeviceLogger)
+    device_logger.logger = logging.getLogger('test_logger.device')
+    handler = capture(device_logger.logger)
+
+    device_logger.device_connected('printer-1', transport='usb')
+    device_logger.event('custom', device='printer-1')
+
+    assert [record.funcName for record in handler.records] == ['test_device_logger_wrappers_report_real_caller'] * 2
+    assert isinstance(handler.records[0].msg, StructuredMessage)
+    assert str(handler.records[0].msg) == '{"event":"connected","device":"printer-1","transport":"usb"}'
+
+
+def make_listener(maxsize=100):
+    listener = RoutingQueueListener(queue.Queue(maxsize=maxsize))
+    logger = logging.getLogger(f'test_logger.routed.{id(listener)}')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(DroppingQueueHandler(listener, logger.name))
+    return listener, logger
+
+
+def test_full_queue_drops_and_counts_instead_of_blocking():
+    listener, logger = make_listener(maxsize=2)  # not started: nothing drains the queue
+    for i in range(5):
+        logger.info('record %d', i)
+    assert listener.queue.qsize() == 2
+    assert listener.dropped == 3
+
+
+def test_records_reach_only_their_logger_handlers_at_their_level():
+    listener, logger = make_listener()
+    other, errors = Capture(), Capture()
+    errors.setLevel(logging.ERROR)
+    own = Capture()
+    listener.add_handler(logger.name, own)
+    listener.add_handler(logger.name, errors)
+    listener.add_handler('some.other.logger', other)
+
+    listener.start()
+    try:
+        logger.info('info')
+        logger.error('error')
+    finally:
+        listener.stop()
+    assert [record.getMessage() for record in own.records] == ['info', 'error']
+    assert [record.getMessage() for record in errors.records] == ['error']
+    assert other.records == []
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_forked_child_gets_its_own_writer_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(logger_module, '_listener', None)
+    logger = logging.getLogger('test_logger.forked')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    log_file = tmp_path / 'child.log'
+    file_handler = logging.FileHandler(log_file)
+    add_log_handler(logger, file_handler)
+    listener = logger_module._get_listener()
+    logger.addHandler(DroppingQueueHandler(listener, logger.name))
+
+    pid = os.fork()
+    if pid == 0:  # child: log through the restarted listener, flush, leave
+        try:
+            logger.info('from child %d', os.getpid())
+            logger_module.shutdown_logging()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    logger_module.shutdown_logging()
+    assert f'from child {pid}' in log_file.read_text()
@@ -0,0 +1,62 @@
+import math
+import threading
+
+from utils.metrics import Counter, Histogram, MetricsRegistry, _fmt
+
+
+def run_in_threads(fn, count):
+    for _ in range(count):
+        thread = threading.Thread(target=fn)
+        thread.start()
+        thread.join()
+
+
+def test_cells_of_exited_threads_are_folded():
+    counter = Counter()
+    histogram = Histogram(buckets=(0.1, 1.0))
+
+    def work():
+        counter.inc()
+        histogram.observe(0.5)
+
+    run_in_threads(work, 500)
+
+    assert len(counter._cells) == 0
+    assert len(histogram._cells) == 0
+    assert counter.value() == 500
+    assert histogram.snapshot() == ([0, 500, 500], 250.0)
+
+
+def test_live_thread_cells_are_counted_once():
+    counter = Counter()
+    counter.inc(2)
+    run_in_threads(counter.inc, 3)
+    assert counter.value() == 5
+    assert len(counter._cells) == 1  # only the main thread's cell remains
+
+
+def test_fmt_special_values():
+    assert _fmt(float('inf')) == '+Inf'
+    assert _fmt(float('-inf')) == '-Inf'
+    assert _fmt(math.nan) == 'NaN'
+    assert _fmt(3.0) == '3'
+    assert _fmt(0.25) == '0.25'
+
+
+def test_render_with_infinite_gauge_and_labels():
+    registry = MetricsRegistry()
+    registry.gauge('queue_depth', 'Depth').set(float('inf'))
+    registry.counter('events_total', 'Events', ['kind']).labels('a"b').inc()
+    text = registry.render()
+    assert 'queue_depth +Inf' in text
+    assert 'events_total{kind="a\\"b"} 1' in text
+
+
+def test_device_connector_records_metrics():
+    from drivers.device_connector import CONNECTOR_CONNECTIONS, DeviceConnector
+
+    connector = DeviceConnector()
+    connector._test_tcp_connection = lambda ip, port, timeout=2.0: False
+    before = CONNECTOR_CONNECTIONS.labels('printer', 'failure').value()
+    assert connector.connect_device('192.0.2.1', 'printer') is False
+    assert CONNECTOR_CONNECTIONS.labels('printer', 'failure').value() == before + 1
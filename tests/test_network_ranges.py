@@ -0,0 +1,46 @@
+import ipaddress
+from types import SimpleNamespace
+
+from network_ranges import ScanRange, build_scan_ranges, in_scope, interleave_hosts
+
+
+def make_config(ranges, auto_detect=False):
+    return SimpleNamespace(NETWORK_SCAN_RANGE='192.168.1.0/24', NETWORK_SCAN_RANGES=ranges,
+                           NETWORK_AUTO_DETECT_SUBNETS=auto_detect)
+
+
+def detected(cidr, interface='eth0'):
+    return ScanRange(ipaddress.IPv4Network(cidr), interface, 'interface')
+
+
+def test_host_count_matches_hosts():
+    for cidr in ('10.0.0.0/24', '10.0.0.0/30', '10.0.0.0/31', '10.0.0.1/32'):
+        scan_range = ScanRange(ipaddress.IPv4Network(cidr))
+        assert scan_range.host_count == len(list(scan_range.network.hosts()))
+
+
+def test_configured_range_keeps_config_source():
+    ranges = build_scan_ranges(make_config(['10.0.0.0/16'], auto_detect=True),
+                               local_subnets=[detected('10.0.5.0/24')])
+    assert [(r.cidr, r.source, r.interface) for r in ranges] == [('10.0.0.0/16', 'config', None)]
+
+
+def test_detected_only_range_is_labelled_with_interface():
+    ranges = build_scan_ranges(make_config(['10.0.0.0/24'], auto_detect=True),
+                               local_subnets=[detected('172.16.0.0/24', 'wlan0')])
+    assert [(r.cidr, r.source, r.interface) for r in ranges] == [
+        ('10.0.0.0/24', 'config', None), ('172.16.0.0/24', 'interface', 'wlan0')]
+
+
+def test_interleave_round_robin_and_exclude():
+    ranges = build_scan_ranges(make_config(['10.0.0.0/30', '10.0.1.0/30']))
+    hosts = [ip for ip, _ in interleave_hosts(ranges, exclude=['10.0.1.2'])]
+    assert hosts == ['10.0.0.1', '10.0.1.1', '10.0.0.2']
+
+
+def test_in_scope():
+    ranges = build_scan_ranges(make_config(['10.0.0.0/24']))
+    assert in_scope('10.0.0.5', ranges)
+    assert not in_scope('10.0.1.5', ranges)
+    assert not in_scope('10.0.0.5', ranges, exclude=['10.0.0.0/29'])
+    assert not in_scope('not-an-ip', ranges)
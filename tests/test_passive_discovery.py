@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+from ip_driver import NetworkDevice, NetworkDeviceType, NetworkScanner
+from passive_discovery import PassiveDiscovery, parse_ssdp
+
+MDNS_HINTS = {'source': 'mdns', 'port': 9100, 'protocol': 'raw', 'hostname': 'printer.local',
+              'manufacturer': 'EPSON', 'model': 'EPSON TM-m30'}
+
+
+def make_scanner(config, mac='00:11:22:33:44:55'):
+    config.NETWORK_SCAN_RANGE = '192.168.1.0/24'
+    config.NETWORK_SCAN_EXCLUDE = ['192.168.1.200/29']
+    config.AUTO_CONNECT_DEVICES = False
+    config.ENABLE_STATE_SNAPSHOTS = False
+    scanner = NetworkScanner(config)
+    probed = []
+
+    async def get_mac(ip):
+        return mac
+
+    async def scan_single_host(ip):
+        probed.append(ip)
+        return NetworkDevice(ip_address=ip, mac_address=mac, device_type=NetworkDeviceType.PRINTER,
+                             open_ports=[9100])
+
+    scanner._get_mac_address = get_mac
+    scanner._scan_single_host = scan_single_host
+    return scanner, probed
+
+
+def test_announcement_registers_device_with_mac(config):
+    scanner, probed = make_scanner(config)
+    asyncio.run(scanner.handle_announcement('192.168.1.10', dict(MDNS_HINTS)))
+
+    device = scanner.discovered_devices['192.168.1.10']
+    assert device.mac_address == '00:11:22:33:44:55'
+    assert device.device_type == NetworkDeviceType.PRINTER
+    assert device.manufacturer == 'EPSON'
+    assert probed == []
+
+
+def test_announcement_outside_ranges_or_excluded_is_ignored(config):
+    scanner, probed = make_scanner(config)
+
+    async def announce():
+        await scanner.handle_announcement('10.9.9.9', dict(MDNS_HINTS))
+        await scanner.handle_announcement('192.168.1.201', dict(MDNS_HINTS))
+        await scanner.handle_announcement('192.168.1.202', {'source': 'ssdp'})
+
+    asyncio.run(announce())
+    assert scanner.discovered_devices == {}
+    assert scanner.passive_hosts == {}
+    assert probed == []
+
+
+def test_announcement_respects_mac_allow_list(config):
+    scanner, _ = make_scanner(config, mac=None)
+    config.ALLOWED_DEVICE_MACS = ['00:11:22:33:44:55']
+    asyncio.run(scanner.handle_announcement('192.168.1.10', dict(MDNS_HINTS)))
+    assert scanner.discovered_devices == {}
+
+    scanner, _ = make_scanner(config, mac='66:77:88:99:aa:bb')
+    asyncio.run(scanner.handle_announcement('192.168.1.10', dict(MDNS_HINTS)))
+    assert scanner.discovered_devices == {}
+
+    scanner, _ = make_scanner(config)
+    asyncio.run(scanner.handle_announcement('192.168.1.10', dict(MDNS_HINTS)))
+    assert '192.168.1.10' in scanner.discovered_devices
+
+
+def test_parse_ssdp():
+    headers = parse_ssdp(b'NOTIFY * HTTP/1.1\r\nLOCATION: http://192.168.1.5:80/desc.xml\r\nNTS: ssdp:alive\r\n\r\n')
+    assert headers['location'] == 'http://192.168.1.5:80/desc.xml'
+    assert parse_ssdp(b'M-SEARCH * HTTP/1.1\r\n\r\n') is None
+
+
+def test_rate_limit_forgets_announcers_after_the_window():
+    reported = []
+
+    async def on_announcement(ip, hints):
+        reported.append(ip)
+
+    async def announce():
+        discovery = PassiveDiscovery(on_announcement, repeat_after=0.05)
+        for i in range(100):
+            discovery.announce(f'192.168.1.{i}', {'source': 'ssdp'})
+        discovery.announce('192.168.1.0', {'source': 'ssdp'})
+        assert discovery.stats['suppressed'] == 1
+
+        time.sleep(0.06)
+        discovery.announce('192.168.1.0', {'source': 'ssdp'})
+        await asyncio.sleep(0)
+        return discovery
+
+    discovery = asyncio.run(announce())
+    assert list(discovery._last_reported) == [('192.168.1.0', 'ssdp', None)]
+    assert reported.count('192.168.1.0') == 2
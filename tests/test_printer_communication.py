@@ -0,0 +1,233 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import printer_communication
+from printer_communication import STATUS_REQUEST, PrinterSpooler
+
+
+class FakePrinter:
+    """TCP server recording what it receives; replies to status requests if asked to"""
+
+    def __init__(self, status_reply=None, reply_delay=0.0):
+        self.status_reply = status_reply
+        self.reply_delay = reply_delay
+        self.received = bytearray()
+        self.connections = 0
+        self._server = socket.create_server(('127.0.0.1', 0))
+        self.port = self._server.getsockname()[1]
+        self._closed = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    data = conn.recv(65536)
+                except OSError:
+                    return
+                if not data:
+                    return
+                self.received += data
+                if STATUS_REQUEST in data and self.status_reply is not None:
+                    reply = self.status_reply
+                    if self.reply_delay:
+                        time.sleep(self.reply_delay)
+                    conn.sendall(reply)
+
+    def close(self):
+        self._closed = True
+        self._server.close()
+
+
+@pytest.fixture
+def printer():
+    fake = FakePrinter(status_reply=b'\x00')
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def silent_printer():
+    fake = FakePrinter()
+    yield fake
+    fake.close()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_jobs_share_one_connection(printer):
+    spooler = PrinterSpooler('127.0.0.1', printer.port)
+    try:
+        futures = [spooler.submit(b'job %d\n' % i) for i in range(10)]
+        assert [future.result(timeout=2) for future in futures] == [6] * 10
+        assert spooler.query_status().result(timeout=2)['status'] == 'online'
+    finally:
+        spooler.close()
+    assert printer.connections == 1
+
+
+def test_text_payloads_are_encoded(printer):
+    spooler = PrinterSpooler('127.0.0.1', printer.port)
+    try:
+        assert spooler.submit('Grüße\n').result(timeout=2) == len('Grüße\n'.encode('utf-8'))
+        assert spooler.submit(['a', b'b', 'c']).result(timeout=2) == 3
+    finally:
+        spooler.close()
+    assert wait_for(lambda: bytes(printer.received) == 'Grüße\n'.encode('utf-8') + b'abc')
+
+
+def test_unanswered_status_does_not_stall_print_jobs(silent_printer):
+    spooler = PrinterSpooler('127.0.0.1', silent_printer.port, status_timeout=0.2)
+    try:
+        assert spooler.query_status().result(timeout=2)['status'] == 'unknown'
+        started = time.monotonic()
+        assert spooler.submit(b'after status').result(timeout=2) == 12
+        assert time.monotonic() - started < 1
+    finally:
+        spooler.close()
+    assert silent_printer.connections == 1
+
+
+def test_status_service_reports_full_queue_as_busy(silent_printer, monkeypatch):
+    spooler = PrinterSpooler('127.0.0.1', silent_printer.port, max_queue=1, status_timeout=1.0)
+    monkeypatch.setitem(printer_communication._spoolers, ('127.0.0.1', silent_printer.port), spooler)
+    service = printer_communication.PrinterStatusService(timeout=0.2)
+    service.add_printer('127.0.0.1', silent_printer.port, escpos=True)
+    try:
+        spooler.query_status()  # worker blocks on the silent printer
+        assert wait_for(lambda: spooler._queue.qsize() == 0)
+        spooler.submit(b'queued')  # fills the queue
+        assert service._probe('127.0.0.1', silent_printer.port) == {'status': 'busy'}
+    finally:
+        service.stop()
+        spooler.close()
+
+
+def test_timed_out_test_print_is_cancelled(silent_printer, monkeypatch):
+    spooler = PrinterSpooler('127.0.0.1', silent_printer.port, status_timeout=0.5)
+    monkeypatch.setitem(printer_communication._spoolers, ('127.0.0.1', silent_printer.port), spooler)
+    try:
+        spooler.query_status()  # keeps the worker busy past the caller's timeout
+        assert wait_for(lambda: spooler._queue.qsize() == 0)
+        assert printer_communication.test_printer_communication('127.0.0.1', silent_printer.port, timeout=0.1) is False
+        spooler.submit(b'next').result(timeout=2)
+    finally:
+        spooler.close()
+    assert b'Hardware Test Print' not in silent_printer.received
+
+
+def test_late_status_reply_is_not_read_by_the_next_query():
+    printer = FakePrinter(status_reply=b'\x08', reply_delay=0.3)
+    spooler = PrinterSpooler('127.0.0.1', printer.port, status_timeout=0.1)
+    try:
+        assert spooler.query_status().result(timeout=2)['status'] == 'unknown'
+        time.sleep(0.4)  # the offline reply arrives after its query gave up
+        printer.status_reply, printer.reply_delay = b'\x00', 0.0
+        assert spooler.query_status().result(timeout=2)['status'] == 'online'
+    finally:
+        spooler.close()
+        printer.close()
+
+
+def test_silent_escpos_printer_is_unknown_not_offline(silent_printer):
+    service = printer_communication.PrinterStatusService(timeout=0.2)
+    try:
+        status = service.get_status('127.0.0.1', silent_printer.port, escpos=True)
+    finally:
+        service.stop()
+    assert status['status'] == 'unknown'
+    assert STATUS_REQUEST in silent_printer.received
+
+
+def test_printers_not_known_to_be_escpos_are_never_written_to(printer):
+    service = printer_communication.PrinterStatusService(interval=0.05, timeout=0.2)
+    service.add_printer('127.0.0.1', printer.port)
+    service.start()
+    try:
+        status = service.get_status('127.0.0.1', printer.port)
+        time.sleep(0.2)
+    finally:
+        service.stop()
+    assert status['status'] == 'unknown' and status['reachable']
+    # One connect-only probe from get_status; the poller skipped the printer
+    assert printer.connections == 1
+    assert printer.received == b''
+
+
+def test_file_job_is_streamed_with_sendfile(printer, tmp_path):
+    job = tmp_path / 'label.zpl'
+    content = bytes(range(256)) * 8192  # 2 MiB
+    job.write_bytes(content)
+    spooler = PrinterSpooler('127.0.0.1', printer.port)
+    try:
+        assert spooler.submit_file(job).result(timeout=5) == len(content)
+    finally:
+        spooler.close()
+    assert wait_for(lambda: len(printer.received) == len(content), timeout=5)
+    assert bytes(printer.received) == content
+
+
+class ChoppySocket:
+    """Accepts at most `limit` bytes per call, like a socket with a full send buffer"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.writes = []
+
+    def sendmsg(self, buffers):
+        data = b''.join(bytes(buffer) for buffer in buffers)[:self.limit]
+        self.writes.append(data)
+        return len(data)
+
+    def sendall(self, data):
+        self.writes.append(bytes(data))
+
+
+def test_partial_sendmsg_writes_are_resumed_in_order():
+    sock = ChoppySocket(limit=3)
+    buffers = [b'abcd', b'', b'ef', b'ghijklm']
+
+    assert PrinterSpooler._send_buffers(sock, buffers) == 13
+    assert b''.join(sock.writes) == b'abcdefghijklm'
+    assert all(len(write) <= 3 for write in sock.writes)
+
+
+def test_stream_chunks_are_sliced_without_joining(monkeypatch):
+    monkeypatch.setattr(printer_communication, 'STREAM_CHUNK_SIZE', 4)
+    sock = ChoppySocket(limit=None)
+
+    assert PrinterSpooler._send_stream(sock, iter([b'0123456789', b'ab'])) == 12
+    assert sock.writes == [b'0123', b'4567', b'89', b'ab']
+
+
+def test_large_jobs_arrive_intact_over_a_real_socket(printer):
+    buffers = [bytes([i]) * (1024 * 1024) for i in range(1, 4)]
+    chunks = (bytes([i]) * 100_000 for i in range(4, 8))
+    spooler = PrinterSpooler('127.0.0.1', printer.port)
+    try:
+        assert spooler.submit(buffers).result(timeout=5) == 3 * 1024 * 1024
+        assert spooler.submit_stream(chunks).result(timeout=5) == 400_000
+    finally:
+        spooler.close()
+    expected = b''.join(buffers) + b''.join(bytes([i]) * 100_000 for i in range(4, 8))
+    assert wait_for(lambda: len(printer.received) == len(expected), timeout=5)
+    assert bytes(printer.received) == expected
@@ -0,0 +1,83 @@
+import asyncio
+
+from ip_driver import NetworkDevice, NetworkDeviceType, NetworkScanner
+
+
+def make_scanner(config, mac='00:11:22:33:44:55'):
+    config.AUTO_CONNECT_DEVICES = False
+    config.ENABLE_STATE_SNAPSHOTS = False
+    events = []
+    scanner = NetworkScanner(config, device_callback=lambda device, event: events.append((device.ip_address, event)))
+
+    async def ping(ip):
+        return True, 0.001
+
+    async def ports(ip):
+        return [9100]
+
+    async def get_mac(ip):
+        return mac
+
+    async def nothing(*args):
+        return None
+
+    scanner._ping_host = ping
+    scanner._scan_host_ports = ports
+    scanner._get_mac_address = get_mac
+    scanner._resolve_hostname = nothing
+    scanner.fingerprints.collect = lambda ip, ports: asyncio.sleep(0, {})
+    return scanner, events
+
+
+def test_partial_only_for_new_hosts(config):
+    scanner, events = make_scanner(config)
+    asyncio.run(scanner._scan_single_host('10.0.0.1'))
+    assert events == [('10.0.0.1', 'partial')]
+
+    scanner.discovered_devices['10.0.0.1'] = NetworkDevice('10.0.0.1', device_type=NetworkDeviceType.PRINTER)
+    events.clear()
+    device = asyncio.run(scanner._scan_single_host('10.0.0.1'))
+    assert device is not None and events == []
+
+
+def test_partial_respects_allow_list(config):
+    config.ALLOWED_DEVICE_MACS = ['AA:AA:AA:AA:AA:AA']
+    scanner, events = make_scanner(config)
+    asyncio.run(scanner._scan_single_host('10.0.0.1'))
+    assert events == []
+
+    scanner, events = make_scanner(config, mac='AA:AA:AA:AA:AA:AA')
+    asyncio.run(scanner._scan_single_host('10.0.0.1'))
+    assert events == [('10.0.0.1', 'partial')]
+
+
+def test_failing_stage_cancels_the_others(config):
+    scanner, _ = make_scanner(config)
+    config.ALLOWED_DEVICE_MACS = []
+    scanner.device_callback = None
+    blocked = []
+
+    async def slow_mac(ip):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            blocked.append('cancelled')
+            raise
+
+    async def failing_hostname(ip):
+        raise RuntimeError('resolver exploded')
+
+    async def no_probes(ip, ports, mac_task):
+        return {}
+
+    scanner._get_mac_address = slow_mac
+    scanner._resolve_hostname = failing_hostname
+    scanner._collect_fingerprint = no_probes
+
+    async def scan():
+        result = await scanner._scan_single_host('10.0.0.1')
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(asyncio.wait_for(scan(), timeout=2)) is None
+    assert blocked == ['cancelled']
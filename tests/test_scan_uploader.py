@@ -0,0 +1,159 @@
+import threading
+import time
+
+import pytest
+
+from scan_uploader import AUTH_FAILED_CODE, INVALID_BATCH_CODE, ScanUploader
+from state_store import MemoryStateStore
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Answers login and batch calls; batch replies come from a script"""
+
+    def __init__(self, batch_replies=()):
+        self.batch_replies = list(batch_replies)
+        self.logins = 0
+        self.batches = []
+        self.batch_times = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json, timeout):
+        with self.lock:
+            if url.endswith('/hardware/auth/login'):
+                self.logins += 1
+                return FakeResponse({'result': {'success': True, 'token': f'token-{self.logins}', 'agent_id': 7}})
+            self.batches.append(json['params'])
+            self.batch_times.append(time.monotonic())
+            if self.batch_replies:
+                return FakeResponse(self.batch_replies.pop(0))
+            return FakeResponse({'result': {'success': True, 'recorded': len(json['params']['scans']), 'rejected': []}})
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def uploader_config(config):
+    config.SCAN_BATCH_SIZE = 50
+    config.SCAN_FLUSH_INTERVAL = 0.05
+    config.AGENT_NAME = 'agent-1'
+    config.API_KEY = 'secret'
+    return config
+
+
+def test_partial_batch_is_flushed_after_interval(uploader_config):
+    session = FakeSession()
+    uploader = ScanUploader(uploader_config, session=session)
+    uploader.start()
+    try:
+        uploader.add_scan(1, 'code', 'barcode')
+        assert wait_for(lambda: uploader.sent == 1, timeout=1.0)
+    finally:
+        uploader.stop()
+    assert session.batches[0]['token'] == 'token-1'
+    assert session.batches[0]['agent_id'] == 7
+
+
+def test_jsonrpc_error_requeues_batch(uploader_config):
+    session = FakeSession([{'error': {'code': 200, 'message': 'Odoo Server Error'}}])
+    uploader = ScanUploader(uploader_config, session=session)
+    uploader.add_scan(1, 'code', 'barcode')
+
+    assert uploader.flush() is False
+    assert uploader.get_stats()['buffered'] == 1
+    assert uploader.flush() is True
+    assert uploader.sent == 1
+
+
+def test_rejected_token_logs_in_again(uploader_config):
+    session = FakeSession([{'result': {'success': False, 'error': 'Authentication failed', 'code': AUTH_FAILED_CODE}}])
+    uploader = ScanUploader(uploader_config, session=session)
+    uploader.add_scan(1, 'code', 'barcode')
+
+    assert uploader.flush() is False
+    assert uploader.flush() is True
+    assert session.logins == 2
+    assert session.batches[-1]['token'] == 'token-2'
+    assert uploader.sent == 1
+
+
+def test_detections_map_to_scan_types(uploader_config):
+    uploader_config.SCAN_DEVICE_IDS = {'qr': 'QR-001'}
+    uploader = ScanUploader(uploader_config, session=FakeSession())
+
+    assert uploader.add_detection('nfc', {'uid': '04:AA:BB:CC', 'data': 'NFC Data 1'})
+    assert uploader.add_detection('qr', {'data': 'https://example.com/qr/1'})
+    assert not uploader.add_detection('palmvein', {'template_id': 'PALM_1'})
+    assert list(uploader._buffer) == [
+        {'device_id': 'agent-1:nfc', 'scan_data': '04:AA:BB:CC', 'scan_type': 'nfc'},
+        {'device_id': 'QR-001', 'scan_data': 'https://example.com/qr/1', 'scan_type': 'qr'},
+    ]
+
+
+def test_server_error_keeps_batch_and_backs_off(uploader_config):
+    session = FakeSession([{'result': {'success': False, 'error': 'deadlock detected', 'code': 'SERVER_ERROR'}}] * 2)
+    uploader = ScanUploader(uploader_config, session=session)
+    uploader.start()
+    try:
+        uploader.add_scan(1, 'code', 'barcode')
+        assert wait_for(lambda: uploader.sent == 1)
+    finally:
+        uploader.stop()
+    assert uploader.dropped == 0
+    # Waits of one flush interval, then double that
+    first, second, third = session.batch_times
+    assert second - first >= 0.05
+    assert third - second >= 0.1
+
+
+def test_invalid_batch_is_dropped_and_counted(uploader_config):
+    session = FakeSession([{'result': {'success': False, 'error': 'Batch too large', 'code': INVALID_BATCH_CODE}}])
+    uploader = ScanUploader(uploader_config, session=session)
+    uploader.add_scan(1, 'a', 'barcode')
+    uploader.add_scan(1, 'b', 'barcode')
+
+    assert uploader.flush() is True
+    assert uploader.dropped == 2
+    assert uploader.get_stats()['buffered'] == 0
+
+
+def test_workers_share_one_login(uploader_config):
+    store = MemoryStateStore()
+    session = FakeSession()
+    workers = [ScanUploader(uploader_config, session=session, store=store) for _ in range(3)]
+    for worker in workers:
+        worker.add_scan(1, 'code', 'barcode')
+        assert worker.flush() is True
+    assert session.logins == 1
+    assert {batch['token'] for batch in session.batches} == {'token-1'}
+
+
+def test_stale_rejection_keeps_newer_shared_token(uploader_config):
+    store = MemoryStateStore()
+    session = FakeSession()
+    first = ScanUploader(uploader_config, session=session, store=store)
+    second = ScanUploader(uploader_config, session=session, store=store)
+    first._login()
+    second._forget_token('token-1')
+    second._login()
+
+    # first's late rejection of token-1 must not discard token-2
+    first._forget_token('token-1')
+    assert store.get('scan_uploader:auth')['token'] == 'token-2'
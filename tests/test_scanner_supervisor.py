@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from state_store import MemoryStateStore
+
+
+@pytest.fixture
+def apps(config):
+    # Imported after the config fixture so the module-level Config uses the temp home
+    import apps
+    return apps
+
+
+def make_supervisor(apps, store, interval=0.01):
+    return apps.ScannerSupervisor({'nfc': (interval, lambda: None)}, store)
+
+
+def test_expired_claim_of_another_process_is_taken_over(apps):
+    store = MemoryStateStore()
+    store.set('scanning', {'nfc': {'owner': -1, 'run': 'crashed', 'expires': time.time() - 1}})
+    supervisor = make_supervisor(apps, store)
+    try:
+        assert supervisor.state() == {'nfc': False}
+        assert supervisor.start('nfc') is True
+        assert supervisor.is_running('nfc')
+    finally:
+        supervisor.shutdown()
+
+
+def test_live_claim_of_another_process_is_respected(apps):
+    store = MemoryStateStore()
+    store.set('scanning', {'nfc': {'owner': -1, 'run': 'other', 'expires': time.time() + 30}})
+    supervisor = make_supervisor(apps, store)
+    try:
+        assert supervisor.start('nfc') is False
+        assert supervisor.is_running('nfc')
+    finally:
+        supervisor.shutdown()
+
+
+def test_running_scanner_renews_its_claim(apps, monkeypatch):
+    monkeypatch.setattr(apps, 'CLAIM_TTL', 0.2)
+    store = MemoryStateStore()
+    supervisor = make_supervisor(apps, store)
+    try:
+        assert supervisor.start('nfc')
+        time.sleep(0.6)
+        assert supervisor.is_running('nfc')
+        assert supervisor._is_local('nfc')
+    finally:
+        supervisor.shutdown()
+    assert not supervisor.is_running('nfc')
+
+
+def test_scanned_list_is_capped_and_ids_stay_unique(apps, monkeypatch):
+    monkeypatch.setattr(apps, 'SCANNED_LIMIT', 3)
+    supervisor = make_supervisor(apps, MemoryStateStore())
+    for _ in range(5):
+        supervisor._record('nfc', {'id_prefix': 'NFC'})
+    assert [item['id'] for item in supervisor.store.get('scanned:nfc')] == ['NFC_3', 'NFC_4', 'NFC_5']
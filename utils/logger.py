@@ -1,11 +1,177 @@
+import atexit
+import json
 import logging
 import logging.handlers
+import os
+import queue
+import threading
 from pathlib import Path
 import sys
 from datetime import datetime
 
+# Records waiting for the writer thread; beyond this they are dropped
+LOG_QUEUE_SIZE = 10000
+
+class StructuredMessage:
+    """Event message rendered as JSON only when a handler emits it"""
+
+    __slots__ = ('event', 'fields')
+
+    def __init__(self, event, fields):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self):
+        return json.dumps({'event': self.event, **self.fields}, default=str, separators=(',', ':'))
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per line; structured events keep their fields"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+        }
+        if isinstance(record.msg, StructuredMessage):
+            entry['event'] = record.msg.event
+            entry.update(record.msg.fields)
+        else:
+            entry['message'] = record.getMessage()
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """Log a structured event, e.g. device/transport/latency fields.
+
+    The JSON is built on the writer thread by whichever handler accepts
+    the record. The keyword arguments are packed before this is called,
+    so on hot paths guard the call with logger.isEnabledFor(level) to
+    keep a disabled level at the cost of that one check.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, StructuredMessage(event, fields), stacklevel=2)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread without ever blocking the caller.
+
+    Formatting is left to the writer thread, so a log call only costs the
+    LogRecord creation and a put. When the queue is full the record is
+    dropped and counted instead of stalling the event loop.
+    """
+
+    def __init__(self, listener, route):
+        super().__init__(listener.queue)
+        self.listener = listener
+        self.route = route
+
+    def prepare(self, record):
+        record.log_route = self.route
+        return record
+
+    def enqueue(self, record):
+        try:
+            # The listener's queue, which is replaced in a forked child
+            self.listener.queue.put_nowait(record)
+        except queue.Full:
+            self.listener.count_dropped()
+
+class RoutingQueueListener(logging.handlers.QueueListener):
+    """Single writer thread that dispatches records to their logger's handlers"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue, respect_handler_level=True)
+        self.routes = {}
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def add_handler(self, route, handler):
+        # Replace rather than mutate; the writer thread may be iterating
+        self.routes[route] = self.routes.get(route, ()) + (handler,)
+
+    def count_dropped(self):
+        with self._dropped_lock:
+            self.dropped += 1
+
+    def handle(self, record):
+        for handler in self.routes.get(getattr(record, 'log_route', None), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def enqueue_sentinel(self):
+        # Blocking put: the sentinel must get in even when the queue is full
+        self.queue.put(self._sentinel)
+
+    def close_handlers(self):
+        for handlers in self.routes.values():
+            for handler in handlers:
+                handler.close()
+
+    def restart_in_child(self):
+        """Give a forked child its own queue and writer thread.
+
+        Only the forking thread survives fork(), so without this a child
+        (e.g. a gunicorn worker forked from a preloading master) would queue
+        records nobody writes. Records the parent had queued are left to
+        the parent.
+        """
+        if self._thread is None:
+            return
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self._dropped_lock = threading.Lock()
+        self._thread = None
+        self.start()
+
+_listener = None
+_listener_lock = threading.Lock()
+
+def _get_listener(config=None) -> RoutingQueueListener:
+    """Start the shared writer thread on first use"""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            size = getattr(config, 'LOG_QUEUE_SIZE', LOG_QUEUE_SIZE)
+            _listener = RoutingQueueListener(queue.Queue(maxsize=size))
+            _listener.start()
+            atexit.register(shutdown_logging)
+        return _listener
+
+def _after_fork_in_child():
+    global _listener_lock
+    # The lock may have been held by another thread of the parent
+    _listener_lock = threading.Lock()
+    if _listener is not None:
+        _listener.restart_in_child()
+
+if hasattr(os, 'register_at_fork'):  # POSIX only; Windows never forks
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def add_log_handler(logger: logging.Logger, handler: logging.Handler):
+    """Attach a handler that runs on the writer thread for this logger"""
+    _get_listener().add_handler(logger.name, handler)
+
+def get_dropped_log_count() -> int:
+    return _listener.dropped if _listener else 0
+
+def shutdown_logging():
+    """Write out everything still queued, then close the files"""
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    listener.close_handlers()
+    if listener.dropped:
+        sys.stderr.write(f"Logging dropped {listener.dropped} records (queue full)\n")
+
 def setup_logger(name: str, config=None) -> logging.Logger:
-    """Setup logger with file and console handlers"""
+    """Setup logger with file and console handlers.
+    
+    The handlers run on a shared background thread behind a bounded queue;
+    the logger itself only gets a non-blocking queue handler.
+    """
     logger = logging.getLogger(name)
     
     # Avoid duplicate handlers
@@ -24,11 +190,13 @@ def setup_logger(name: str, config=None) -> logging.Logger:
         '%(asctime)s - %(levelname)s - %(message)s'
     )
     
+    listener = _get_listener(config)
+    
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
+    listener.add_handler(name, console_handler)
     
     # File handler
     if config:
@@ -46,7 +214,7 @@ def setup_logger(name: str, config=None) -> logging.Logger:
     )
     file_handler.setLevel(log_level)
     file_handler.setFormatter(detailed_formatter)
-    logger.addHandler(file_handler)
+    listener.add_handler(name, file_handler)
     
     # Error file handler
     error_handler = logging.handlers.RotatingFileHandler(
@@ -56,7 +224,9 @@ def setup_logger(name: str, config=None) -> logging.Logger:
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(detailed_formatter)
-    logger.addHandler(error_handler)
+    listener.add_handler(name, error_handler)
+    
+    logger.addHandler(DroppingQueueHandler(listener, name))
     
     return logger
 
@@ -65,12 +235,12 @@ class DeviceLogger:
     
     def __init__(self, config=None):
         self.logger = setup_logger('device_events', config)
-        
+    
         if config:
             log_dir = config.log_dir
         else:
             log_dir = Path.home() / '.hardware_agent' / 'logs'
-        
+    
         # Device events file handler
         device_handler = logging.handlers.RotatingFileHandler(
             log_dir / 'device_events.log',
@@ -78,17 +248,23 @@ class DeviceLogger:
             backupCount=3
         )
         device_handler.setLevel(logging.INFO)
-        device_handler.setFormatter(logging.Formatter(
-            '%(asctime)s - DEVICE - %(message)s'
-        ))
-        self.logger.addHandler(device_handler)
+        device_handler.setFormatter(JsonLineFormatter())
+        add_log_handler(self.logger, device_handler)
+    
+    def event(self, event, level=logging.INFO, stacklevel=2, **fields):
+        """Log a structured device event as a JSON line"""
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, StructuredMessage(event, fields), stacklevel=stacklevel)
     
-    def device_connected(self, device_info):
+    # The wrappers below add a frame: stacklevel=3 reports their caller
+    def device_connected(self, device_info, **fields):
         """Log device connection"""
-        self.logger.info(f"CONNECTED: {device_info}")
+        self.event('connected', stacklevel=3, device=device_info, **fields)
     
-    def device_disconnected(self, device_info):
+    def device_disconnected(self, device_info, **fields):
         """Log device disconnection"""
-        self.logger.info(f"DISCONNECTED: {device_info}")
+        self.event('disconnected', stacklevel=3, device=device_info, **fields)
     
-    def device_error(self, device
\ No newline at end of file
+    def device_error(self, device_info, error, **fields):
+        """Log device error"""
+        self.event('error', logging.ERROR, stacklevel=3, device=device_info, error=error, **fields)
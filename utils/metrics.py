@@ -0,0 +1,289 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters and histograms are sharded per thread: each thread (and so each
+asyncio loop) updates its own cell without taking a lock, and readers sum
+the shards when rendering. Recording a value is a dict lookup plus an
+in-place add. When a thread exits its cell is folded into a base cell, so
+thread-per-request servers do not grow the shard list without bound.
+
+    SCANS = REGISTRY.counter('scans_total', 'Scans run', ['result'])
+    SCANS.labels('ok').inc()
+
+    with SCAN_SECONDS.time():
+        ...
+
+Flask apps expose everything on GET /metrics via instrument_flask_app().
+"""
+
+import bisect
+import math
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _CellOwner:
+    """Lives in thread-local storage; collected when its thread exits"""
+
+    __slots__ = ('cell', '__weakref__')
+
+    def __init__(self, cell: list):
+        self.cell = cell
+
+
+class _Sharded:
+    """Per-thread cells that are summed on read"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._base = self._new_cell()  # totals of threads that have exited
+        self._cells: Dict[int, list] = {}
+        self._cells_lock = threading.Lock()
+
+    def _new_cell(self) -> list:
+        raise NotImplementedError
+
+    def _cell(self) -> list:
+        try:
+            return self._local.owner.cell
+        except AttributeError:
+            cell = self._new_cell()
+            owner = self._local.owner = _CellOwner(cell)
+            weakref.finalize(owner, self._retire, cell)
+            with self._cells_lock:
+                self._cells[id(cell)] = cell
+            return cell
+
+    def _retire(self, cell: list):
+        # The owning thread is gone, so nothing writes to the cell any more
+        with self._cells_lock:
+            for i, value in enumerate(cell):
+                self._base[i] += value
+            self._cells.pop(id(cell), None)
+
+    def _all_cells(self) -> List[list]:
+        """Base plus live cells, read under the lock so a retiring cell is counted once"""
+        with self._cells_lock:
+            return [list(self._base)] + [list(cell) for cell in self._cells.values()]
+
+
+class Counter(_Sharded):
+    def _new_cell(self):
+        return [0.0]
+
+    def inc(self, amount: float = 1.0):
+        self._cell()[0] += amount
+
+    def value(self) -> float:
+        return sum(cell[0] for cell in self._all_cells())
+
+
+class Gauge:
+    """Last-write-wins value; set() is a plain assignment"""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram(_Sharded):
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__()
+
+    def _new_cell(self):
+        # Per-bucket counts (+Inf last), then sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float):
+        cell = self._cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(cumulative bucket counts incl. +Inf, sum)"""
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for cell in self._all_cells():
+            for i in range(len(counts)):
+                counts[i] += cell[i]
+            total += cell[-1]
+        running = 0
+        for i, count in enumerate(counts):
+            running += count
+            counts[i] = running
+        return counts, total
+
+
+class Metric:
+    """A named metric family, optionally split by label values"""
+
+    def __init__(self, kind: str, name: str, documentation: str,
+                 labelnames: Iterable[str] = (), **options):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._options = options
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        if self.kind == 'counter':
+            return Counter()
+        if self.kind == 'gauge':
+            return Gauge()
+        return Histogram(**self._options)
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    # Shortcuts for unlabelled metrics
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _label_str(self, values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            if self.kind != 'histogram':
+                lines.append(f'{self.name}{self._label_str(values)} {_fmt(child.value())}')
+                continue
+            counts, total = child.snapshot()
+            for bound, count in zip(list(child.buckets) + ['+Inf'], counts):
+                le = bound if isinstance(bound, str) else _fmt(bound)
+                lines.append(f'{self.name}_bucket{self._label_str(values, ("le", le))} {count}')
+            lines.append(f'{self.name}_sum{self._label_str(values)} {_fmt(total)}')
+            lines.append(f'{self.name}_count{self._label_str(values)} {counts[-1]}')
+        return lines
+
+
+def _fmt(value: float) -> str:
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, kind, name, documentation, labelnames, **options) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric(kind, name, documentation, labelnames, **options)
+            elif metric.kind != kind:
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Metric:
+        return self._register('counter', name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Metric:
+        return self._register('gauge', name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Metric:
+        return self._register('histogram', name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Flask request latency',
+    ['app', 'method', 'endpoint', 'status']
+)
+
+
+def instrument_flask_app(app, name: str, registry: MetricsRegistry = REGISTRY):
+    """Time every request of a Flask app and serve GET /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = getattr(g, 'metrics_started', None)
+        if started is not None:
+            HTTP_REQUEST_SECONDS.labels(
+                name, request.method, request.url_rule.rule if request.url_rule else 'unmatched',
+                response.status_code
+            ).observe(time.perf_counter() - started)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,186 @@
+"""
+Opt-in stage tracing for network sweeps.
+
+A sampled subset of hosts records one span per discovery stage (ping,
+ports, hostname, ...) on the monotonic clock. At the end of a sweep the
+spans are folded into a per-stage summary and, if an export path is set,
+appended to a JSON-lines file as OpenTelemetry-style span records
+followed by one summary record.
+
+Hosts that are not sampled get a no-op trace, so tracing costs one
+random() call per host when enabled and nothing measurable when not.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullHostTrace:
+    """Trace for unsampled hosts; every operation is a no-op"""
+
+    sampled = False
+    _span = _NullSpan()
+
+    def span(self, stage: str, **attributes):
+        return self._span
+
+    def finish(self, **attributes):
+        pass
+
+
+NULL_HOST_TRACE = NullHostTrace()
+
+
+class HostTrace:
+    sampled = True
+
+    def __init__(self, sweep: 'SweepTrace', host: str):
+        self.sweep = sweep
+        self.host = host
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start_ns = time.monotonic_ns()
+        self.wall_start_ns = time.time_ns()
+
+    @contextmanager
+    def span(self, stage: str, **attributes):
+        start = time.monotonic_ns()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.sweep.record(self, stage, start, time.monotonic_ns(), attributes, error)
+
+    def finish(self, **attributes):
+        """Close the host's root span"""
+        self.sweep.record(self, 'host', self.start_ns, time.monotonic_ns(), attributes, None, root=True)
+
+
+class SweepTrace:
+    def __init__(self, tracer: 'Tracer'):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex
+        self.start_ns = time.monotonic_ns()
+        self.stages: Dict[str, List[int]] = {}  # stage -> [count, total_ns, max_ns]
+        self.spans: List[Dict[str, Any]] = []
+        self.hosts_sampled = 0
+        self._lock = threading.Lock()
+
+    def host(self, host: str):
+        if random.random() >= self.tracer.sample_rate:
+            return NULL_HOST_TRACE
+        self.hosts_sampled += 1
+        return HostTrace(self, host)
+
+    def record(self, host_trace: HostTrace, stage: str, start_ns: int, end_ns: int,
+               attributes: Dict[str, Any], error: Optional[str], root: bool = False):
+        duration = end_ns - start_ns
+        # Map the monotonic offsets onto wall clock for the exported record
+        wall_start = host_trace.wall_start_ns + (start_ns - host_trace.start_ns)
+        span = {
+            'traceId': self.trace_id,
+            'spanId': host_trace.span_id if root else uuid.uuid4().hex[:16],
+            'parentSpanId': None if root else host_trace.span_id,
+            'name': stage,
+            'startTimeUnixNano': wall_start,
+            'endTimeUnixNano': wall_start + duration,
+            'attributes': dict(attributes, **{'host.ip': host_trace.host}),
+            'status': {'code': 'ERROR', 'message': error} if error else {'code': 'OK'},
+        }
+        with self._lock:
+            self.spans.append(span)
+            if not root:
+                totals = self.stages.setdefault(stage, [0, 0, 0])
+                totals[0] += 1
+                totals[1] += duration
+                totals[2] = max(totals[2], duration)
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage totals, slowest stage first"""
+        total_ns = sum(totals[1] for totals in self.stages.values()) or 1
+        stages = [{
+            'stage': stage,
+            'count': count,
+            'total_ms': round(total / 1e6, 3),
+            'mean_ms': round(total / count / 1e6, 3),
+            'max_ms': round(longest / 1e6, 3),
+            'share': round(total / total_ns, 3),
+        } for stage, (count, total, longest) in self.stages.items()]
+        stages.sort(key=lambda entry: entry['total_ms'], reverse=True)
+        return {
+            'type': 'sweep_summary',
+            'traceId': self.trace_id,
+            'duration_ms': round((time.monotonic_ns() - self.start_ns) / 1e6, 3),
+            'hosts_sampled': self.hosts_sampled,
+            'stages': stages,
+        }
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False, sample_rate: float = 0.05,
+                 export_path: Optional[str] = None):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.export_path = export_path
+        self.current: Optional[SweepTrace] = None
+        self.last_summary: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_config(cls, config) -> 'Tracer':
+        return cls(
+            enabled=getattr(config, 'TRACE_ENABLED', False),
+            sample_rate=getattr(config, 'TRACE_SAMPLE_RATE', 0.05),
+            export_path=getattr(config, 'TRACE_EXPORT_PATH', None),
+        )
+
+    def start_sweep(self) -> Optional[SweepTrace]:
+        self.current = SweepTrace(self) if self.enabled else None
+        return self.current
+
+    def host(self, host: str):
+        sweep = self.current
+        return sweep.host(host) if sweep is not None else NULL_HOST_TRACE
+
+    def finish_sweep(self, sweep: Optional[SweepTrace]) -> Optional[Dict[str, Any]]:
+        """Summarize and export a sweep; blocking file I/O, run off the event loop"""
+        if sweep is None:
+            return None
+        if self.current is sweep:
+            self.current = None
+
+        summary = sweep.summary()
+        self.last_summary = summary
+        if summary['stages']:
+            slowest = summary['stages'][0]
+            logger.info("Sweep trace: %s hosts sampled, slowest stage %s (%.0f%% of traced time)",
+                        summary['hosts_sampled'], slowest['stage'], slowest['share'] * 100)
+
+        if self.export_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.export_path)), exist_ok=True)
+                with open(self.export_path, 'a', encoding='utf-8') as f:
+                    for span in sweep.spans:
+                        f.write(json.dumps(span, separators=(',', ':')) + '\n')
+                    f.write(json.dumps(summary, separators=(',', ':')) + '\n')
+            except OSError as e:
+                logger.warning("Could not export sweep trace to %s: %s", self.export_path, e)
+        return summary